@@ -0,0 +1,35 @@
+"""Geo indexes for buildings
+
+Revision ID: 0002_building_geo_index
+Revises: 0001_initial
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002_building_geo_index'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # --- Префильтр геопоиска по прямоугольнику ---
+    op.create_index(
+        'ix_buildings_latitude_longitude',
+        'buildings',
+        ['latitude', 'longitude'],
+    )
+
+    # --- Соединение organizations -> buildings ---
+    op.create_index(
+        'ix_organizations_building_id',
+        'organizations',
+        ['building_id'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_organizations_building_id', table_name='organizations')
+    op.drop_index('ix_buildings_latitude_longitude', table_name='buildings')
@@ -0,0 +1,59 @@
+"""Activity closure table
+
+Revision ID: 0003_activity_closure
+Revises: 0002_building_geo_index
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003_activity_closure'
+down_revision = '0002_building_geo_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # --- Создаём таблицу замыкания иерархии activities ---
+    op.create_table(
+        'activity_closure',
+        sa.Column('ancestor_id', sa.Integer(),
+                  sa.ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('descendant_id', sa.Integer(),
+                  sa.ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('depth', sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        'ix_activity_closure_ancestor_id_depth',
+        'activity_closure',
+        ['ancestor_id', 'depth'],
+    )
+    op.create_index(
+        'ix_activity_closure_descendant_id',
+        'activity_closure',
+        ['descendant_id'],
+    )
+
+    # --- Заполняем по существующим parent_id ---
+    op.execute(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM activities
+            UNION ALL
+            SELECT tree.ancestor_id, activities.id, tree.depth + 1
+            FROM tree
+            JOIN activities ON activities.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_index('ix_activity_closure_ancestor_id_depth', table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,35 @@
+"""Trigram and prefix indexes for organization names
+
+Revision ID: 0004_organization_name_trgm
+Revises: 0003_activity_closure
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004_organization_name_trgm'
+down_revision = '0003_activity_closure'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # --- Поиск по подстроке (ILIKE) и нечёткий поиск (%, similarity) ---
+    op.execute(
+        'CREATE INDEX ix_organizations_name_trgm '
+        'ON organizations USING gin (name gin_trgm_ops)'
+    )
+
+    # --- Автодополнение по префиксу lower(name) LIKE 'x%' ---
+    op.execute(
+        'CREATE INDEX ix_organizations_name_lower_prefix '
+        'ON organizations (lower(name) text_pattern_ops)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_organizations_name_lower_prefix')
+    op.execute('DROP INDEX IF EXISTS ix_organizations_name_trgm')
@@ -0,0 +1,38 @@
+"""updated_at columns for incremental export
+
+Revision ID: 0005_updated_at
+Revises: 0004_organization_name_trgm
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005_updated_at'
+down_revision = '0004_organization_name_trgm'
+branch_labels = None
+depends_on = None
+
+TABLES = ('organizations', 'buildings', 'activities')
+
+
+def upgrade():
+    # --- Время последнего изменения (существующие строки получают now()) ---
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                'updated_at',
+                sa.DateTime(timezone=True),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+        )
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
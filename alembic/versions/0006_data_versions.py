@@ -0,0 +1,64 @@
+"""Data versions bumped by triggers
+
+Revision ID: 0006_data_versions
+Revises: 0005_updated_at
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0006_data_versions'
+down_revision = '0005_updated_at'
+branch_labels = None
+depends_on = None
+
+# таблица -> версия, которую увеличивает запись в неё
+TABLES = {
+    'buildings': 'buildings',
+    'activities': 'activities',
+    'activity_closure': 'activities',
+    'organizations': 'organizations',
+    'organization_activities': 'organizations',
+}
+
+
+def upgrade():
+    # --- Счётчики изменений, общие для всех процессов ---
+    op.create_table(
+        'data_versions',
+        sa.Column('table_name', sa.String(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False,
+                  server_default=sa.func.now()),
+    )
+    for version in sorted(set(TABLES.values())):
+        op.execute(f"INSERT INTO data_versions (table_name) VALUES ('{version}')")
+
+    # --- Триггеры: раз на оператор, в транзакции записи ---
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions
+            SET version = version + 1, changed_at = clock_timestamp()
+            WHERE table_name = TG_ARGV[0];
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table, version in TABLES.items():
+        op.execute(
+            f"CREATE TRIGGER {table}_data_version "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{version}')"
+        )
+
+
+def downgrade():
+    for table in reversed(list(TABLES)):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_data_version ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS bump_data_version()')
+    op.drop_table('data_versions')
@@ -0,0 +1,76 @@
+"""Split data version counters into slots
+
+Revision ID: 0007_data_version_slots
+Revises: 0006_data_versions
+Create Date: 2026-10-18 00:00:00.000000
+
+Триггер из 0006 обновлял одну строку data_versions на таблицу, и её
+блокировка держалась до фиксации пишущей транзакции: любые две записи
+в одну таблицу (например, долгий импорт и правка из API) шли строго
+по очереди. Теперь у таблицы SLOTS строк, триггер пишет в слот
+pg_backend_pid() % SLOTS, версия — сумма слотов.
+
+Что остаётся: транзакции в серверных процессах с одинаковым остатком
+по-прежнему ждут друг друга; чтение версии складывает SLOTS строк
+вместо одной (по первичному ключу, это дёшево). Очерёдность между
+писателями ETag не нужна — достаточно, что сумма растёт с каждой записью.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0007_data_version_slots'
+down_revision = '0006_data_versions'
+branch_labels = None
+depends_on = None
+
+SLOTS = 16
+VERSIONS = ('activities', 'buildings', 'organizations')
+
+
+def _bump_function(slot_filter: str) -> str:
+    return f"""
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions
+            SET version = version + 1, changed_at = clock_timestamp()
+            WHERE table_name = TG_ARGV[0]{slot_filter};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+
+
+def upgrade():
+    op.add_column(
+        'data_versions',
+        sa.Column('slot', sa.SmallInteger(), nullable=False, server_default='0'),
+    )
+    op.drop_constraint('data_versions_pkey', 'data_versions', type_='primary')
+    op.create_primary_key('data_versions_pkey', 'data_versions', ['table_name', 'slot'])
+    # прежний счётчик остаётся в слоте 0, остальные начинают с нуля
+    for version in VERSIONS:
+        op.execute(
+            "INSERT INTO data_versions (table_name, slot) VALUES "
+            + ", ".join(f"('{version}', {slot})" for slot in range(1, SLOTS))
+        )
+    op.execute(_bump_function(f"\n              AND slot = pg_backend_pid() % {SLOTS}"))
+
+
+def downgrade():
+    op.execute(_bump_function(""))
+    op.execute(
+        """
+        UPDATE data_versions AS v
+        SET version = s.version, changed_at = s.changed_at
+        FROM (
+            SELECT table_name, sum(version) AS version, max(changed_at) AS changed_at
+            FROM data_versions GROUP BY table_name
+        ) AS s
+        WHERE v.table_name = s.table_name AND v.slot = 0
+        """
+    )
+    op.execute('DELETE FROM data_versions WHERE slot <> 0')
+    op.drop_constraint('data_versions_pkey', 'data_versions', type_='primary')
+    op.create_primary_key('data_versions_pkey', 'data_versions', ['table_name'])
+    op.drop_column('data_versions', 'slot')
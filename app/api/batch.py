@@ -0,0 +1,43 @@
+from typing import Any, Callable, List, Sequence
+
+from fastapi import HTTPException, Query, status
+
+from app.schemas.batch import MAX_BATCH_IDS
+
+
+def batch_ids(
+        ids: str = Query(..., description="ID через запятую, например 3,1,2",
+                         examples=["3,1,2"]),
+) -> List[int]:
+    """
+    Зависимость для ?ids=1,2,3: список ID без повторов, в исходном порядке.
+    """
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="ids must be a comma-separated list of integers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="ids must not be empty")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+
+def in_requested_order(
+        rows: Sequence[Any],
+        ids: Sequence[int],
+        key: Callable[[Any], int] = lambda row: row.id,
+) -> dict:
+    """
+    Разложить строки в порядке ids; отсутствующие ID — в missing.
+    """
+    by_id = {key(row): row for row in rows}
+    requested = list(dict.fromkeys(ids))
+    return {
+        "items": [by_id[i] for i in requested if i in by_id],
+        "missing": [i for i in requested if i not in by_id],
+    }
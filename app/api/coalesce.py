@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.conditional import STATE_KEY
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.db.session import read_session
+from app.services.singleflight import query_flights
+
+
+async def coalesced(
+        request: Request,
+        key: Hashable,
+        load: Callable[[AsyncSession], Awaitable[Any]],
+) -> Any:
+    """
+    Ответ чтения, общий для одновременных запросов с тем же key:
+    один запрос к БД и одна сериализация на всех. load получает
+    собственную сессию чтения, а не сессию запроса, — запрос, начавший
+    загрузку, может быть отменён раньше остальных.
+
+    Сессия открывается на сервере, с которого not_modified прочитал
+    версии, а ETag входит в ключ: ответ делят только запросы с теми же
+    версиями, и данные в нём не старше их ETag.
+    """
+    validators = getattr(request.state, STATE_KEY, None) or {}
+    key = (validators.get("ETag"), key)
+
+    async def run() -> Any:
+        async with read_session(request) as session:
+            content = await load(session)
+        if settings.fast_json:
+            return FastJSONResponse(content).body
+        return content
+
+    if not settings.coalesce_reads:
+        result = await run()
+    else:
+        try:
+            result = await query_flights.do(key, run, settings.coalesce_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail="Query timed out")
+    if settings.fast_json:
+        return Response(result, media_type=FastJSONResponse.media_type)
+    return result
@@ -0,0 +1,104 @@
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.db.session import VERSIONS_KEY, read_session
+from app.services.versions import table_versions
+
+# выдача организаций зависит от зданий (геозона, здание) и от дерева
+# видов деятельности (фильтр по поддереву, activity_ids)
+ORGANIZATION_TABLES = ("organizations", "buildings", "activities")
+
+STATE_KEY = "cache_validators"
+
+
+def not_modified(*tables: str) -> Callable[[Request], Awaitable[None]]:
+    """
+    Зависимость условного GET по версиям таблиц из БД (data_versions,
+    их увеличивают триггеры при любой записи, в том числе из CLI).
+    Если клиент прислал актуальный ETag (If-None-Match) или дату
+    (If-Modified-Since), отвечаем 304 после одного запроса по первичному
+    ключу — до выборки данных и сериализации; иначе валидаторы попадают
+    в заголовки ответа (CacheValidatorsMiddleware), а версии — в сессии
+    чтения запроса (TableVersions.current).
+    """
+
+    async def dependency(request: Request) -> None:
+        # версии читаются с того же сервера, что и данные запроса
+        async with read_session(request) as session:
+            versions = await table_versions.fetch(session, tables)
+        etag = table_versions.etag(versions)
+        last_modified = max(version.changed_at for version in versions.values())
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+        }
+        if _is_fresh(request, etag, last_modified):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED,
+                                headers=headers)
+        setattr(request.state, STATE_KEY, headers)
+        setattr(request.state, VERSIONS_KEY, versions)
+
+    return dependency
+
+
+def _is_fresh(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # слабое сравнение: префикс W/ не учитывается
+        wanted = _opaque(etag)
+        return any(
+            tag == "*" or _opaque(tag) == wanted
+            for tag in (part.strip() for part in if_none_match.split(","))
+        )
+    since = _parse_http_date(request.headers.get("if-modified-since"))
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class CacheValidatorsMiddleware:
+    """
+    ASGI-middleware: добавляет ETag и Last-Modified, выставленные
+    зависимостью not_modified, к успешному ответу. Нужен потому, что
+    эндпоинты часто возвращают готовый Response (fast_json).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                validators = scope.get("state", {}).get(STATE_KEY)
+                if validators:
+                    message["headers"] = list(message.get("headers", [])) + _encode(validators)
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+
+def _encode(headers: dict) -> list:
+    return [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in headers.items()
+    ]
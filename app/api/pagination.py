@@ -0,0 +1,44 @@
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+
+from app.services.pagination import decode_cursor, encode_cursor
+
+
+class PageParams:
+    """
+    Параметры keyset-пагинации списков по id: limit и непрозрачный cursor.
+    """
+
+    def __init__(
+            self,
+            limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+            cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    ):
+        self.limit = limit
+        self.after_id: Optional[int] = None
+        if cursor:
+            try:
+                self.after_id = int(decode_cursor(cursor, 1)[0])
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="Invalid cursor")
+
+    @property
+    def fetch(self) -> int:
+        """
+        Сколько строк запросить у репозитория: на одну больше страницы,
+        чтобы понять, есть ли следующая.
+        """
+        return self.limit + 1
+
+    def page(
+            self,
+            rows: Sequence[Any],
+            key: Callable[[Any], Any] = lambda row: row.id,
+    ) -> dict:
+        items = list(rows[:self.limit])
+        next_cursor = None
+        if len(rows) > self.limit:
+            next_cursor = encode_cursor(key(items[-1]))
+        return {"items": items, "next_cursor": next_cursor}
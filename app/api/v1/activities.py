@@ -1,22 +1,51 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.batch import batch_ids, in_requested_order
+from app.api.coalesce import coalesced
+from app.api.conditional import ORGANIZATION_TABLES, not_modified
+from app.api.pagination import PageParams
+from app.core.responses import fast_json
 from app.crud.activity import ActivityRepository
 from app.crud.organization import OrganizationRepository
-from app.db.session import get_db
-from app.models.activity import Activity
+from app.db.session import get_db, get_read_db
 from app.schemas.activity import ActivityCreate, ActivityOut, ActivityUpdate
+from app.schemas.batch import Batch, BatchIn
 from app.schemas.organization import OrganizationOut
+from app.schemas.pagination import Page
 
 router = APIRouter(tags=["activities"])
 
 
-@router.get("/", response_model=List[ActivityOut])
-async def list_activities(db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=Page[ActivityOut],
+            dependencies=[Depends(not_modified("activities"))])
+async def list_activities(
+        page: PageParams = Depends(),
+        db: AsyncSession = Depends(get_read_db),
+):
     repo = ActivityRepository(db)
-    return await repo.list()
+    return fast_json(page.page(await repo.list(page.fetch, page.after_id)))
+
+
+@router.get("/batch", response_model=Batch[ActivityOut],
+            dependencies=[Depends(not_modified("activities"))])
+async def read_activities_batch(
+        ids: List[int] = Depends(batch_ids),
+        db: AsyncSession = Depends(get_read_db),
+):
+    repo = ActivityRepository(db)
+    return fast_json(in_requested_order(await repo.by_ids(ids), ids))
+
+
+@router.post("/batch", response_model=Batch[ActivityOut])
+async def read_activities_batch_post(
+        payload: BatchIn,
+        db: AsyncSession = Depends(get_read_db),
+):
+    repo = ActivityRepository(db)
+    return fast_json(in_requested_order(await repo.by_ids(payload.ids), payload.ids))
 
 
 @router.post("/", response_model=ActivityOut, status_code=201)
@@ -25,18 +54,12 @@ async def create_activity(
         db: AsyncSession = Depends(get_db),
 ):
     repo = ActivityRepository(db)
+    return await repo.create(activity_in.dict())
 
-    act = Activity(name=activity_in.name, parent_id=activity_in.parent_id)
-    created = await repo.create(act)
-
-    loaded = await repo.get(created.id)
-    if not loaded:
-        raise HTTPException(500, "Failed to load created Activity")
-    return loaded
 
-
-@router.get("/{activity_id}", response_model=ActivityOut)
-async def read_activity(activity_id: int, db: AsyncSession = Depends(get_db)):
+@router.get("/{activity_id}", response_model=ActivityOut,
+            dependencies=[Depends(not_modified("activities"))])
+async def read_activity(activity_id: int, db: AsyncSession = Depends(get_read_db)):
     repo = ActivityRepository(db)
     act = await repo.get(activity_id)
     if not act:
@@ -53,7 +76,11 @@ async def update_activity(
 ):
     repo = ActivityRepository(db)
     data = activity.dict(exclude_unset=True)
-    act = await repo.update(activity_id, data)
+    try:
+        act = await repo.update(activity_id, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=str(exc))
     if not act:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Activity not found")
@@ -70,11 +97,18 @@ async def delete_activity(activity_id: int,
                             detail="Activity not found")
 
 
-@router.get("/{root_id}/organizations", response_model=List[OrganizationOut])
+@router.get("/{root_id}/organizations", response_model=Page[OrganizationOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
 async def list_orgs_by_activity(
+        request: Request,
         root_id: int,
         level: int = Query(3, ge=1, le=3),
-        db: AsyncSession = Depends(get_db),
+        page: PageParams = Depends(),
 ):
-    org_repo = OrganizationRepository(db)
-    return await org_repo.by_activity(root_id, level)
+    async def load(db: AsyncSession) -> dict:
+        org_repo = OrganizationRepository(db)
+        return page.page(await org_repo.by_activity(root_id, level, page.fetch, page.after_id))
+
+    return await coalesced(
+        request, ("activity-organizations", root_id, level, page.fetch, page.after_id), load
+    )
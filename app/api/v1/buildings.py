@@ -1,24 +1,67 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.batch import batch_ids, in_requested_order
+from app.api.conditional import ORGANIZATION_TABLES, not_modified
+from app.api.pagination import PageParams
+from app.core.responses import fast_json
 from app.crud.building import BuildingRepository
 from app.crud.organization import OrganizationRepository
-from app.db.session import get_db
-from app.models.building import Building
+from app.db.session import get_db, get_read_db
 from app.schemas.building import BuildingCreate, BuildingOut, BuildingUpdate
+from app.schemas.batch import Batch, BatchIn
 from app.schemas.organization import OrganizationOut
+from app.schemas.pagination import Page
 
 router = APIRouter(
     tags=["buildings"],
 )
 
 
-@router.get("/", response_model=List[BuildingOut])
-async def list_buildings(db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=Page[BuildingOut],
+            dependencies=[Depends(not_modified("buildings"))])
+async def list_buildings(
+        lat: Optional[float] = Query(None, description="Центр поиска (широта)"),
+        lon: Optional[float] = Query(None, description="Центр поиска (долгота)"),
+        radius: Optional[float] = Query(None, description="Радиус в км"),
+        sw_lat: Optional[float] = Query(None, description="Юго-западная широта"),
+        sw_lon: Optional[float] = Query(None, description="Юго-западная долгота"),
+        ne_lat: Optional[float] = Query(None, description="Северо-восточная широта"),
+        ne_lon: Optional[float] = Query(None, description="Северо-восточная долгота"),
+        page: PageParams = Depends(),
+        db: AsyncSession = Depends(get_read_db),
+):
+    repo = BuildingRepository(db)
+
+    if lat is not None and lon is not None and radius is not None:
+        rows = await repo.in_radius((lat, lon), radius, page.fetch, page.after_id)
+    elif sw_lat is not None and sw_lon is not None and ne_lat is not None and ne_lon is not None:
+        rows = await repo.in_bbox((sw_lat, sw_lon), (ne_lat, ne_lon),
+                                  page.fetch, page.after_id)
+    else:
+        rows = await repo.list(page.fetch, page.after_id)
+    return fast_json(page.page(rows))
+
+
+@router.get("/batch", response_model=Batch[BuildingOut],
+            dependencies=[Depends(not_modified("buildings"))])
+async def read_buildings_batch(
+        ids: List[int] = Depends(batch_ids),
+        db: AsyncSession = Depends(get_read_db),
+):
     repo = BuildingRepository(db)
-    return await repo.list()
+    return fast_json(in_requested_order(await repo.by_ids(ids), ids))
+
+
+@router.post("/batch", response_model=Batch[BuildingOut])
+async def read_buildings_batch_post(
+        payload: BatchIn,
+        db: AsyncSession = Depends(get_read_db),
+):
+    repo = BuildingRepository(db)
+    return fast_json(in_requested_order(await repo.by_ids(payload.ids), payload.ids))
 
 
 @router.post("/", response_model=BuildingOut,
@@ -28,14 +71,14 @@ async def create_building(
         db: AsyncSession = Depends(get_db),
 ):
     repo = BuildingRepository(db)
-    building = Building(**payload.dict())
-    return await repo.create(building)
+    return await repo.create(payload.dict())
 
 
-@router.get("/{building_id}", response_model=BuildingOut)
+@router.get("/{building_id}", response_model=BuildingOut,
+            dependencies=[Depends(not_modified("buildings"))])
 async def read_building(
         building_id: int,
-        db: AsyncSession = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
 ):
     repo = BuildingRepository(db)
     building = await repo.get(building_id)
@@ -79,10 +122,12 @@ async def delete_building(
 
 
 @router.get("/{building_id}/organizations",
-            response_model=List[OrganizationOut])
+            response_model=Page[OrganizationOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
 async def list_organizations_in_building(
         building_id: int,
-        db: AsyncSession = Depends(get_db),
+        page: PageParams = Depends(),
+        db: AsyncSession = Depends(get_read_db),
 ):
     building_repo = BuildingRepository(db)
     if not await building_repo.get(building_id):
@@ -91,4 +136,5 @@ async def list_organizations_in_building(
             detail="Building not found"
         )
     org_repo = OrganizationRepository(db)
-    return await org_repo.by_building(building_id)
+    rows = await org_repo.by_building(building_id, page.fetch, page.after_id)
+    return fast_json(page.page(rows))
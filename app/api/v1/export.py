@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.conditional import ORGANIZATION_TABLES, not_modified
+from app.core.responses import NDJSONResponse, ndjson_chunks
+from app.crud.activity import ActivityRepository
+from app.crud.building import BuildingRepository
+from app.crud.organization import OrganizationRepository
+from app.db.session import read_session
+
+router = APIRouter(tags=["export"])
+
+# запас для updated_since: updated_at — время начала транзакции, поэтому
+# запись, зафиксированная уже после прошлой выгрузки, может быть помечена
+# более ранним временем. Запас должен покрывать самую долгую пишущую
+# транзакцию (массовый импорт); строки из перекрытия приходят повторно.
+# Удаления инкрементальная выгрузка не передаёт: удалённой строки больше
+# нет. Копия, которой они важны, периодически заменяется полной выгрузкой.
+EXPORT_OVERLAP = timedelta(minutes=10)
+
+UPDATED_SINCE = Query(
+    None,
+    description=(
+        "Только изменённые начиная с этого момента. Передавайте время начала "
+        f"прошлой выгрузки минус {int(EXPORT_OVERLAP.total_seconds() // 60)} минут: "
+        "изменения долгих транзакций помечены временем их начала. "
+        "Повторно пришедшие строки заменяют прежние по id. "
+        "Удалённые строки не передаются — их показывает только полная выгрузка."
+    ),
+)
+
+
+def _stream(
+        request: Request,
+        export: Callable[[AsyncSession], AsyncIterator[List[dict]]],
+) -> NDJSONResponse:
+    """
+    Сессия открывается внутри генератора: зависимость get_read_db закрывается
+    до того, как ответ начнёт отдаваться. Читаем с того же сервера,
+    с которого not_modified прочитал версии.
+    """
+    async def body() -> AsyncIterator[bytes]:
+        async with read_session(request) as session:
+            async for chunk in ndjson_chunks(export(session)):
+                yield chunk
+
+    return NDJSONResponse(body())
+
+
+@router.get("/organizations", response_class=NDJSONResponse,
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def export_organizations(
+        request: Request,
+        updated_since: Optional[datetime] = UPDATED_SINCE,
+):
+    return _stream(request, lambda session: OrganizationRepository(session).export(updated_since))
+
+
+@router.get("/buildings", response_class=NDJSONResponse,
+            dependencies=[Depends(not_modified("buildings"))])
+async def export_buildings(
+        request: Request,
+        updated_since: Optional[datetime] = UPDATED_SINCE,
+):
+    return _stream(request, lambda session: BuildingRepository(session).export(updated_since))
+
+
+@router.get("/activities", response_class=NDJSONResponse,
+            dependencies=[Depends(not_modified("activities"))])
+async def export_activities(
+        request: Request,
+        updated_since: Optional[datetime] = UPDATED_SINCE,
+):
+    return _stream(request, lambda session: ActivityRepository(session).export(updated_since))
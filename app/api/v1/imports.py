@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
+from app.schemas.bulk import BulkImportIn, BulkImportResult
+from app.services.bulk_import import BulkImportService
+
+router = APIRouter(tags=["import"])
+
+
+@router.post("/", response_model=BulkImportResult)
+async def bulk_import(
+        payload: BulkImportIn,
+        db: AsyncSession = Depends(get_db),
+):
+    """
+    Массовая загрузка справочника. Ошибочные строки пропускаются
+    и перечисляются в errors, остальные записываются.
+    """
+    service = BulkImportService(db)
+    return await service.run(payload.buildings, payload.activities, payload.organizations)
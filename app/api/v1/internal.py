@@ -0,0 +1,47 @@
+from typing import List
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.db.session import pool_stats, replica_router
+from app.schemas.activity import ActivityTreeInfo
+from app.schemas.internal import (CacheStats, CoalescingStats, PoolStats,
+                                  ReplicaStatus)
+from app.services.cache import response_cache
+from app.services.singleflight import query_flights
+from app.services.tree import activity_tree_cache
+
+router = APIRouter(tags=["internal"])
+
+
+@router.get("/activity-tree", response_model=ActivityTreeInfo)
+async def activity_tree_info():
+    return activity_tree_cache.info()
+
+
+@router.get("/pool", response_model=PoolStats)
+async def connection_pool_stats():
+    return pool_stats()
+
+
+@router.get("/replicas", response_model=List[ReplicaStatus])
+async def replica_status():
+    return replica_router.status()
+
+
+@router.get("/cache", response_model=CacheStats)
+async def cache_stats():
+    return response_cache.stats()
+
+
+@router.get("/coalescing", response_model=CoalescingStats)
+async def coalescing_stats():
+    return query_flights.stats()
+
+
+@router.get("/metrics", response_class=Response)
+async def prometheus_metrics():
+    """
+    Метрики в текстовом формате Prometheus.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
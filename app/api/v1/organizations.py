@@ -1,20 +1,42 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.batch import batch_ids, in_requested_order
+from app.api.coalesce import coalesced
+from app.api.conditional import ORGANIZATION_TABLES, not_modified
+from app.api.pagination import PageParams
+from app.core.responses import fast_json
+from app.crud.activity import ActivityRepository
 from app.crud.organization import OrganizationRepository
-from app.db.session import get_db
-from app.models.activity import Activity
-from app.models.organization import Organization
-from app.schemas.organization import (OrganizationCreate, OrganizationOut,
+from app.db.session import get_db, get_read_db
+from app.schemas.organization import (OrganizationCreate,
+                                      OrganizationNearestOut, OrganizationOut,
+                                      OrganizationSearchOut,
+                                      OrganizationSuggestion,
                                       OrganizationUpdate)
+from app.schemas.batch import Batch, BatchIn
+from app.schemas.pagination import Page
+from app.services.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(tags=["organizations"])
 
+# координаты в ключе объединения запросов округляются (~10 см)
+COORD_DIGITS = 6
 
-@router.get("/", response_model=List[OrganizationOut])
+
+async def _check_activities(db: AsyncSession, activity_ids: List[int]) -> None:
+    missing = await ActivityRepository(db).missing_ids(activity_ids)
+    if missing:
+        raise HTTPException(status_code=404,
+                            detail=f"Activities {missing} not found")
+
+
+@router.get("/", response_model=Page[OrganizationOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
 async def list_organizations(
+        request: Request,
         name: Optional[str] = Query(None, description="Поиск по части названия"),
         lat: Optional[float] = Query(None, description="Центр поиска (широта)"),
         lon: Optional[float] = Query(None, description="Центр поиска (долгота)"),
@@ -23,20 +45,134 @@ async def list_organizations(
         sw_lon: Optional[float] = Query(None, description="Юго-западная долгота"),
         ne_lat: Optional[float] = Query(None, description="Северо-восточная широта"),
         ne_lon: Optional[float] = Query(None, description="Северо-восточная долгота"),
-        db: AsyncSession = Depends(get_db),
+        activity_id: Optional[int] = Query(None, description="Вид деятельности (включая вложенные)"),
+        level: int = Query(3, ge=1, le=3),
+        building_id: Optional[int] = Query(None, description="Здание"),
+        page: PageParams = Depends(),
+):
+    """
+    Все заданные фильтры применяются вместе, одним запросом.
+    Одновременные запросы с теми же фильтрами (популярная область карты)
+    получают один общий результат.
+    """
+    center = None
+    if lat is not None and lon is not None and radius is not None:
+        center = (round(lat, COORD_DIGITS), round(lon, COORD_DIGITS))
+    sw = ne = None
+    if sw_lat is not None and sw_lon is not None and ne_lat is not None and ne_lon is not None:
+        sw = (round(sw_lat, COORD_DIGITS), round(sw_lon, COORD_DIGITS))
+        ne = (round(ne_lat, COORD_DIGITS), round(ne_lon, COORD_DIGITS))
+    filters = dict(
+        name=name,
+        center=center,
+        radius_km=radius if center is not None else None,
+        sw=sw,
+        ne=ne,
+        activity_id=activity_id,
+        max_level=level,
+        building_id=building_id,
+        limit=page.fetch,
+        after_id=page.after_id,
+    )
+
+    async def load(db: AsyncSession) -> dict:
+        return page.page(await OrganizationRepository(db).query(**filters))
+
+    return await coalesced(request, ("organizations", *filters.items()), load)
+
+
+@router.get("/nearest", response_model=Page[OrganizationNearestOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def list_nearest_organizations(
+        lat: float = Query(..., description="Точка поиска (широта)"),
+        lon: float = Query(..., description="Точка поиска (долгота)"),
+        limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+        activity_id: Optional[int] = Query(None, description="Вид деятельности (включая вложенные)"),
+        level: int = Query(3, ge=1, le=3),
+        cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+        db: AsyncSession = Depends(get_read_db),
+):
+    after = None
+    if cursor:
+        try:
+            distance, last_id = decode_cursor(cursor, 2)
+            after = (float(distance), int(last_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Invalid cursor")
+
+    activity_ids = None
+    if activity_id is not None:
+        activity_ids = await ActivityRepository(db).descendant_ids(activity_id, level)
+        if not activity_ids:
+            return fast_json({"items": [], "next_cursor": None})
+
+    repo = OrganizationRepository(db)
+    found = await repo.nearest((lat, lon), limit + 1, after, activity_ids)
+
+    items = [
+        {**org._asdict(), "distance_km": distance}
+        for org, distance in found[:limit]
+    ]
+    next_cursor = None
+    if len(found) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["distance_km"], last["id"])
+    return fast_json({"items": items, "next_cursor": next_cursor})
+
+
+@router.get("/search", response_model=List[OrganizationSearchOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def search_organizations(
+        q: str = Query(..., min_length=1, description="Название или его часть"),
+        limit: int = Query(20, ge=1, le=100),
+        db: AsyncSession = Depends(get_read_db),
 ):
     repo = OrganizationRepository(db)
+    found = await repo.search(q, limit)
+    return fast_json([
+        {**org._asdict(), "score": score}
+        for org, score in found
+    ])
+
+
+@router.get("/autocomplete", response_model=List[OrganizationSuggestion],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def autocomplete_organizations(
+        q: str = Query(..., min_length=1, description="Начало названия"),
+        limit: int = Query(10, ge=1, le=50),
+        db: AsyncSession = Depends(get_read_db),
+):
+    repo = OrganizationRepository(db)
+    return fast_json([
+        {"id": org_id, "name": name}
+        for org_id, name in await repo.autocomplete(q, limit)
+    ])
 
-    if name:
-        return await repo.search_by_name(name)
 
-    if lat is not None and lon is not None and radius is not None:
-        return await repo.in_radius((lat, lon), radius)
+@router.get("/batch", response_model=Batch[OrganizationOut],
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def read_organizations_batch(
+        ids: List[int] = Depends(batch_ids),
+        db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Несколько организаций за один запрос, в порядке ids.
+    """
+    repo = OrganizationRepository(db)
+    return fast_json(in_requested_order(await repo.by_ids(ids), ids))
 
-    if sw_lat is not None and sw_lon is not None and ne_lat is not None and ne_lon is not None:
-        return await repo.in_bbox((sw_lat, sw_lon), (ne_lat, ne_lon))
 
-    return await repo.list()
+@router.post("/batch", response_model=Batch[OrganizationOut])
+async def read_organizations_batch_post(
+        payload: BatchIn,
+        db: AsyncSession = Depends(get_read_db),
+):
+    """
+    То же, что GET /batch, для длинных списков ID.
+    """
+    repo = OrganizationRepository(db)
+    return fast_json(in_requested_order(await repo.by_ids(payload.ids), payload.ids))
 
 
 @router.post("/", response_model=OrganizationOut, status_code=201)
@@ -45,34 +181,21 @@ async def create_organization(
         db: AsyncSession = Depends(get_db),
 ):
     repo = OrganizationRepository(db)
+    await _check_activities(db, organization_in.activity_ids)
 
-    acts = []
-    for act_id in organization_in.activity_ids:
-        act = await db.get(Activity, act_id)
-        if act is None:
-            raise HTTPException(status_code=404,
-                                detail=f"Activity {act_id} not found")
-        acts.append(act)
-
-    org = Organization(
-        name=organization_in.name,
-        phone_numbers=organization_in.phone_numbers,
-        building_id=organization_in.building_id,
-        activities=acts,
-    )
-
-    created = await repo.create(org)
-    return await repo.get(created.id)
+    data = organization_in.dict(exclude={"activity_ids"})
+    return await repo.create(data, organization_in.activity_ids)
 
 
-@router.get("/{org_id}", response_model=OrganizationOut)
-async def read_organization(org_id: int, db: AsyncSession = Depends(get_db)):
+@router.get("/{org_id}", response_model=OrganizationOut,
+            dependencies=[Depends(not_modified(*ORGANIZATION_TABLES))])
+async def read_organization(org_id: int, db: AsyncSession = Depends(get_read_db)):
     repo = OrganizationRepository(db)
-    org = await repo.get(org_id)
+    org = await repo.get_row(org_id)
     if not org:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Organization not found")
-    return org
+    return fast_json(org)
 
 
 @router.put("/{org_id}", response_model=OrganizationOut)
@@ -84,22 +207,14 @@ async def update_organization(
     repo = OrganizationRepository(db)
     data = organization_in.dict(exclude_unset=True)
 
-    if "activity_ids" in data:
-        from app.models.activity import Activity
-        acts = []
-        for act_id in data.pop("activity_ids"):
-            act = await db.get(Activity, act_id)
-            if act is None:
-                raise HTTPException(status_code=404,
-                                    detail=f"Activity {act_id} not found")
-            acts.append(act)
-        data["activities"] = acts
+    if data.get("activity_ids") is not None:
+        await _check_activities(db, data["activity_ids"])
 
     updated = await repo.update(org_id, data)
     if not updated:
         raise HTTPException(status_code=404,
                             detail="Organization not found")
-    return await repo.get(org_id)
+    return updated
 
 
 @router.delete("/{org_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,9 +1,49 @@
+from typing import List
+
 from pydantic import BaseSettings, Field
 
 
 class Settings(BaseSettings):
     database_url: str = Field(..., env="DATABASE_URL")
     api_key: str = Field(..., env="API_KEY")
+    # списки отдаются сразу байтами через orjson, минуя response_model
+    fast_json: bool = Field(True, env="FAST_JSON")
+
+    # движок и пул соединений (для SQLite параметры пула не применяются)
+    db_echo: bool = Field(False, env="DB_ECHO")
+    db_pool_size: int = Field(5, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+
+    # реплики для чтения: URL через запятую; недоступная реплика
+    # исключается на replica_retry_seconds
+    database_replica_urls: str = Field("", env="DATABASE_REPLICA_URLS")
+    replica_retry_seconds: float = Field(30.0, env="REPLICA_RETRY_SECONDS")
+
+    # журнал медленных запросов: порог в мс и доля записываемых (0..1)
+    slow_query_ms: float = Field(200.0, env="SLOW_QUERY_MS")
+    slow_query_sample_rate: float = Field(1.0, ge=0, le=1, env="SLOW_QUERY_SAMPLE_RATE")
+
+    # метрики Prometheus и заголовок Server-Timing
+    metrics_enabled: bool = Field(True, env="METRICS_ENABLED")
+    server_timing: bool = Field(True, env="SERVER_TIMING")
+
+    # кэш чтений репозиториев: memory (в процессе), redis или off
+    cache_backend: str = Field("memory", regex="^(memory|redis|off)$", env="CACHE_BACKEND")
+    cache_url: str = Field("redis://localhost:6379/0", env="CACHE_URL")
+    cache_ttl_seconds: float = Field(30.0, gt=0, env="CACHE_TTL_SECONDS")
+    cache_max_entries: int = Field(10_000, ge=1, env="CACHE_MAX_ENTRIES")
+    cache_key_prefix: str = Field("ozd:", env="CACHE_KEY_PREFIX")
+
+    # одинаковые одновременные чтения делят один запрос к БД
+    coalesce_reads: bool = Field(True, env="COALESCE_READS")
+    coalesce_timeout_seconds: float = Field(30.0, gt=0, env="COALESCE_TIMEOUT_SECONDS")
+
+    @property
+    def replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.database_replica_urls.split(",") if url.strip()]
 
     class Config:
         env_file = ".env"
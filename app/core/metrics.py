@@ -0,0 +1,126 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Histogram
+
+from app.core.config import settings
+
+# маршрут не найден: не плодим метки по произвольным путям
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов на HTTP-запрос",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Суммарное время SQL-запросов на HTTP-запрос",
+    ("method", "route"),
+)
+REQUEST_SERIALIZE_SECONDS = Histogram(
+    "http_request_serialize_seconds",
+    "Время сериализации ответа",
+    ("method", "route"),
+)
+
+
+class RequestTimings:
+    """
+    Счётчики одного HTTP-запроса. Объект общий для всех задач и
+    гринлетов запроса (контекст копируется, ссылка остаётся той же).
+    """
+
+    __slots__ = ("started_at", "db_queries", "db_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def server_timing(self) -> bytes:
+        app_ms = (time.perf_counter() - self.started_at) * 1000
+        return (
+            f"app;dur={app_ms:.1f}, "
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries", '
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}"
+        ).encode("latin-1")
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record_query(seconds: float) -> None:
+    """
+    Учесть выполненный SQL-запрос в счётчиках текущего HTTP-запроса.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_seconds += seconds
+
+
+def record_serialization(seconds: float) -> None:
+    """
+    Учесть время сериализации ответа текущего HTTP-запроса.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.serialize_seconds += seconds
+
+
+def _route_label(scope) -> str:
+    # шаблон пути (/api/v1/buildings/{building_id}), а не сам путь
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class TimingMiddleware:
+    """
+    ASGI-middleware: время запроса, число и время SQL-запросов и время
+    сериализации в гистограммы по шаблону маршрута и в заголовок
+    Server-Timing. Гистограммы обновляются после отправки тела,
+    так что потоковые ответы учитываются целиком.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            method = scope["method"]
+            route = _route_label(scope)
+            REQUEST_SECONDS.labels(method, route, str(status_code)).observe(
+                time.perf_counter() - timings.started_at
+            )
+            REQUEST_QUERIES.labels(method, route).observe(timings.db_queries)
+            REQUEST_DB_SECONDS.labels(method, route).observe(timings.db_seconds)
+            REQUEST_SERIALIZE_SECONDS.labels(method, route).observe(timings.serialize_seconds)
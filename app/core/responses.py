@@ -0,0 +1,87 @@
+import time
+from typing import Any, AsyncIterable, AsyncIterator, List
+
+import orjson
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.core.config import settings
+from app.core.metrics import record_serialization
+
+
+def _default(obj: Any) -> Any:
+    # строки результата Core (Row) orjson сам не знает
+    if hasattr(obj, "_asdict"):
+        return obj._asdict()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _plain(content: Any) -> Any:
+    # именованные кортежи orjson пишет массивом, поэтому переводим их
+    # в словари заранее; остальное отдаём orjson как есть
+    if isinstance(content, dict):
+        return {key: _plain(value) for key, value in content.items()}
+    if isinstance(content, list):
+        return [_plain(item) for item in content]
+    if isinstance(content, tuple) and hasattr(content, "_asdict"):
+        return content._asdict()
+    return content
+
+
+class FastJSONResponse(Response):
+    """
+    JSON-ответ из строк результата запроса напрямую в байты (orjson),
+    без промежуточных pydantic-моделей и jsonable_encoder.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = orjson.dumps(_plain(content), default=_default)
+        record_serialization(time.perf_counter() - start)
+        return body
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    Обычный JSONResponse с учётом времени сериализации в метриках;
+    класс ответа по умолчанию для ответов через response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = super().render(content)
+        record_serialization(time.perf_counter() - start)
+        return body
+
+
+def fast_json(content: Any) -> Any:
+    """
+    Отдать content через FastJSONResponse, если включён быстрый режим
+    (settings.fast_json); иначе вернуть как есть для обычной проверки
+    по response_model.
+    """
+    if settings.fast_json:
+        return FastJSONResponse(content)
+    return content
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    Потоковый ответ в формате NDJSON: по одному JSON-объекту на строку.
+    """
+
+    media_type = "application/x-ndjson"
+
+
+async def ndjson_chunks(batches: AsyncIterable[List[Any]]) -> AsyncIterator[bytes]:
+    """
+    Пачки объектов в куски NDJSON: один кусок ответа на пачку.
+    """
+    async for batch in batches:
+        start = time.perf_counter()
+        chunk = b"".join(
+            orjson.dumps(_plain(item), default=_default) + b"\n" for item in batch
+        )
+        record_serialization(time.perf_counter() - start)
+        yield chunk
@@ -1,27 +1,84 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import (Row, delete, func, insert, literal, select, text,
+                        true, update)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
-from app.models.activity import Activity
-from app.services.tree import ActivityTreeService
+from app.crud.bulk import existing_ids, insert_rows, upsert_rows
+from app.crud.filters import changed_since, in_ids, keyset, stream_batches
+from app.models.activity import Activity, activity_closure
+from app.models.organization import Organization, organization_activities
+from app.services.cache import (ACTIVITIES_TAG, ACTIVITY_SUBTREES_TAG,
+                                ORGANIZATIONS_TAG, response_cache)
+from app.services.tree import activity_tree_cache
+from app.services.versions import table_versions
+
+# полное построение таблицы замыкания по parent_id
+REBUILD_CLOSURE_SQL = """
+INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM activities
+    UNION ALL
+    SELECT tree.ancestor_id, activities.id, tree.depth + 1
+    FROM tree
+    JOIN activities ON activities.parent_id = tree.descendant_id
+)
+SELECT ancestor_id, descendant_id, depth FROM tree
+"""
 
 
 class ActivityRepository:
     """
     Репозиторий для работы с сущностью Activity.
+    Вместе с activities поддерживает таблицу замыкания activity_closure.
+    Запись идёт операторами Core с RETURNING и возвращает строки
+    (id, name, parent_id); ORM-объект загружается только для выдачи
+    с детьми (get).
     """
 
     def __init__(self, session: AsyncSession):
         self._session = session
 
-    async def list(self) -> List[Activity]:
-        stmt = select(Activity).options(
-            selectinload(Activity.children)
+    async def list(
+            self,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[Row]:
+        async def load() -> List[Row]:
+            stmt = select(*self._columns())
+            stmt = keyset(stmt, Activity.id, limit, after_id)
+            result = await self._session.execute(stmt)
+            return result.all()
+
+        stamp = await table_versions.stamp(self._session, ("activities",))
+        return await response_cache.get_or_load(
+            f"activities:list:{limit}:{after_id}:{stamp}", (ACTIVITIES_TAG,), load
+        )
+
+    async def by_ids(self, activity_ids: Sequence[int]) -> List[Row]:
+        if not activity_ids:
+            return []
+        stmt = select(*self._columns()).where(
+            in_ids(self._session, Activity.id, activity_ids)
         )
         result = await self._session.execute(stmt)
-        return result.scalars().all()
+        return result.all()
+
+    async def export(
+            self,
+            updated_since: Optional[datetime] = None,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Все виды деятельности (или изменённые с updated_since) пачками
+        словарей, потоково.
+        """
+        stmt = select(Activity.id, Activity.name, Activity.parent_id, Activity.updated_at)
+        stmt = keyset(changed_since(stmt, Activity.updated_at, updated_since), Activity.id)
+        async for rows in stream_batches(self._session, stmt, batch_size):
+            yield [row._asdict() for row in rows]
 
     async def get(self, activity_id: int) -> Optional[Activity]:
         stmt = (
@@ -32,36 +89,220 @@ class ActivityRepository:
         result = await self._session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def create(self, activity: Activity) -> Activity:
-        self._session.add(activity)
+    async def create(self, data: dict) -> Row:
+        """
+        Создать вид деятельности: INSERT ... RETURNING и пути в таблице
+        замыкания, без повторного чтения созданной строки.
+        """
+        result = await self._session.execute(
+            insert(Activity).values(**data).returning(*self._columns())
+        )
+        row = result.one()
+        await self._session.execute(
+            insert(activity_closure).values(
+                ancestor_id=row.id, descendant_id=row.id, depth=0
+            )
+        )
+        await self._link_to_parent(row.id, row.parent_id)
         await self._session.commit()
-        await self._session.refresh(activity)
-        return activity
+        # у нового вида деятельности ещё нет организаций
+        await response_cache.invalidate(ACTIVITIES_TAG)
+        return row
 
-    async def update(self, activity_id: int, data: dict) -> Optional[Activity]:
-        activity = await self.get(activity_id)
-        if not activity:
+    async def update(self, activity_id: int, data: dict) -> Optional[Row]:
+        """
+        Изменить вид деятельности одним UPDATE ... RETURNING. Текущий
+        parent_id читается, только если запрошен перенос: нужна проверка
+        на цикл. None, если вида деятельности нет.
+        """
+        move = False
+        if "parent_id" in data:
+            result = await self._session.execute(
+                select(Activity.parent_id).where(Activity.id == activity_id)
+            )
+            current = result.one_or_none()
+            if current is None:
+                return None
+            move = data["parent_id"] != current.parent_id
+            if move and data["parent_id"] is not None:
+                subtree = await self._subtree_ids(activity_id)
+                if data["parent_id"] in subtree:
+                    raise ValueError("Activity cannot be moved under its own descendant")
+        result = await self._session.execute(
+            update(Activity)
+            .where(Activity.id == activity_id)
+            .values(**data)
+            .returning(*self._columns())
+        )
+        row = result.one_or_none()
+        if row is None:
+            await self._session.rollback()
             return None
-        for field, val in data.items():
-            setattr(activity, field, val)
-        self._session.add(activity)
+        if move:
+            await self._unlink_from_ancestors(activity_id)
+            await self._link_to_parent(activity_id, row.parent_id)
         await self._session.commit()
-        await self._session.refresh(activity)
-        return activity
+        if move:
+            await response_cache.invalidate(ACTIVITIES_TAG, ACTIVITY_SUBTREES_TAG)
+        else:
+            await response_cache.invalidate(ACTIVITIES_TAG)
+        return row
+
+    async def bulk_upsert(self, rows: List[dict]) -> List[int]:
+        """
+        Массовая запись видов деятельности. Родители должны идти раньше
+        потомков; таблица замыкания после записи пересобирается целиком.
+        Транзакцию фиксирует вызывающий, после фиксации —
+        after_bulk_commit().
+        """
+        keyed = [row for row in rows if row.get("id") is not None]
+        fresh = [{k: v for k, v in row.items() if k != "id"}
+                 for row in rows if row.get("id") is None]
+        await upsert_rows(self._session, Activity.__table__, keyed)
+        new_ids = iter(await insert_rows(self._session, Activity.__table__, fresh))
+        await self._fill_closure()
+        return [row["id"] if row.get("id") is not None else next(new_ids) for row in rows]
+
+    async def after_bulk_commit(self) -> None:
+        await response_cache.invalidate(ACTIVITIES_TAG, ACTIVITY_SUBTREES_TAG)
+
+    async def missing_ids(self, activity_ids: Sequence[int]) -> List[int]:
+        """
+        Какие из activity_ids не существуют — одним запросом на весь список.
+        """
+        wanted = set(activity_ids)
+        if not wanted:
+            return []
+        return sorted(wanted - await existing_ids(self._session, Activity.id, wanted))
+
+    async def ancestor_ids(self, activity_ids: Sequence[int]) -> List[int]:
+        """
+        Виды деятельности из activity_ids вместе со всеми их предками.
+        """
+        if not activity_ids:
+            return []
+        result = await self._session.execute(
+            select(activity_closure.c.ancestor_id).distinct().where(
+                in_ids(self._session, activity_closure.c.descendant_id, activity_ids)
+            )
+        )
+        return result.scalars().all()
+
+    async def parent_map(self) -> Dict[int, Optional[int]]:
+        """
+        parent_id всех видов деятельности одним запросом.
+        """
+        result = await self._session.execute(select(Activity.id, Activity.parent_id))
+        return dict(result.all())
 
     async def delete(self, activity_id: int) -> bool:
-        activity = await self.get(activity_id)
-        if not activity:
+        """
+        Удалить вид деятельности со всем поддеревом: связи организаций,
+        строки activities (RETURNING id) и пути замыкания — тремя DELETE
+        без загрузки поддерева для каскада ORM. Организации, потерявшие
+        связи, получают новый updated_at и попадают в инкрементальную выгрузку.
+        """
+        subtree = select(activity_closure.c.descendant_id).where(
+            activity_closure.c.ancestor_id == activity_id
+        ).scalar_subquery()
+        unlinked = await self._session.execute(
+            delete(organization_activities)
+            .where(organization_activities.c.activity_id.in_(subtree))
+            .returning(organization_activities.c.organization_id)
+        )
+        touched = sorted(set(unlinked.scalars().all()))
+        result = await self._session.execute(
+            delete(Activity).where(Activity.id.in_(subtree)).returning(Activity.id)
+        )
+        deleted = result.scalars().all()
+        if not deleted:
+            await self._session.rollback()
             return False
-        await self._session.delete(activity)
+        await self._session.execute(
+            delete(activity_closure).where(
+                in_ids(self._session, activity_closure.c.descendant_id, deleted)
+            )
+        )
+        if touched:
+            await self._session.execute(
+                update(Organization)
+                .where(in_ids(self._session, Organization.id, touched))
+                .values(updated_at=func.now())
+            )
         await self._session.commit()
+        await response_cache.invalidate(ACTIVITIES_TAG, ORGANIZATIONS_TAG)
         return True
 
     async def descendant_ids(self, root_id: int, max_level: int = 3) -> List[int]:
         """
-        Собирает ID корня и всех его потомков до указанной глубины,
-        с помощью ActivityTreeService.
+        Собирает ID корня и всех его потомков до указанной глубины
+        по закэшированному снимку дерева (если activities не менялись,
+        к БД идёт только запрос версии).
         """
-        all_acts = await self.list()
-        tree = ActivityTreeService(all_acts)
+        tree = await activity_tree_cache.get(self._session)
         return tree.gather_descendant_ids(root_id, max_level)
+
+    async def rebuild_closure(self) -> None:
+        """
+        Пересобрать таблицу замыкания по текущим parent_id.
+        Нужна после массовой загрузки activities в обход репозитория.
+        """
+        await self._fill_closure()
+        await self._session.commit()
+        await self.after_bulk_commit()
+
+    async def _fill_closure(self) -> None:
+        await self._session.execute(delete(activity_closure))
+        await self._session.execute(text(REBUILD_CLOSURE_SQL))
+
+    @staticmethod
+    def _columns():
+        return Activity.id, Activity.name, Activity.parent_id
+
+    async def _subtree_ids(self, activity_id: int) -> List[int]:
+        result = await self._session.execute(
+            select(activity_closure.c.descendant_id).where(
+                activity_closure.c.ancestor_id == activity_id
+            )
+        )
+        return result.scalars().all()
+
+    async def _link_to_parent(self, activity_id: int, parent_id: Optional[int]) -> None:
+        """
+        Связать поддерево activity_id со всеми предками parent_id.
+        """
+        if parent_id is None:
+            return
+
+        sup = aliased(activity_closure)
+        sub = aliased(activity_closure)
+        paths = (
+            select(
+                sup.c.ancestor_id,
+                sub.c.descendant_id,
+                sup.c.depth + sub.c.depth + literal(1),
+            )
+            # декартово произведение намеренное: каждый предок × каждый потомок
+            .select_from(sup.join(sub, true()))
+            .where(sup.c.descendant_id == parent_id)
+            .where(sub.c.ancestor_id == activity_id)
+        )
+        await self._session.execute(
+            insert(activity_closure).from_select(
+                ["ancestor_id", "descendant_id", "depth"], paths
+            )
+        )
+
+    async def _unlink_from_ancestors(self, activity_id: int) -> None:
+        """
+        Удалить пути от внешних предков activity_id в его поддерево.
+        Пути внутри поддерева остаются.
+        """
+        subtree = select(activity_closure.c.descendant_id).where(
+            activity_closure.c.ancestor_id == activity_id
+        ).scalar_subquery()
+        await self._session.execute(
+            delete(activity_closure)
+            .where(activity_closure.c.descendant_id.in_(subtree))
+            .where(activity_closure.c.ancestor_id.not_in(subtree))
+        )
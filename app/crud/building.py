@@ -1,22 +1,80 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Row, Select, delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.crud.bulk import insert_rows, upsert_rows
+from app.crud.filters import changed_since, in_ids, keyset, stream_batches
+from app.db.session import read_session
 from app.models.building import Building
+from app.models.organization import Organization, organization_activities
+from app.services.cache import (ACTIVITY_SUBTREES_TAG,
+                                building_organizations_tag, response_cache)
+from app.services.geosearch import GeoSearchService
+from app.services.ngram import organization_name_index
+from app.services.spatial_index import BuildingSpatialIndex, building_index
+from app.services.versions import table_versions
+
+INDEX_TABLE = "buildings"
 
 
 class BuildingRepository:
     """
     Репозиторий для работы с сущностью Building.
+    Геопоиск выполняется здесь: по пространственному индексу процесса,
+    если он не отстаёт от БД, иначе запросом к таблице buildings.
+    Создание, изменение и удаление здания сразу применяются к индексу.
+    Списки и результаты записи возвращаются строками Core
+    (id, address, latitude, longitude); запись идёт одним оператором
+    с RETURNING, без загрузки ORM-объекта.
     """
 
     def __init__(self, session: AsyncSession):
         self._session = session
+        self._geo = GeoSearchService()
+        # результат проверки индекса: одна на репозиторий (запрос)
+        self._index: Optional[BuildingSpatialIndex] = None
+        self._index_checked = False
 
-    async def list(self) -> List[Building]:
-        result = await self._session.execute(select(Building))
-        return result.scalars().all()
+    async def spatial_index(self) -> Optional[BuildingSpatialIndex]:
+        """
+        Пространственный индекс, если он построен не раньше текущей версии
+        buildings в БД; иначе None — геопоиск идёт запросом к buildings,
+        а индекс перестраивается в фоне. Версию обычно уже прочитал
+        условный GET, иначе — один запрос по первичному ключу.
+        """
+        if not self._index_checked:
+            versions = await table_versions.current(self._session, [INDEX_TABLE])
+            if building_index.is_fresh(versions[INDEX_TABLE].version):
+                self._index = building_index
+            else:
+                building_index.refresh(rebuild_spatial_index)
+            self._index_checked = True
+        return self._index
+
+    async def list(
+            self,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[Row]:
+        stmt = keyset(self._projection(), Building.id, limit, after_id)
+        result = await self._session.execute(stmt)
+        return result.all()
+
+    async def export(
+            self,
+            updated_since: Optional[datetime] = None,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Все здания (или изменённые с updated_since) пачками словарей,
+        потоково, без загрузки таблицы целиком.
+        """
+        stmt = self._projection().add_columns(Building.updated_at)
+        stmt = keyset(changed_since(stmt, Building.updated_at, updated_since), Building.id)
+        async for rows in stream_batches(self._session, stmt, batch_size):
+            yield [row._asdict() for row in rows]
 
     async def get(self, building_id: int) -> Optional[Building]:
         result = await self._session.execute(
@@ -24,27 +82,175 @@ class BuildingRepository:
         )
         return result.scalar_one_or_none()
 
-    async def create(self, building: Building) -> Building:
-        self._session.add(building)
+    async def create(self, data: dict) -> Row:
+        """
+        Создать здание одним INSERT ... RETURNING; возвращает строку выдачи.
+        """
+        result = await self._session.execute(
+            insert(Building).values(**data).returning(*self._projection().selected_columns)
+        )
+        row = result.one()
         await self._session.commit()
-        await self._session.refresh(building)
-        return building
+        building_index.apply_write(row.id, (row.latitude, row.longitude))
+        return row
 
-    async def update(self, building_id: int, data: dict) -> Optional[Building]:
-        building = await self.get(building_id)
-        if not building:
+    async def update(self, building_id: int, data: dict) -> Optional[Row]:
+        """
+        Изменить здание одним UPDATE ... RETURNING, без предварительной
+        загрузки; None, если здания нет.
+        """
+        result = await self._session.execute(
+            update(Building)
+            .where(Building.id == building_id)
+            .values(**data)
+            .returning(*self._projection().selected_columns)
+        )
+        row = result.one_or_none()
+        if row is None:
+            await self._session.rollback()
             return None
-        for field, val in data.items():
-            setattr(building, field, val)
-        self._session.add(building)
         await self._session.commit()
-        await self._session.refresh(building)
-        return building
+        building_index.apply_write(row.id, (row.latitude, row.longitude))
+        return row
+
+    async def bulk_upsert(self, rows: List[dict]) -> List[int]:
+        """
+        Массовая запись зданий: строки с id перезаписываются
+        (INSERT ... ON CONFLICT), без id — создаются. Возвращает id
+        в порядке строк. Транзакцию фиксирует вызывающий.
+        Индекс к пачке не применяется: он отстанет и перестроится.
+        """
+        keyed = [row for row in rows if row.get("id") is not None]
+        fresh = [{k: v for k, v in row.items() if k != "id"}
+                 for row in rows if row.get("id") is None]
+        await upsert_rows(self._session, Building.__table__, keyed)
+        new_ids = iter(await insert_rows(self._session, Building.__table__, fresh))
+        return [row["id"] if row.get("id") is not None else next(new_ids) for row in rows]
 
     async def delete(self, building_id: int) -> bool:
-        building = await self.get(building_id)
-        if not building:
+        """
+        Удалить здание вместе с его организациями и их связями — тремя
+        DELETE в одной транзакции, без загрузки объектов для каскада ORM.
+        """
+        orgs = select(Organization.id).where(Organization.building_id == building_id)
+        await self._session.execute(
+            delete(organization_activities)
+            .where(organization_activities.c.organization_id.in_(orgs.scalar_subquery()))
+        )
+        result = await self._session.execute(
+            delete(Organization)
+            .where(Organization.building_id == building_id)
+            .returning(Organization.id)
+        )
+        org_ids = result.scalars().all()
+        result = await self._session.execute(
+            delete(Building).where(Building.id == building_id).returning(Building.id)
+        )
+        if result.scalar_one_or_none() is None:
+            await self._session.rollback()
             return False
-        await self._session.delete(building)
         await self._session.commit()
+        building_index.apply_write(building_id, None)
+        for org_id in org_ids:
+            organization_name_index.remove(org_id)
+        # организации здания пропали и из выборок по видам деятельности;
+        # выдача организаций не содержит полей здания, поэтому создание
+        # и изменение зданий кэш не трогают
+        await response_cache.invalidate(
+            building_organizations_tag(building_id), ACTIVITY_SUBTREES_TAG
+        )
         return True
+
+    async def by_ids(
+            self,
+            building_ids: List[int],
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[Row]:
+        if not building_ids:
+            return []
+        stmt = self._projection().where(in_ids(self._session, Building.id, building_ids))
+        stmt = keyset(stmt, Building.id, limit, after_id)
+        result = await self._session.execute(stmt)
+        return result.all()
+
+    async def in_radius(
+            self,
+            center: Tuple[float, float],
+            radius_km: float,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[Row]:
+        index = await self.spatial_index()
+        if index is not None:
+            ids = index.ids_in_radius(center, radius_km)
+            return await self.by_ids(ids, limit, after_id)
+        stmt = self._projection().where(self.radius_clause(center, radius_km))
+        stmt = keyset(stmt, Building.id, limit, after_id)
+        result = await self._session.execute(stmt)
+        return result.all()
+
+    async def in_bbox(
+            self,
+            sw: Tuple[float, float],
+            ne: Tuple[float, float],
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[Row]:
+        index = await self.spatial_index()
+        if index is not None:
+            ids = index.ids_in_bbox(sw, ne)
+            return await self.by_ids(ids, limit, after_id)
+        stmt = self._projection().where(self.bbox_clause(sw, ne))
+        stmt = keyset(stmt, Building.id, limit, after_id)
+        result = await self._session.execute(stmt)
+        return result.all()
+
+    async def ids_in_radius(self, center: Tuple[float, float], radius_km: float) -> List[int]:
+        index = await self.spatial_index()
+        if index is not None:
+            return index.ids_in_radius(center, radius_km)
+        result = await self._session.execute(
+            select(Building.id).where(self.radius_clause(center, radius_km))
+        )
+        return result.scalars().all()
+
+    async def ids_in_bbox(self, sw: Tuple[float, float], ne: Tuple[float, float]) -> List[int]:
+        index = await self.spatial_index()
+        if index is not None:
+            return index.ids_in_bbox(sw, ne)
+        result = await self._session.execute(
+            select(Building.id).where(self.bbox_clause(sw, ne))
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    def _projection() -> Select:
+        return select(
+            Building.id, Building.address, Building.latitude, Building.longitude
+        )
+
+    def radius_clause(self, center: Tuple[float, float], radius_km: float):
+        return self._geo.radius_clause(
+            Building.latitude, Building.longitude, center, radius_km
+        )
+
+    def distance_clause(self, center: Tuple[float, float]):
+        return self._geo.distance_clause(Building.latitude, Building.longitude, center)
+
+    def bbox_clause(self, sw: Tuple[float, float], ne: Tuple[float, float]):
+        return self._geo.bbox_clause(
+            Building.latitude, Building.longitude, sw, ne
+        )
+
+
+async def rebuild_spatial_index() -> None:
+    """
+    Перестроить пространственный индекс по текущему состоянию БД.
+    Версия читается до зданий: запись во время чтения оставит индекс
+    отставшим, и он перестроится снова.
+    """
+    async with read_session() as session:
+        versions = await table_versions.fetch(session, [INDEX_TABLE])
+        buildings = await BuildingRepository(session).list()
+    building_index.build(buildings, versions[INDEX_TABLE].version)
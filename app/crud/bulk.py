@@ -0,0 +1,87 @@
+from typing import List, Sequence, Set
+
+from sqlalchemy import Table, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.filters import in_ids
+
+# строк в одном многострочном INSERT: колонок у справочников немного,
+# так что до лимита asyncpg в 32767 параметров далеко
+CHUNK_SIZE = 1000
+
+
+def _chunks(rows: Sequence[dict], size: int = CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def upsert_rows(session: AsyncSession, table: Table, rows: Sequence[dict]) -> None:
+    """
+    Многострочный INSERT ... ON CONFLICT (id) DO UPDATE: строки с уже
+    существующим id перезаписываются, updated_at обновляется.
+    """
+    if not rows:
+        return
+    dialect = session.bind.dialect.name
+    dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    for chunk in _chunks(rows):
+        stmt = dialect_insert(table).values(list(chunk))
+        updated = {
+            name: stmt.excluded[name]
+            for name in chunk[0]
+            if name != "id"
+        }
+        if "updated_at" in table.c:
+            updated["updated_at"] = func.now()
+        await session.execute(
+            stmt.on_conflict_do_update(index_elements=[table.c.id], set_=updated)
+        )
+    await _sync_sequence(session, table)
+
+
+async def insert_rows(session: AsyncSession, table: Table, rows: Sequence[dict]) -> List[int]:
+    """
+    Вставить строки без id пачками; вернуть новые id в порядке строк.
+    """
+    ids: List[int] = []
+    for chunk in _chunks(rows):
+        result = await session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            list(chunk),
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+async def insert_with_ids(session: AsyncSession, table: Table, rows: Sequence[dict]) -> None:
+    """
+    Вставить строки с заранее назначенными id пачками (executemany),
+    без RETURNING и ON CONFLICT — для заливки в пустые диапазоны id.
+    """
+    if not rows:
+        return
+    for chunk in _chunks(rows):
+        await session.execute(insert(table), list(chunk))
+    if "id" in rows[0]:
+        await _sync_sequence(session, table)
+
+
+async def _sync_sequence(session: AsyncSession, table: Table) -> None:
+    if session.bind.dialect.name == "postgresql":
+        # явные id не двигают sequence — подтягиваем её к max(id)
+        await session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT max(id) FROM {table.name}))"
+        ))
+
+
+async def existing_ids(session: AsyncSession, column, ids: Sequence[int]) -> Set[int]:
+    """
+    Какие из ids есть в таблице — один запрос на пачку.
+    """
+    found: Set[int] = set()
+    for chunk in _chunks(list(ids), 10_000):
+        result = await session.execute(select(column).where(in_ids(session, column, chunk)))
+        found.update(result.scalars().all())
+    return found
@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Integer, Row, Select, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def in_ids(session: AsyncSession, column, ids: Sequence[int]) -> ColumnElement:
+    """
+    Условие column IN (ids) для произвольно длинного списка ID.
+    В PostgreSQL список передаётся одним параметром-массивом (= ANY),
+    иначе asyncpg упирается в лимит 32767 параметров на запрос.
+    """
+    if session.bind.dialect.name == "postgresql":
+        return column == any_(
+            bindparam(None, list(ids), type_=ARRAY(Integer))
+        )
+    return column.in_(list(ids))
+
+
+def keyset(stmt: Select, column, limit: Optional[int] = None,
+           after: Optional[Any] = None) -> Select:
+    """
+    Keyset-пагинация: строки с column > after по возрастанию column,
+    не более limit штук. Без параметров — все строки по порядку.
+    """
+    if after is not None:
+        stmt = stmt.where(column > after)
+    stmt = stmt.order_by(column)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    """
+    Экранировать спецсимволы LIKE, чтобы строка искалась буквально.
+    """
+    return (
+        value.replace(escape, escape * 2)
+        .replace("%", escape + "%")
+        .replace("_", escape + "_")
+    )
+
+
+def changed_since(stmt: Select, column, since: Optional[datetime]) -> Select:
+    """
+    Строки, изменённые не раньше since (column — updated_at таблицы).
+    Граница включается: повторная выгрузка с тем же since безопасна.
+
+    updated_at = now() — время начала транзакции, а не фиксации:
+    транзакция, начатая до прошлой выгрузки и зафиксированная после неё,
+    получит updated_at раньше since и в следующую выгрузку не попадёт.
+    Поэтому клиент передаёт since с запасом — начало прошлой выгрузки
+    минус самая долгая пишущая транзакция (EXPORT_OVERLAP в export.py),
+    а повторы отбрасывает по id.
+    """
+    if since is not None:
+        stmt = stmt.where(column >= since)
+    return stmt
+
+
+async def stream_batches(
+        session: AsyncSession,
+        stmt: Select,
+        batch_size: int,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Читать результат серверным курсором пачками по batch_size строк,
+    не загружая всю выборку в память.
+    """
+    result = await session.stream(stmt.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
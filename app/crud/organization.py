@@ -1,13 +1,105 @@
-from typing import List, Optional, Tuple
+import json
+from datetime import datetime
+from typing import (Any, AsyncIterator, Iterable, List, NamedTuple, Optional,
+                    Sequence, Tuple)
 
-from sqlalchemy import select
+from sqlalchemy import (Select, and_, delete, func, insert, or_, select,
+                        update)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.models.activity import Activity
-from app.models.organization import Organization
-from app.services.geosearch import GeoSearchService
-from app.services.tree import ActivityTreeService
+from app.crud.activity import ActivityRepository
+from app.crud.building import BuildingRepository
+from app.crud.bulk import CHUNK_SIZE, insert_rows, upsert_rows
+from app.crud.filters import (changed_since, escape_like, in_ids, keyset,
+                              stream_batches)
+from app.models.activity import activity_closure
+from app.models.building import Building
+from app.models.organization import Organization, organization_activities
+from app.services.cache import (ACTIVITY_SUBTREES_TAG, ORGANIZATIONS_TAG,
+                                activity_organizations_tag,
+                                building_organizations_tag, response_cache)
+from app.services.ngram import organization_name_index
+from app.services.spatial_index import BuildingSpatialIndex
+from app.services.versions import table_versions
+
+
+class OrganizationRow(NamedTuple):
+    """
+    Организация в виде готовых к выдаче колонок (форма OrganizationOut),
+    без ORM-объектов и связей.
+    """
+    id: int
+    name: str
+    phone_numbers: List[str]
+    building_id: int
+    activity_ids: List[int]
+
+
+class OrganizationQuery:
+    """
+    Построитель одного SQL-запроса организаций из нескольких фильтров
+    (здание, поддерево видов деятельности, геозона, название).
+    Условия соединяются через AND; порядок их проверки выбирает
+    планировщик СУБД по статистике, а не порядок добавления.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+        self._predicates: List[object] = []
+        self._empty = False
+
+    @property
+    def empty(self) -> bool:
+        """
+        Результат заведомо пуст (например, в геозоне нет зданий).
+        """
+        return self._empty
+
+    def building(self, building_id: int) -> "OrganizationQuery":
+        self._predicates.append(Organization.building_id == building_id)
+        return self
+
+    def activity(self, root_activity_id: int, max_level: int = 3) -> "OrganizationQuery":
+        matching = (
+            select(organization_activities.c.organization_id)
+            .join(
+                activity_closure,
+                activity_closure.c.descendant_id == organization_activities.c.activity_id,
+            )
+            .where(activity_closure.c.ancestor_id == root_activity_id)
+            .where(activity_closure.c.depth < max_level)
+        )
+        self._predicates.append(Organization.id.in_(matching))
+        return self
+
+    def building_ids(self, ids: List[int]) -> "OrganizationQuery":
+        """
+        Организации из уже найденного набора зданий (например,
+        по пространственному индексу).
+        """
+        if not ids:
+            self._empty = True
+            return self
+        self._predicates.append(in_ids(self._session, Organization.building_id, ids))
+        return self
+
+    def buildings_where(self, condition) -> "OrganizationQuery":
+        """
+        Организации, чьё здание удовлетворяет условию на buildings.
+        """
+        self._predicates.append(
+            Organization.building_id.in_(select(Building.id).where(condition))
+        )
+        return self
+
+    def name(self, name_substr: str) -> "OrganizationQuery":
+        self._predicates.append(
+            Organization.name.ilike(f"%{escape_like(name_substr)}%", escape="\\")
+        )
+        return self
+
+    def statement(self, base: Select) -> Select:
+        return base.where(*self._predicates)
 
 
 class OrganizationRepository:
@@ -15,120 +107,470 @@ class OrganizationRepository:
     Репозиторий для работы с сущностью Organization.
     """
 
+    # начальный радиус кольца поиска ближайших зданий по индексу, км
+    NEAREST_START_RADIUS_KM: float = 1.0
+
     def __init__(self, session: AsyncSession):
         self._session = session
-        self._geo = GeoSearchService()
-        self._tree_cls = ActivityTreeService
+        self._buildings = BuildingRepository(session)
 
-    async def list(self) -> List[Organization]:
-        stmt = (
-            select(Organization)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities).selectinload(Activity.children),
-            )
+    async def export(
+            self,
+            updated_since: Optional[datetime] = None,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Все организации (или изменённые с updated_since) пачками словарей
+        формы OrganizationOut плюс updated_at, потоково.
+        """
+        stmt = self._projection().add_columns(Organization.updated_at)
+        stmt = keyset(
+            changed_since(stmt, Organization.updated_at, updated_since),
+            Organization.id,
         )
-        result = await self._session.execute(stmt)
-        return result.scalars().all()
+        async for rows in stream_batches(self._session, stmt, batch_size):
+            yield [
+                {**self._to_row(row)._asdict(), "updated_at": row.updated_at}
+                for row in rows
+            ]
 
-    async def get(self, org_id: int) -> Optional[Organization]:
-        stmt = (
-            select(Organization)
-            .where(Organization.id == org_id)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities).selectinload(Activity.children),
-            )
+    async def by_ids(self, org_ids: Sequence[int]) -> List[OrganizationRow]:
+        """
+        Организации по списку ID одним запросом (порядок не гарантирован).
+        """
+        if not org_ids:
+            return []
+        stmt = self._projection().where(in_ids(self._session, Organization.id, org_ids))
+        return await self._fetch_rows(stmt)
+
+    async def get_row(self, org_id: int) -> Optional[OrganizationRow]:
+        rows = await self._fetch_rows(
+            self._projection().where(Organization.id == org_id)
         )
-        result = await self._session.execute(stmt)
-        return result.scalar_one_or_none()
+        return rows[0] if rows else None
 
-    async def create(self, org: Organization) -> Organization:
-        self._session.add(org)
+    async def create(self, data: dict, activity_ids: Sequence[int] = ()) -> OrganizationRow:
+        """
+        Создать организацию: INSERT ... RETURNING и вставка связей.
+        Строка выдачи собирается из ответа INSERT и переданных связей,
+        без повторного чтения.
+        """
+        result = await self._session.execute(
+            insert(Organization).values(**data).returning(*self._columns())
+        )
+        row = result.one()
+        wanted = list(dict.fromkeys(activity_ids))
+        await self._link_activities(row.id, wanted)
         await self._session.commit()
-        await self._session.refresh(org)
-        return org
+        await self._invalidate([row.building_id], wanted)
+        if organization_name_index.ready:
+            organization_name_index.upsert(row.id, row.name)
+        return OrganizationRow(row.id, row.name, row.phone_numbers, row.building_id, wanted)
 
-    async def update(self, org_id: int, data: dict) -> Optional[Organization]:
-        org = await self.get(org_id)
-        if not org:
+    async def update(self, org_id: int, data: dict) -> Optional[OrganizationRow]:
+        """
+        Изменить организацию одним UPDATE ... RETURNING, который заодно
+        возвращает прежние связи; связи затем приводятся к activity_ids
+        разницей. None, если организации нет.
+        """
+        activity_ids = data.pop("activity_ids", None)
+        building_ids = set()
+        if "building_id" in data and response_cache.enabled:
+            # прежнее здание нужно только для сброса кэша
+            building_ids.update((await self._session.execute(
+                select(Organization.building_id).where(Organization.id == org_id)
+            )).scalars())
+        # смена одних только связей тоже отмечается в updated_at
+        result = await self._session.execute(
+            update(Organization)
+            .where(Organization.id == org_id)
+            .values(**data)
+            .returning(*self._columns(), self._activity_ids_column())
+        )
+        row = result.one_or_none()
+        if row is None:
+            await self._session.rollback()
             return None
-        if "activity_ids" in data:
-            ids = data.pop("activity_ids")
-            org.activities = [Activity(id=i) for i in ids]
-        for field, val in data.items():
-            setattr(org, field, val)
-        self._session.add(org)
+        org = self._to_row(row)
+        affected = set(org.activity_ids)
+        if activity_ids is not None:
+            await self._replace_activities(org_id, org.activity_ids, activity_ids)
+            affected.update(activity_ids)
+            org = org._replace(activity_ids=list(dict.fromkeys(activity_ids)))
         await self._session.commit()
-        await self._session.refresh(org)
+        building_ids.add(org.building_id)
+        await self._invalidate(building_ids, affected)
+        if organization_name_index.ready:
+            organization_name_index.upsert(org.id, org.name)
         return org
 
+    async def bulk_upsert(self, rows: List[dict]) -> List[int]:
+        """
+        Массовая запись организаций вместе со связями: строки с id
+        перезаписываются, без id — создаются. Связи с видами деятельности
+        у записанных организаций заменяются на переданные.
+        Транзакцию фиксирует вызывающий, после фиксации —
+        after_bulk_commit().
+        """
+        columns = [
+            {k: v for k, v in row.items() if k != "activity_ids"}
+            for row in rows
+        ]
+        keyed = [row for row in columns if row.get("id") is not None]
+        fresh = [{k: v for k, v in row.items() if k != "id"}
+                 for row in columns if row.get("id") is None]
+        await upsert_rows(self._session, Organization.__table__, keyed)
+        new_ids = iter(await insert_rows(self._session, Organization.__table__, fresh))
+        ids = [row["id"] if row.get("id") is not None else next(new_ids) for row in rows]
+
+        link = organization_activities
+        for start in range(0, len(ids), CHUNK_SIZE):
+            await self._session.execute(
+                delete(link).where(
+                    in_ids(self._session, link.c.organization_id, ids[start:start + CHUNK_SIZE])
+                )
+            )
+        links = [
+            {"organization_id": org_id, "activity_id": act_id}
+            for org_id, row in zip(ids, rows)
+            for act_id in dict.fromkeys(row["activity_ids"])
+        ]
+        for start in range(0, len(links), CHUNK_SIZE):
+            await self._session.execute(insert(link).values(links[start:start + CHUNK_SIZE]))
+        return ids
+
+    async def after_bulk_commit(self, ids: List[int], rows: List[dict]) -> None:
+        await response_cache.invalidate(ORGANIZATIONS_TAG)
+        if organization_name_index.ready:
+            for org_id, row in zip(ids, rows):
+                organization_name_index.upsert(org_id, row["name"])
+
+    async def _link_activities(self, org_id: int, activity_ids: Iterable[int]) -> None:
+        rows = [{"organization_id": org_id, "activity_id": act_id} for act_id in activity_ids]
+        if rows:
+            await self._session.execute(insert(organization_activities).values(rows))
+
+    async def _replace_activities(
+            self,
+            org_id: int,
+            current: Sequence[int],
+            activity_ids: Sequence[int],
+    ) -> None:
+        """
+        Привести связи организации от current к activity_ids разницей:
+        удаляются только убранные связи, вставляются только новые.
+        """
+        link = organization_activities.c
+        current = set(current)
+        wanted = dict.fromkeys(activity_ids)
+        removed = current.difference(wanted)
+        if removed:
+            await self._session.execute(
+                delete(organization_activities)
+                .where(link.organization_id == org_id)
+                .where(in_ids(self._session, link.activity_id, sorted(removed)))
+            )
+        await self._link_activities(org_id, [i for i in wanted if i not in current])
+
     async def delete(self, org_id: int) -> bool:
-        org = await self.get(org_id)
-        if not org:
+        """
+        Удалить организацию двумя DELETE ... RETURNING: связи (их виды
+        деятельности нужны для сброса кэша) и саму строку (её здание).
+        """
+        link = organization_activities.c
+        result = await self._session.execute(
+            delete(organization_activities)
+            .where(link.organization_id == org_id)
+            .returning(link.activity_id)
+        )
+        activity_ids = result.scalars().all()
+        result = await self._session.execute(
+            delete(Organization)
+            .where(Organization.id == org_id)
+            .returning(Organization.building_id)
+        )
+        building_id = result.scalar_one_or_none()
+        if building_id is None:
+            await self._session.rollback()
             return False
-        await self._session.delete(org)
         await self._session.commit()
+        organization_name_index.remove(org_id)
+        await self._invalidate([building_id], activity_ids)
         return True
 
-    async def by_building(self, building_id: int) -> List[Organization]:
-        stmt = (
-            select(Organization)
-            .where(Organization.building_id == building_id)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities).selectinload(Activity.children),
-            )
+    async def _invalidate(self, building_ids: Iterable[int], activity_ids: Iterable[int]) -> None:
+        """
+        Сбросить кэш выборок, где могла быть изменённая организация:
+        по её зданиям и по поддеревьям всех предков её видов деятельности.
+        """
+        if not response_cache.enabled:
+            return
+        ancestors = await ActivityRepository(self._session).ancestor_ids(list(activity_ids))
+        await response_cache.invalidate(
+            *(building_organizations_tag(building_id) for building_id in building_ids),
+            *(activity_organizations_tag(activity_id) for activity_id in ancestors),
+        )
+
+    async def by_building(
+            self,
+            building_id: int,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[OrganizationRow]:
+        async def load() -> List[OrganizationRow]:
+            return await self.query(building_id=building_id, limit=limit, after_id=after_id)
+
+        stamp = await table_versions.stamp(self._session, ("organizations",))
+        return await response_cache.get_or_load(
+            f"organizations:building:{building_id}:{limit}:{after_id}:{stamp}",
+            (ORGANIZATIONS_TAG, building_organizations_tag(building_id)),
+            load,
         )
-        result = await self._session.execute(stmt)
-        return result.scalars().all()
 
     async def by_activity(
             self,
             root_activity_id: int,
-            max_level: int = 3
-    ) -> List[Organization]:
+            max_level: int = 3,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None
+    ) -> List[OrganizationRow]:
+        """
+        Организации с видом деятельности из поддерева root_activity_id
+        (до глубины max_level включительно) — один запрос через
+        таблицу замыкания.
+        """
+        async def load() -> List[OrganizationRow]:
+            return await self.query(activity_id=root_activity_id, max_level=max_level,
+                                    limit=limit, after_id=after_id)
 
-        stmt_acts = select(Activity).options(
-            selectinload(Activity.children)
-            .selectinload(Activity.children)
+        stamp = await table_versions.stamp(self._session, ("organizations", "activities"))
+        return await response_cache.get_or_load(
+            f"organizations:activity:{root_activity_id}:{max_level}:{limit}:{after_id}:{stamp}",
+            (ORGANIZATIONS_TAG, ACTIVITY_SUBTREES_TAG, activity_organizations_tag(root_activity_id)),
+            load,
         )
-        all_acts = (await self._session.execute(stmt_acts)).scalars().all()
 
-        tree = self._tree_cls(all_acts)
-        ids = tree.gather_descendant_ids(root_activity_id, max_level)
-        if not ids:
+    async def query(
+            self,
+            name: Optional[str] = None,
+            center: Optional[Tuple[float, float]] = None,
+            radius_km: Optional[float] = None,
+            sw: Optional[Tuple[float, float]] = None,
+            ne: Optional[Tuple[float, float]] = None,
+            activity_id: Optional[int] = None,
+            max_level: int = 3,
+            building_id: Optional[int] = None,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None,
+    ) -> List[OrganizationRow]:
+        """
+        Организации, удовлетворяющие всем заданным фильтрам сразу,
+        одним запросом с keyset-пагинацией.
+        """
+        q = OrganizationQuery(self._session)
+        if building_id is not None:
+            q.building(building_id)
+        if activity_id is not None:
+            q.activity(activity_id, max_level)
+        if center is not None and radius_km is not None:
+            index = await self._buildings.spatial_index()
+            self._geo_filter(q, index, self._buildings.radius_clause(center, radius_km),
+                             lambda: index.ids_in_radius(center, radius_km))
+        if sw is not None and ne is not None:
+            index = await self._buildings.spatial_index()
+            self._geo_filter(q, index, self._buildings.bbox_clause(sw, ne),
+                             lambda: index.ids_in_bbox(sw, ne))
+        if name:
+            q.name(name)
+        if q.empty:
             return []
 
+        stmt = keyset(q.statement(self._projection()), Organization.id, limit, after_id)
+        return await self._fetch_rows(stmt)
+
+    @staticmethod
+    def _geo_filter(
+            q: OrganizationQuery,
+            index: Optional[BuildingSpatialIndex],
+            condition,
+            index_lookup,
+    ) -> None:
+        """
+        Геофильтр: по индексу процесса, если он не отстаёт от БД,
+        иначе подзапросом к buildings.
+        """
+        if index is not None:
+            q.building_ids(index_lookup())
+        else:
+            q.buildings_where(condition)
+
+    async def nearest(
+            self,
+            center: Tuple[float, float],
+            limit: int,
+            after: Optional[Tuple[float, int]] = None,
+            activity_ids: Optional[List[int]] = None
+    ) -> List[Tuple[OrganizationRow, float]]:
+        """
+        Ближайшие к центру организации, упорядоченные по (расстояние, id),
+        одним запросом с ORDER BY ... LIMIT. Расстояние считает БД одной
+        формулой и для выдачи, и для сортировки, и для курсора.
+        Если пространственный индекс актуален, запрос ограничивается кругом
+        до limit-го ближайшего здания за курсором (префильтр по индексу
+        координат); если в круге организаций не хватило (здания без
+        подходящих организаций), а вне круга здания есть — второй запрос
+        без ограничения.
+        :param after: ключ (расстояние, id) последнего элемента прошлой страницы
+        :param activity_ids: оставить только организации с этими видами деятельности
+        :return: пары (организация, расстояние в км)
+        """
+        distance = self._buildings.distance_clause(center)
         stmt = (
-            select(Organization)
-            .distinct(Organization.id)
-            .join(Organization.activities)
-            .where(Activity.id.in_(ids))
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities)
-            )
+            self._projection()
+            .add_columns(distance.label("distance_km"))
+            .join(Building, Building.id == Organization.building_id)
         )
-        result = await self._session.execute(stmt)
-        return result.scalars().all()
+        if activity_ids is not None:
+            link = organization_activities.c
+            stmt = stmt.where(Organization.id.in_(
+                select(link.organization_id)
+                .where(in_ids(self._session, link.activity_id, activity_ids))
+            ))
+        if after is not None:
+            stmt = stmt.where(or_(
+                distance > after[0],
+                and_(distance == after[0], Organization.id > after[1]),
+            ))
+        stmt = stmt.order_by(distance, Organization.id).limit(limit)
 
-    async def in_radius(self, center: Tuple[float, float], radius_km: float) -> List[Organization]:
-        orgs = await self.list()
-        return self._geo.filter_by_radius(orgs, center, radius_km)
+        index = await self._buildings.spatial_index()
+        bound = None
+        if index is not None:
+            bound = index.nearest_distance(
+                center, limit, after[0] if after is not None else 0.0,
+                self.NEAREST_START_RADIUS_KM,
+            )
+        if bound is None:
+            rows = (await self._session.execute(stmt)).all()
+            return [(self._to_row(row), row.distance_km) for row in rows]
 
-    async def in_bbox(self, sw: Tuple[float, float], ne: Tuple[float, float]) -> List[Organization]:
-        orgs = await self.list()
-        return self._geo.filter_by_bbox(orgs, sw, ne)
+        # запас на расхождение формулы в Python и в БД
+        bound = bound * (1 + 1e-9) + 1e-6
+        rows = (await self._session.execute(
+            stmt.where(self._buildings.radius_clause(center, bound))
+        )).all()
+        if len(rows) < limit and len(index.ids_in_radius(center, bound)) < len(index):
+            rows = (await self._session.execute(stmt)).all()
+        return [(self._to_row(row), row.distance_km) for row in rows]
 
-    async def search_by_name(self, name_substr: str) -> List[Organization]:
-        stmt = (
-            select(Organization)
-            .where(Organization.name.ilike(f"%{name_substr}%"))
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities).selectinload(Activity.children),
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[OrganizationRow, float]]:
+        """
+        Ранжированный поиск по названию: подстрока или нечёткое совпадение,
+        по убыванию сходства. В PostgreSQL использует GIN-индекс pg_trgm,
+        в остальных СУБД — триграммный индекс в памяти процесса.
+        :return: пары (организация, сходство от 0 до 1)
+        """
+        if self._dialect == "postgresql":
+            score = func.similarity(Organization.name, query)
+            stmt = (
+                self._projection()
+                .add_columns(score.label("score"))
+                .where(or_(
+                    Organization.name.ilike(f"%{escape_like(query)}%", escape="\\"),
+                    Organization.name.op("%")(query),
+                ))
+                .order_by(score.desc(), Organization.id)
+                .limit(limit)
             )
+            rows = (await self._session.execute(stmt)).all()
+            return [(self._to_row(row), row.score) for row in rows]
+
+        index = await self._name_index()
+        ranked = index.search(query, limit)
+        orgs = {org.id: org for org in await self.by_ids([org_id for org_id, _ in ranked])}
+        return [(orgs[org_id], score) for org_id, score in ranked if org_id in orgs]
+
+    async def autocomplete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Пары (id, название) организаций, чьё название начинается с prefix,
+        по алфавиту. В PostgreSQL — индекс lower(name) text_pattern_ops.
+        """
+        if self._dialect == "postgresql":
+            lowered = func.lower(Organization.name)
+            stmt = (
+                select(Organization.id, Organization.name)
+                .where(lowered.like(f"{escape_like(prefix.lower())}%", escape="\\"))
+                .order_by(lowered, Organization.id)
+                .limit(limit)
+            )
+            return [tuple(row) for row in (await self._session.execute(stmt)).all()]
+
+        index = await self._name_index()
+        ids = index.prefix(prefix, limit)
+        rows = (await self._session.execute(
+            select(Organization.id, Organization.name)
+            .where(in_ids(self._session, Organization.id, ids))
+        )).all() if ids else []
+        names = dict(rows)
+        return [(org_id, names[org_id]) for org_id in ids if org_id in names]
+
+    def _projection(self) -> Select:
+        """
+        Колонки OrganizationOut без ORM-объектов: activity_ids
+        агрегируются в SQL коррелированным подзапросом.
+        """
+        return select(*self._columns(), self._activity_ids_column())
+
+    @staticmethod
+    def _columns():
+        return (
+            Organization.id,
+            Organization.name,
+            Organization.phone_numbers,
+            Organization.building_id,
+        )
+
+    def _activity_ids_column(self):
+        link = organization_activities.c
+        if self._dialect == "postgresql":
+            aggregated = func.array_agg(link.activity_id)
+        else:
+            aggregated = func.json_group_array(link.activity_id)
+        return (
+            select(aggregated)
+            .where(link.organization_id == Organization.id)
+            .scalar_subquery()
+            .label("activity_ids")
         )
+
+    async def _fetch_rows(self, stmt: Select) -> List[OrganizationRow]:
         result = await self._session.execute(stmt)
-        return result.scalars().all()
+        return [self._to_row(row) for row in result]
+
+    @staticmethod
+    def _to_row(row: Any) -> OrganizationRow:
+        activity_ids = row.activity_ids
+        if isinstance(activity_ids, str):
+            activity_ids = json.loads(activity_ids)
+        return OrganizationRow(
+            row.id,
+            row.name,
+            row.phone_numbers,
+            row.building_id,
+            activity_ids or [],
+        )
+
+    @property
+    def _dialect(self) -> str:
+        return self._session.bind.dialect.name
+
+    async def _name_index(self):
+        """
+        Триграммный индекс названий; строится при первом обращении.
+        """
+        if not organization_name_index.ready:
+            rows = await self._session.execute(
+                select(Organization.id, Organization.name)
+            )
+            organization_name_index.build(rows.all())
+        return organization_name_index
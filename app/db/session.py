@@ -1,19 +1,96 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from fastapi import Request
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.core.metrics import record_query
+
+slow_query_logger = logging.getLogger("app.db.slow_query")
+replica_logger = logging.getLogger("app.db.replicas")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений со счётчиками ожиданий: сколько раз запрос соединения
+    застал пул исчерпанным, сколько всего ждали и сколько раз
+    не дождались (pool_timeout).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        # запросы соединения, ещё не получившие его
+        self._pending = 0
+
+    def connect(self):
+        # в асинхронном пуле соединение забирается из очереди не сразу,
+        # поэтому учитываем и тех, кто уже стоит за ним
+        capacity = self.size() + self._max_overflow
+        waiting = self._max_overflow > -1 and self.checkedout() + self._pending >= capacity
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self._pending -= 1
+            if waiting:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": settings.db_echo, "future": True}
+    # у SQLite свои пулы (Static/Null), параметры QueuePool к ним не подходят
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    return options
+
+
+engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url))
+
+# реплики только для чтения; без них все сессии идут в primary
+replica_engines: List[AsyncEngine] = [
+    create_async_engine(url, **_engine_options(url))
+    for url in settings.replica_urls
+]
+
+
+class AppSession(Session):
+    """
+    Синхронная сессия приложения: события сессий вешаются на неё,
+    а не на весь класс Session, чтобы не ловить чужие сессии процесса.
+    """
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=True,
-    future=True,
-)
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=AppSession,
     expire_on_commit=False,
     autoflush=False,
     future=True,
@@ -21,7 +98,209 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+# сервер, выбранный для чтений запроса
+READ_ENGINE_STATE_KEY = "db_read_engine"
+# заголовок, которым клиент просит читать с primary (свои только что
+# сделанные записи), например сразу после POST/PUT
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# версии таблиц, прочитанные условным GET запроса (request.state),
+# и они же в info сессий чтения этого запроса
+VERSIONS_KEY = "data_versions"
+
+
+class ReplicaRouter:
+    """
+    Выбор движка для чтения. Реплики перебираются по кругу; реплика,
+    к которой не удалось подключиться, исключается на
+    replica_retry_seconds. Если исправных реплик нет — primary.
+    Чтение своих записей закрепляется за primary на уровне запроса
+    (см. read_session), а не здесь.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: List[AsyncEngine]):
+        self._primary = primary
+        self._replicas = replicas
+        self._turn = itertools.count()
+        self._down_until: Dict[AsyncEngine, float] = {}
+
+    def candidates(self) -> List[AsyncEngine]:
+        """
+        Движки в порядке попыток подключения; primary всегда последний.
+        """
+        now = time.monotonic()
+        healthy = [
+            replica for replica in self._replicas
+            if self._down_until.get(replica, 0.0) <= now
+        ]
+        if not healthy:
+            return [self._primary]
+        start = next(self._turn) % len(healthy)
+        return healthy[start:] + healthy[:start] + [self._primary]
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        self._down_until[replica] = time.monotonic() + settings.replica_retry_seconds
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    def status(self) -> List[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "url": replica.url.render_as_string(hide_password=True),
+                "healthy": self._down_until.get(replica, 0.0) <= now,
+                "pool": pool_stats(replica),
+            }
+            for replica in self._replicas
+        ]
+
+
+replica_router = ReplicaRouter(engine, replica_engines)
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """
+    SQLite не всегда собран с математическими функциями.
+    Регистрируем те, что нужны геопоиску на стороне БД.
+    """
+    if not hasattr(dbapi_connection, "create_function"):
+        return
+    dbapi_connection.create_function("radians", 1, math.radians, deterministic=True)
+    dbapi_connection.create_function("sin", 1, math.sin, deterministic=True)
+    dbapi_connection.create_function("cos", 1, math.cos, deterministic=True)
+    dbapi_connection.create_function("power", 2, math.pow, deterministic=True)
+    dbapi_connection.create_function("sqrt", 1, math.sqrt, deterministic=True)
+    dbapi_connection.create_function("asin", 1, math.asin, deterministic=True)
+    dbapi_connection.create_function("least", 2, min, deterministic=True)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    """
+    Вместо echo пишем только медленные запросы, и то с заданной долей:
+    параметры не логируются. Время каждого запроса идёт в метрики
+    текущего HTTP-запроса.
+    """
+    elapsed = time.perf_counter() - context.query_started_at
+    record_query(elapsed)
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < settings.slow_query_ms:
+        return
+    if random.random() >= settings.slow_query_sample_rate:
+        return
+    slow_query_logger.warning("slow query (%.1f ms): %s", elapsed_ms, statement[:2000])
+
+
+def pool_stats(target: Optional[AsyncEngine] = None) -> dict:
+    """
+    Состояние пула соединений (по умолчанию primary) для подбора
+    его размера под число воркеров.
+    """
+    pool = (target or engine).pool
+    stats = {
+        "pool_class": type(pool).__name__,
+        "size": None,
+        "max_overflow": None,
+        "checked_in": None,
+        "checked_out": None,
+        "overflow": None,
+        "waits": None,
+        "wait_seconds": None,
+        "timeouts": None,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(
+            waits=pool.waits,
+            wait_seconds=round(pool.wait_seconds, 6),
+            timeouts=pool.timeouts,
+        )
+    return stats
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия для записи (primary). Остальные чтения пишущего запроса
+    тоже идут в primary: реплика может ещё не знать о записи.
+    """
+    setattr(request.state, READ_ENGINE_STATE_KEY, engine)
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия для чтения: реплика, если есть исправная, иначе primary.
+    """
+    async with read_session(request) as session:
+        yield session
+
+
+@asynccontextmanager
+async def read_session(request: Optional[Request] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для чтения, в том числе вне зависимостей FastAPI (потоковые
+    ответы, общие загрузки). С request все чтения запроса идут на сервер,
+    выбранный первым из них: версии условного GET (not_modified) и сами
+    данные читаются с одной реплики, и отстающая реплика не отдаст
+    старые строки под новым ETag. Запрос с заголовком READ_PRIMARY_HEADER
+    и пишущий запрос (get_db) читают с primary. Прочитанные версии
+    сессия получает в info (TableVersions.current), чтобы не читать
+    их повторно.
+    """
+    bind = None
+    if request is not None:
+        bind = getattr(request.state, READ_ENGINE_STATE_KEY, None)
+        if bind is None and request.headers.get(READ_PRIMARY_HEADER):
+            bind = engine
+            setattr(request.state, READ_ENGINE_STATE_KEY, bind)
+    if bind is not None:
+        session = AsyncSessionLocal(bind=bind)
+    else:
+        session = await _connect_read_session()
+        if request is not None:
+            setattr(request.state, READ_ENGINE_STATE_KEY, session.bind)
+    if request is not None:
+        versions = getattr(request.state, VERSIONS_KEY, None)
+        if versions is not None:
+            session.info[VERSIONS_KEY] = versions
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def _connect_read_session() -> AsyncSession:
+    for candidate in replica_router.candidates():
+        session = AsyncSessionLocal(bind=candidate)
+        if candidate is engine:
+            return session
+        try:
+            # соединение берём сразу (с pre-ping), чтобы недоступная
+            # или перегруженная (pool_timeout) реплика не роняла запрос,
+            # а уступала следующей
+            await session.connection()
+            return session
+        except exc.TimeoutError:
+            # пул этого процесса исчерпан, сама реплика исправна:
+            # уступаем следующей только этот запрос
+            await session.close()
+            replica_logger.info("replica %s pool exhausted",
+                                candidate.url.render_as_string(hide_password=True))
+        except (exc.DBAPIError, OSError, asyncio.TimeoutError) as error:
+            await session.close()
+            replica_router.mark_down(candidate)
+            replica_logger.warning("replica %s unavailable: %s",
+                                   candidate.url.render_as_string(hide_password=True),
+                                   error)
+    return AsyncSessionLocal()
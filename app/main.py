@@ -1,8 +1,24 @@
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.api.v1 import activities, buildings, organizations
+from app.api.conditional import CacheValidatorsMiddleware
+from app.api.v1 import (activities, buildings, export, imports, internal,
+                        organizations)
 from app.core.config import settings
+from app.core.metrics import TimingMiddleware
+from app.core.responses import TimedJSONResponse
+from app.crud.building import rebuild_spatial_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # пространственный индекс зданий строится при старте; дальше он
+    # перестраивается, когда версия buildings в БД его обгоняет
+    await rebuild_spatial_index()
+    yield
+
 
 app = FastAPI(
     title="OZD API",
@@ -10,8 +26,16 @@ app = FastAPI(
     openapi_url="/api/v1/openapi.json",
     docs_url="/api/v1/docs",
     redoc_url="/api/v1/redoc",
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
 )
 
+# ETag/Last-Modified от зависимости not_modified в заголовки ответа
+app.add_middleware(CacheValidatorsMiddleware)
+# гистограммы времени по маршрутам и заголовок Server-Timing;
+# добавляется последним, чтобы охватывать остальные middleware
+app.add_middleware(TimingMiddleware)
+
 security = HTTPBearer()
 
 
@@ -40,3 +64,21 @@ app.include_router(
     tags=["activities"],
     dependencies=[Depends(verify_api_key)],
 )
+app.include_router(
+    export.router,
+    prefix="/api/v1/export",
+    tags=["export"],
+    dependencies=[Depends(verify_api_key)],
+)
+app.include_router(
+    imports.router,
+    prefix="/api/v1/import",
+    tags=["import"],
+    dependencies=[Depends(verify_api_key)],
+)
+app.include_router(
+    internal.router,
+    prefix="/api/v1/internal",
+    tags=["internal"],
+    dependencies=[Depends(verify_api_key)],
+)
@@ -1,9 +1,22 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, String,
+                        Table, func)
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
 from app.models.organization import organization_activities
 
+# таблица замыкания иерархии: все пары (предок, потомок) с расстоянием
+# между ними; каждый узел является собственным предком с depth = 0
+activity_closure = Table(
+    "activity_closure",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("ix_activity_closure_ancestor_id_depth", "ancestor_id", "depth"),
+    Index("ix_activity_closure_descendant_id", "descendant_id"),
+)
+
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -11,6 +24,14 @@ class Activity(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     parent_id = Column(Integer, ForeignKey("activities.id"), nullable=True)
+    # время последнего изменения, для инкрементальной выгрузки
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
 
     parent = relationship(
         "Activity",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, Integer, String
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
@@ -6,11 +6,23 @@ from app.db.session import Base
 
 class Building(Base):
     __tablename__ = "buildings"
+    __table_args__ = (
+        # прямоугольный префильтр геопоиска
+        Index("ix_buildings_latitude_longitude", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True)
     address = Column(String, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # время последнего изменения, для инкрементальной выгрузки
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
 
     # Обратная сторона отношения к Organization
     organizations = relationship(
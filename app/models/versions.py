@@ -0,0 +1,91 @@
+from typing import Iterable, List
+
+from sqlalchemy import (BigInteger, Column, DateTime, SmallInteger, String,
+                        Table, event, func)
+
+from app.db.session import Base
+
+# версии данных: на каждую логическую таблицу — счётчик изменений
+# и время последнего изменения. Счётчики увеличивают триггеры в той же
+# транзакции, что и запись, кто бы ни писал: приложение, CLI-импорт,
+# генератор данных или psql.
+# Счётчик таблицы разбит на DATA_VERSION_SLOTS строк: строку держит под
+# блокировкой пишущая транзакция до фиксации, и с одной строкой на таблицу
+# все записи в неё шли бы по очереди. Триггер PostgreSQL выбирает слот по
+# номеру серверного процесса, так что разные соединения пула обычно пишут
+# в разные строки; версия таблицы — сумма слотов, время — самое позднее.
+DATA_VERSION_SLOTS = 16
+
+data_versions = Table(
+    "data_versions",
+    Base.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("slot", SmallInteger, primary_key=True, server_default="0"),
+    Column("version", BigInteger, nullable=False, server_default="0"),
+    Column("changed_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+# таблица БД -> версия, которую увеличивает запись в неё
+VERSIONED_TABLES = {
+    "buildings": "buildings",
+    "activities": "activities",
+    "activity_closure": "activities",
+    "organizations": "organizations",
+    "organization_activities": "organizations",
+}
+
+
+def data_version_ddl(dialect: str, tables: Iterable[str] = VERSIONED_TABLES) -> List[str]:
+    """
+    Идемпотентные операторы: начальные строки data_versions и триггеры
+    на таблицах tables. В PostgreSQL триггер срабатывает раз на оператор,
+    в SQLite — на каждую строку (триггеров на оператор там нет) и всегда
+    пишет в слот 0: писатель в SQLite и так один.
+    """
+    triggered = {table: VERSIONED_TABLES[table] for table in tables}
+    statements = [
+        "INSERT INTO data_versions (table_name, slot) VALUES "
+        + ", ".join(f"('{version}', {slot})" for slot in range(DATA_VERSION_SLOTS))
+        + " ON CONFLICT (table_name, slot) DO NOTHING"
+        for version in sorted(set(VERSIONED_TABLES.values()))
+    ]
+    if dialect == "postgresql":
+        statements.append(
+            f"""
+            CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+            BEGIN
+                UPDATE data_versions
+                SET version = version + 1, changed_at = clock_timestamp()
+                WHERE table_name = TG_ARGV[0]
+                  AND slot = pg_backend_pid() % {DATA_VERSION_SLOTS};
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        statements.extend(
+            f"CREATE OR REPLACE TRIGGER {table}_data_version "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{version}')"
+            for table, version in triggered.items()
+        )
+    elif dialect == "sqlite":
+        statements.extend(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_data_version_{operation.lower()} "
+            f"AFTER {operation} ON {table} BEGIN "
+            f"UPDATE data_versions SET version = version + 1, "
+            f"changed_at = CURRENT_TIMESTAMP WHERE table_name = '{version}' "
+            f"AND slot = 0; END"
+            for table, version in triggered.items()
+            for operation in ("INSERT", "UPDATE", "DELETE")
+        )
+    return statements
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_data_versions(target, connection, **kw):
+    # create_all (demo_data.init_db) вызывается и на уже созданной БД,
+    # поэтому операторы идемпотентны
+    tables = [table for table in VERSIONED_TABLES if table in target.tables]
+    for statement in data_version_ddl(connection.dialect.name, tables):
+        connection.exec_driver_sql(statement)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
@@ -24,3 +25,10 @@ class ActivityOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ActivityTreeInfo(BaseModel):
+    version: Optional[int]
+    built_at: Optional[datetime]
+    size: int
+    stale: bool
@@ -0,0 +1,20 @@
+from typing import Generic, List, TypeVar
+
+from pydantic import BaseModel, Field
+from pydantic.generics import GenericModel
+
+ItemT = TypeVar("ItemT")
+
+MAX_BATCH_IDS = 1000
+
+
+class BatchIn(BaseModel):
+    ids: List[int] = Field(..., min_items=1, max_items=MAX_BATCH_IDS, example=[3, 1, 2])
+
+
+class Batch(GenericModel, Generic[ItemT]):
+    """
+    Найденные объекты в порядке запрошенных ID и ID, которых нет.
+    """
+    items: List[ItemT]
+    missing: List[int] = []
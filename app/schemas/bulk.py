@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.activity import ActivityBase
+from app.schemas.building import BuildingBase
+from app.schemas.organization import OrganizationBase
+
+
+class BuildingImport(BuildingBase):
+    id: Optional[int] = Field(None, example=1)
+
+
+class ActivityImport(ActivityBase):
+    id: Optional[int] = Field(None, example=1)
+
+
+class OrganizationImport(OrganizationBase):
+    id: Optional[int] = Field(None, example=1)
+
+
+class BulkImportIn(BaseModel):
+    """
+    Пачка для загрузки. Строки проверяются по одной (BuildingImport,
+    ActivityImport, OrganizationImport), поэтому ошибка в строке
+    не отклоняет всю пачку. Строки с id перезаписывают существующие.
+    """
+    buildings: List[Dict[str, Any]] = Field([], example=[
+        {"id": 10, "address": "г. Казань, ул. Баумана 1", "latitude": 55.79, "longitude": 49.11},
+    ])
+    activities: List[Dict[str, Any]] = Field([], example=[
+        {"id": 20, "name": "Выпечка", "parent_id": 1},
+    ])
+    organizations: List[Dict[str, Any]] = Field([], example=[
+        {"name": "ИП Пекарь", "phone_numbers": ["8-800-000-00-00"],
+         "building_id": 10, "activity_ids": [20]},
+    ])
+
+
+class BulkImportError(BaseModel):
+    entity: str
+    index: int
+    detail: str
+
+
+class BulkImportResult(BaseModel):
+    imported: Dict[str, int]
+    errors: List[BulkImportError]
+    elapsed_s: float
+    rows_per_s: float
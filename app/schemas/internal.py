@@ -0,0 +1,43 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PoolStats(BaseModel):
+    pool_class: str
+    size: Optional[int]
+    max_overflow: Optional[int]
+    checked_in: Optional[int]
+    checked_out: Optional[int]
+    overflow: Optional[int]
+    # запросы соединения, заставшие пул исчерпанным
+    waits: Optional[int]
+    wait_seconds: Optional[float]
+    timeouts: Optional[int]
+
+
+class ReplicaStatus(BaseModel):
+    url: str
+    healthy: bool
+    pool: PoolStats
+
+
+class CacheStats(BaseModel):
+    backend: str
+    size: int
+    hits: int
+    misses: int
+    # вытеснены по размеру, истекли по TTL, сброшены записью
+    evictions: int
+    expirations: int
+    invalidations: int
+    errors: int
+
+
+class CoalescingStats(BaseModel):
+    in_flight: int
+    # начавшие загрузку и получившие чужой результат
+    leaders: int
+    followers: int
+    timeouts: int
+    abandoned: int
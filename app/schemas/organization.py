@@ -30,3 +30,16 @@ class OrganizationOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class OrganizationNearestOut(OrganizationOut):
+    distance_km: float
+
+
+class OrganizationSearchOut(OrganizationOut):
+    score: float
+
+
+class OrganizationSuggestion(BaseModel):
+    id: int
+    name: str
@@ -0,0 +1,58 @@
+"""
+Сравнение скалярного и векторного расчёта расстояний в GeoSearchService.
+
+    python -m app.scripts.bench_geosearch
+"""
+import random
+import time
+
+from app.services.geosearch import CoordinateStore, GeoSearchService
+
+SIZES = (10_000, 100_000, 1_000_000)
+CENTER = (55.7558, 37.6173)
+RADIUS_KM = 25.0
+
+
+def make_store(size: int, seed: int = 42) -> CoordinateStore:
+    rnd = random.Random(seed)
+    lat0, lon0 = CENTER
+    return CoordinateStore(
+        range(size),
+        (lat0 + rnd.uniform(-1.0, 1.0) for _ in range(size)),
+        (lon0 + rnd.uniform(-1.5, 1.5) for _ in range(size)),
+    )
+
+
+def scalar_loop(store: CoordinateStore) -> int:
+    lat0, lon0 = CENTER
+    distance = GeoSearchService.haversine_distance
+    lats = store.latitudes.tolist()
+    lons = store.longitudes.tolist()
+    return sum(
+        1 for lat, lon in zip(lats, lons)
+        if distance(lat0, lon0, lat, lon) <= RADIUS_KM
+    )
+
+
+def vectorized(store: CoordinateStore) -> int:
+    return int(GeoSearchService.radius_mask(store, CENTER, RADIUS_KM).sum())
+
+
+def timed(fn, store: CoordinateStore):
+    start = time.perf_counter()
+    found = fn(store)
+    return found, time.perf_counter() - start
+
+
+def main():
+    print(f"{'points':>10} {'loop, s':>10} {'numpy, s':>10} {'speedup':>8}")
+    for size in SIZES:
+        store = make_store(size)
+        found_loop, t_loop = timed(scalar_loop, store)
+        found_vec, t_vec = timed(vectorized, store)
+        assert found_loop == found_vec, (found_loop, found_vec)
+        print(f"{size:>10} {t_loop:>10.4f} {t_vec:>10.4f} {t_loop / t_vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Нагрузочный прогон всех эндпоинтов /api/v1 с фиксированной
+конкурентностью. По каждому сценарию — p50/p95/p99 задержки и
+пропускная способность; результат пишется в JSON, который можно
+сравнить с прошлым прогоном (--compare) между коммитами.
+
+Сценарии идут по очереди, запросы внутри сценария — в --concurrency
+параллельных потоков. Параметры запросов выбираются детерминированно
+(--seed) из образца id, взятого у самого API перед прогоном. Пишущие
+сценарии удаляют за собой созданное.
+
+    python -m app.scripts.bench_load --base-url http://localhost:8000 \\
+        --api-key secret --out bench.json
+    python -m app.scripts.bench_load ... --compare bench.json
+    python -m app.scripts.bench_load --in-process   # без сервера, через ASGI
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+SAMPLE_PAGES = 10
+SAMPLE_PAGE_SIZE = 100
+BATCH_SIZE = 50
+
+
+@dataclass
+class Sample:
+    """
+    Существующие id и координаты, из которых собираются запросы.
+    """
+
+    organization_ids: List[int]
+    buildings: List[dict]
+    activities: List[dict]
+    name_prefixes: List[str]
+    # id, созданные пишущими сценариями, для последующих PUT/DELETE
+    created: Dict[str, List[int]] = field(default_factory=dict)
+    etags: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def building_ids(self) -> List[int]:
+        return [building["id"] for building in self.buildings]
+
+    @property
+    def activity_ids(self) -> List[int]:
+        return [activity["id"] for activity in self.activities]
+
+    @property
+    def root_activity_ids(self) -> List[int]:
+        return [a["id"] for a in self.activities if a["parent_id"] is None] or self.activity_ids
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    params: Optional[dict] = None
+    json: Any = None
+    headers: Optional[dict] = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[random.Random, Sample], Request]
+    # доля от --requests: тяжёлые сценарии (выгрузки) гоняются реже
+    weight: float = 1.0
+    # чем отметить успешный ответ (например, запомнить созданный id)
+    on_response: Optional[Callable[[Sample, httpx.Response], None]] = None
+    expected: tuple = (200,)
+
+
+def _point(rnd: random.Random, sample: Sample) -> dict:
+    building = rnd.choice(sample.buildings)
+    return {"lat": building["latitude"], "lon": building["longitude"]}
+
+
+def _bbox(rnd: random.Random, sample: Sample, half: float = 0.05) -> dict:
+    point = _point(rnd, sample)
+    return {
+        "sw_lat": point["lat"] - half, "sw_lon": point["lon"] - half,
+        "ne_lat": point["lat"] + half, "ne_lon": point["lon"] + half,
+    }
+
+
+def _ids(rnd: random.Random, ids: List[int]) -> List[int]:
+    return rnd.sample(ids, min(BATCH_SIZE, len(ids)))
+
+
+def _remember(kind: str) -> Callable[[Sample, httpx.Response], None]:
+    def callback(sample: Sample, response: httpx.Response) -> None:
+        sample.created.setdefault(kind, []).append(response.json()["id"])
+    return callback
+
+
+def _created(rnd: random.Random, sample: Sample, kind: str) -> int:
+    # 0 — заведомо несуществующий id: ответ 404 посчитается ошибкой
+    created = sample.created.get(kind)
+    return rnd.choice(created) if created else 0
+
+
+def _take(sample: Sample, kind: str) -> int:
+    # каждый созданный объект удаляется ровно один раз
+    created = sample.created.get(kind)
+    return created.pop() if created else 0
+
+
+def _remember_etag(sample: Sample, response: httpx.Response) -> None:
+    sample.etags.setdefault("organizations", response.headers.get("etag", ""))
+
+
+def _new_building(rnd: random.Random, sample: Sample) -> dict:
+    point = _point(rnd, sample)
+    return {"address": "Бенчмарк", "latitude": point["lat"], "longitude": point["lon"]}
+
+
+def _new_organization(rnd: random.Random, sample: Sample) -> dict:
+    return {
+        "name": f"Бенчмарк {rnd.randint(1, 10 ** 9)}",
+        "phone_numbers": ["8-900-000-00-00"],
+        "building_id": rnd.choice(sample.building_ids),
+        "activity_ids": rnd.sample(sample.activity_ids, min(2, len(sample.activity_ids))),
+    }
+
+
+def scenarios() -> List[Scenario]:
+    org, bld, act = f"{API}/organizations", f"{API}/buildings", f"{API}/activities"
+    return [
+        # организации: чтение
+        Scenario("organizations.list", lambda r, s: Request(
+            "GET", f"{org}/", {"limit": 20}), on_response=_remember_etag),
+        Scenario("organizations.list_not_modified", lambda r, s: Request(
+            "GET", f"{org}/", {"limit": 20},
+            headers={"If-None-Match": s.etags.get("organizations", "")}),
+            expected=(200, 304)),
+        Scenario("organizations.list_by_name", lambda r, s: Request(
+            "GET", f"{org}/", {"name": r.choice(s.name_prefixes), "limit": 20})),
+        Scenario("organizations.list_by_activity", lambda r, s: Request(
+            "GET", f"{org}/", {"activity_id": r.choice(s.root_activity_ids), "limit": 20})),
+        Scenario("organizations.list_in_radius", lambda r, s: Request(
+            "GET", f"{org}/", {**_point(r, s), "radius": 2, "limit": 20})),
+        Scenario("organizations.list_in_bbox", lambda r, s: Request(
+            "GET", f"{org}/", {**_bbox(r, s), "limit": 20})),
+        Scenario("organizations.nearest", lambda r, s: Request(
+            "GET", f"{org}/nearest", {**_point(r, s), "limit": 20})),
+        Scenario("organizations.search", lambda r, s: Request(
+            "GET", f"{org}/search", {"q": r.choice(s.name_prefixes), "limit": 20})),
+        Scenario("organizations.autocomplete", lambda r, s: Request(
+            "GET", f"{org}/autocomplete", {"q": r.choice(s.name_prefixes)[:3], "limit": 10})),
+        Scenario("organizations.get", lambda r, s: Request(
+            "GET", f"{org}/{r.choice(s.organization_ids)}")),
+        Scenario("organizations.batch", lambda r, s: Request(
+            "GET", f"{org}/batch",
+            {"ids": ",".join(map(str, _ids(r, s.organization_ids)))})),
+        Scenario("organizations.batch_post", lambda r, s: Request(
+            "POST", f"{org}/batch", json={"ids": _ids(r, s.organization_ids)})),
+        # здания и виды деятельности: чтение
+        Scenario("buildings.list", lambda r, s: Request("GET", f"{bld}/", {"limit": 20})),
+        Scenario("buildings.list_in_radius", lambda r, s: Request(
+            "GET", f"{bld}/", {**_point(r, s), "radius": 2, "limit": 20})),
+        Scenario("buildings.list_in_bbox", lambda r, s: Request(
+            "GET", f"{bld}/", {**_bbox(r, s), "limit": 20})),
+        Scenario("buildings.get", lambda r, s: Request(
+            "GET", f"{bld}/{r.choice(s.building_ids)}")),
+        Scenario("buildings.batch", lambda r, s: Request(
+            "GET", f"{bld}/batch", {"ids": ",".join(map(str, _ids(r, s.building_ids)))})),
+        Scenario("buildings.batch_post", lambda r, s: Request(
+            "POST", f"{bld}/batch", json={"ids": _ids(r, s.building_ids)})),
+        Scenario("buildings.organizations", lambda r, s: Request(
+            "GET", f"{bld}/{r.choice(s.building_ids)}/organizations", {"limit": 20})),
+        Scenario("activities.list", lambda r, s: Request("GET", f"{act}/", {"limit": 20})),
+        Scenario("activities.get", lambda r, s: Request(
+            "GET", f"{act}/{r.choice(s.activity_ids)}")),
+        Scenario("activities.batch", lambda r, s: Request(
+            "GET", f"{act}/batch", {"ids": ",".join(map(str, _ids(r, s.activity_ids)))})),
+        Scenario("activities.batch_post", lambda r, s: Request(
+            "POST", f"{act}/batch", json={"ids": _ids(r, s.activity_ids)})),
+        Scenario("activities.organizations", lambda r, s: Request(
+            "GET", f"{act}/{r.choice(s.root_activity_ids)}/organizations", {"limit": 20})),
+        # запись: создание, изменение и удаление своих же объектов
+        Scenario("buildings.create", lambda r, s: Request(
+            "POST", f"{bld}/", json=_new_building(r, s)),
+            on_response=_remember("buildings"), expected=(201,)),
+        Scenario("buildings.update", lambda r, s: Request(
+            "PUT", f"{bld}/{_created(r, s, 'buildings')}",
+            json={"address": f"Бенчмарк {r.randint(1, 10 ** 6)}"})),
+        Scenario("activities.create", lambda r, s: Request(
+            "POST", f"{act}/", json={"name": "Бенчмарк", "parent_id": r.choice(s.activity_ids)}),
+            on_response=_remember("activities"), expected=(201,)),
+        Scenario("activities.update", lambda r, s: Request(
+            "PUT", f"{act}/{_created(r, s, 'activities')}",
+            json={"name": f"Бенчмарк {r.randint(1, 10 ** 6)}"})),
+        Scenario("organizations.create", lambda r, s: Request(
+            "POST", f"{org}/", json=_new_organization(r, s)),
+            on_response=_remember("organizations"), expected=(201,)),
+        Scenario("organizations.update", lambda r, s: Request(
+            "PUT", f"{org}/{_created(r, s, 'organizations')}",
+            json={"phone_numbers": ["8-900-000-00-01"]})),
+        Scenario("organizations.delete", lambda r, s: Request(
+            "DELETE", f"{org}/{_take(s, 'organizations')}"), expected=(204,)),
+        Scenario("activities.delete", lambda r, s: Request(
+            "DELETE", f"{act}/{_take(s, 'activities')}"), expected=(204,)),
+        Scenario("buildings.delete", lambda r, s: Request(
+            "DELETE", f"{bld}/{_take(s, 'buildings')}"), expected=(204,)),
+        # массовая загрузка: перезапись существующих зданий теми же данными
+        Scenario("import.buildings", lambda r, s: Request(
+            "POST", f"{API}/import/", json={"buildings": [
+                {key: b[key] for key in ("id", "address", "latitude", "longitude")}
+                for b in r.sample(s.buildings, min(BATCH_SIZE, len(s.buildings)))
+            ]}), weight=0.2),
+        # выгрузки целиком: тяжёлые, поэтому реже
+        Scenario("export.organizations", lambda r, s: Request(
+            "GET", f"{API}/export/organizations"), weight=0.02),
+        Scenario("export.buildings", lambda r, s: Request(
+            "GET", f"{API}/export/buildings"), weight=0.05),
+        Scenario("export.activities", lambda r, s: Request(
+            "GET", f"{API}/export/activities"), weight=0.1),
+        # служебные
+        Scenario("internal.activity_tree", lambda r, s: Request(
+            "GET", f"{API}/internal/activity-tree")),
+        Scenario("internal.pool", lambda r, s: Request("GET", f"{API}/internal/pool")),
+        Scenario("internal.replicas", lambda r, s: Request("GET", f"{API}/internal/replicas")),
+        Scenario("internal.metrics", lambda r, s: Request("GET", f"{API}/internal/metrics")),
+    ]
+
+
+async def collect_sample(client: httpx.AsyncClient) -> Sample:
+    async def pages(path: str) -> List[dict]:
+        items: List[dict] = []
+        cursor = None
+        for _ in range(SAMPLE_PAGES):
+            params = {"limit": SAMPLE_PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get(path, params=params)
+            response.raise_for_status()
+            page = response.json()
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        return items
+
+    organizations = await pages(f"{API}/organizations/")
+    buildings = await pages(f"{API}/buildings/")
+    activities = await pages(f"{API}/activities/")
+    if not (organizations and buildings and activities):
+        raise SystemExit("Справочник пуст: сначала python -m app.scripts.synthetic_data")
+    # начало названия без организационно-правовой формы и кавычек
+    prefixes = sorted({
+        re.sub(r'^\S+\s+"?', "", org["name"])[:5] for org in organizations
+    } - {""})
+    return Sample(
+        organization_ids=[org["id"] for org in organizations],
+        buildings=buildings,
+        activities=activities,
+        name_prefixes=prefixes or ["а"],
+    )
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """
+    Перцентиль по ближайшему рангу; ordered отсортирован.
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        scenario: Scenario,
+        sample: Sample,
+        total: int,
+        concurrency: int,
+        seed: int,
+) -> dict:
+    # запросы собираются по одному из общего генератора: набор запросов
+    # сценария от прогона к прогону тот же
+    rnd = random.Random(f"{seed}:{scenario.name}")
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            request = scenario.build(rnd, sample)
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    request.method, request.path, params=request.params,
+                    json=request.json, headers=request.headers,
+                )
+                await response.aread()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status_code not in scenario.expected:
+                errors += 1
+            elif scenario.on_response is not None:
+                scenario.on_response(sample, response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    Сценарии, у которых p95 вырос больше чем на threshold (доля).
+    Печатает таблицу сравнения с прошлым прогоном.
+    """
+    regressions = []
+    print(f"\n{'scenario':<36} {'p95 was':>9} {'p95 now':>9} {'change':>8}"
+          f" {'rps was':>9} {'rps now':>9}")
+    for name, now in current["scenarios"].items():
+        was = baseline.get("scenarios", {}).get(name)
+        if was is None:
+            continue
+        change = (now["p95_ms"] - was["p95_ms"]) / was["p95_ms"] if was["p95_ms"] else 0.0
+        flag = " !" if change > threshold else ""
+        print(f"{name:<36} {was['p95_ms']:>9.2f} {now['p95_ms']:>9.2f} {change:>+7.0%}"
+              f" {was['throughput_rps']:>9.1f} {now['throughput_rps']:>9.1f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def make_client(args: argparse.Namespace) -> httpx.AsyncClient:
+    headers = {"Authorization": f"Bearer {args.api_key}"}
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    if args.in_process:
+        from app.main import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://bench", headers=headers)
+    return httpx.AsyncClient(base_url=args.base_url, headers=headers,
+                             limits=limits, timeout=args.timeout)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    pattern = re.compile(args.only) if args.only else None
+    async with make_client(args) as client:
+        sample = await collect_sample(client)
+        results: Dict[str, dict] = {}
+        for scenario in scenarios():
+            if pattern and not pattern.search(scenario.name):
+                continue
+            total = max(args.concurrency, int(args.requests * scenario.weight))
+            results[scenario.name] = await run_scenario(
+                client, scenario, sample, total, args.concurrency, args.seed,
+            )
+            result = results[scenario.name]
+            print(f"{scenario.name:<36} p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}"
+                  f"  p99 {result['p99_ms']:>8.2f} ms  {result['throughput_rps']:>8.1f} rps"
+                  f"  errors {result['errors']}", flush=True)
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "target": "in-process" if args.in_process else args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    if args.in_process:
+        from app.db.session import engine
+        from app.main import app, lifespan
+        async with lifespan(app):
+            report = await run(args)
+        await engine.dispose()
+    else:
+        report = await run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"\nsaved to {args.out}")
+    if baseline is not None:
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\np95 regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", ""))
+    parser.add_argument("--in-process", action="store_true",
+                        help="гонять приложение в этом же процессе через ASGI, без сети")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500,
+                        help="запросов на сценарий (с учётом веса сценария)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="регулярное выражение по имени сценария")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--out", default="bench_load.json", help="куда сохранить результат")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="допустимый рост p95 при сравнении (доля)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
@@ -0,0 +1,73 @@
+"""
+Сравнение сериализации страницы организаций: прежний путь
+(Page[OrganizationOut] + jsonable_encoder + JSONResponse) и
+FastJSONResponse, пишущий строки репозитория сразу через orjson.
+
+    python -m app.scripts.bench_serialization
+"""
+import json
+import random
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import FastJSONResponse
+from app.crud.organization import OrganizationRow
+from app.schemas.organization import OrganizationOut
+from app.schemas.pagination import Page
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 3
+
+
+def make_rows(size: int, seed: int = 42) -> List[OrganizationRow]:
+    rnd = random.Random(seed)
+    return [
+        OrganizationRow(
+            id=org_id,
+            name=f'ООО "Организация {org_id}"',
+            phone_numbers=[f"8-9{rnd.randint(10, 99)}-{rnd.randint(100, 999)}-"
+                           f"{rnd.randint(10, 99)}-{rnd.randint(10, 99)}"
+                           for _ in range(rnd.randint(1, 3))],
+            building_id=rnd.randint(1, 1000),
+            activity_ids=rnd.sample(range(1, 200), rnd.randint(1, 4)),
+        )
+        for org_id in range(1, size + 1)
+    ]
+
+
+def legacy_render(rows: List[OrganizationRow]) -> bytes:
+    """
+    Прежний путь FastAPI: валидация по response_model и jsonable_encoder.
+    """
+    page = Page[OrganizationOut](items=[OrganizationOut.from_orm(r) for r in rows])
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def fast_render(rows: List[OrganizationRow]) -> bytes:
+    return FastJSONResponse({"items": rows, "next_cursor": None}).body
+
+
+def best_of(func, rows) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'rows':>8} {'pydantic, s':>12} {'orjson, s':>10} {'speedup':>8}")
+    for size in SIZES:
+        rows = make_rows(size)
+        assert json.loads(legacy_render(rows)) == json.loads(fast_render(rows))
+        t_legacy = best_of(legacy_render, rows)
+        t_fast = best_of(fast_render, rows)
+        print(f"{size:>8} {t_legacy:>12.4f} {t_fast:>10.4f} {t_legacy / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
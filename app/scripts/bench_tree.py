@@ -0,0 +1,84 @@
+"""
+Сравнение рекурсивного обхода ORM-связей children и поиска потомков
+по отрезкам обхода (Euler tour) в ActivityTreeService.
+
+    python -m app.scripts.bench_tree
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+from app.services.tree import ActivityTreeService
+
+NODES = 50_000
+QUERIES = 2_000
+LEVELS = (3, 6, 100)
+
+
+def make_taxonomy(size: int, seed: int = 42) -> List[SimpleNamespace]:
+    """
+    Синтетический справочник: у каждого узла случайный родитель среди
+    предыдущих, с перекосом к недавним — получаются глубокие ветви.
+    """
+    rnd = random.Random(seed)
+    nodes = [SimpleNamespace(id=1, parent_id=None, children=[])]
+    for act_id in range(2, size + 1):
+        parent = None
+        if rnd.random() > 0.001:
+            lo = max(0, len(nodes) - 50)
+            parent = nodes[rnd.randrange(lo, len(nodes))]
+        node = SimpleNamespace(
+            id=act_id, parent_id=parent.id if parent else None, children=[]
+        )
+        if parent is not None:
+            parent.children.append(node)
+        nodes.append(node)
+    return nodes
+
+
+def legacy_gather(by_id: dict, root_id: int, max_level: int) -> List[int]:
+    """
+    Прежняя реализация: рекурсивный обход по атрибуту children.
+    """
+    result: List[int] = []
+
+    def _dfs(current_id: int, level: int):
+        if level > max_level or current_id not in by_id:
+            return
+        result.append(current_id)
+        for child in by_id[current_id].children:
+            _dfs(child.id, level + 1)
+
+    _dfs(root_id, 1)
+    return result
+
+
+def main():
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), NODES * 2))
+    nodes = make_taxonomy(NODES)
+    by_id = {node.id: node for node in nodes}
+    rnd = random.Random(7)
+    roots = [rnd.randint(1, NODES) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    tree = ActivityTreeService(nodes)
+    print(f"build {len(tree)} nodes: {time.perf_counter() - start:.3f} s")
+
+    print(f"{'level':>6} {'recursive, s':>13} {'euler, s':>10} {'speedup':>8}")
+    for level in LEVELS:
+        start = time.perf_counter()
+        expected = [sorted(legacy_gather(by_id, r, level)) for r in roots]
+        t_legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = [tree.gather_descendant_ids(r, level) for r in roots]
+        t_euler = time.perf_counter() - start
+
+        assert expected == [sorted(ids) for ids in found]
+        print(f"{level:>6} {t_legacy:>13.4f} {t_euler:>10.4f} {t_legacy / t_euler:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
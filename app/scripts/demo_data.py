@@ -1,5 +1,6 @@
 import asyncio
 
+from app.crud.activity import ActivityRepository
 from app.db.session import AsyncSessionLocal, Base, engine
 from app.models.activity import Activity
 from app.models.building import Building
@@ -29,6 +30,7 @@ async def seed():
         parts = Activity(name="Запчасти", parent=cars)
         session.add_all([food, meat, dairy, cars, trucks, parts])
         await session.commit()
+        await ActivityRepository(session).rebuild_closure()
 
         # организации
         org1 = Organization(
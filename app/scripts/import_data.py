@@ -0,0 +1,43 @@
+"""
+Массовая загрузка справочника из JSON-файла вида
+{"buildings": [...], "activities": [...], "organizations": [...]}
+(формат тела POST /api/v1/import/).
+
+    python -m app.scripts.import_data feed.json
+"""
+import argparse
+import asyncio
+import json
+
+from app.db.session import AsyncSessionLocal, engine
+from app.services.bulk_import import BulkImportService
+
+MAX_ERRORS_SHOWN = 50
+
+
+async def main(path: str):
+    with open(path, encoding="utf-8") as fh:
+        feed = json.load(fh)
+
+    async with AsyncSessionLocal() as session:
+        result = await BulkImportService(session).run(
+            feed.get("buildings", []),
+            feed.get("activities", []),
+            feed.get("organizations", []),
+        )
+    await engine.dispose()
+
+    for entity, count in result.imported.items():
+        print(f"{entity}: {count} imported")
+    for error in result.errors[:MAX_ERRORS_SHOWN]:
+        print(f"  {error.entity}[{error.index}]: {error.detail}")
+    if len(result.errors) > MAX_ERRORS_SHOWN:
+        print(f"  ... and {len(result.errors) - MAX_ERRORS_SHOWN} more errors")
+    print(f"{len(result.errors)} rows rejected, "
+          f"{result.elapsed_s:.2f} s, {result.rows_per_s:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="JSON-файл с пачкой для загрузки")
+    asyncio.run(main(parser.parse_args().path))
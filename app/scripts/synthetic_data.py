@@ -0,0 +1,264 @@
+"""
+Детерминированный генератор синтетического справочника для нагрузочных
+тестов: здания кучками вокруг районов крупных городов, глубокое дерево
+видов деятельности, организации с перекосом по зданиям и видам
+деятельности (немногие популярные, длинный хвост редких).
+
+При одинаковых --seed и параметрах на пустой БД получается тот же набор
+данных. Новые id идут после уже существующих. Данные пишутся пачками
+INSERT (executemany), организации — с фиксацией каждые --commit-every строк.
+
+    python -m app.scripts.synthetic_data --organizations 1000000 --seed 42
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+
+from app.crud.activity import ActivityRepository
+from app.crud.bulk import insert_with_ids
+from app.db.session import AsyncSessionLocal, engine
+from app.models.activity import Activity
+from app.models.building import Building
+from app.models.organization import Organization, organization_activities
+from app.scripts.demo_data import init_db
+
+# город, центр, радиус застройки в км, относительный вес (население)
+CITIES: List[Tuple[str, float, float, float, float]] = [
+    ("Москва", 55.7558, 37.6173, 25.0, 13.0),
+    ("Санкт-Петербург", 59.9343, 30.3351, 18.0, 5.6),
+    ("Новосибирск", 55.0084, 82.9357, 14.0, 1.6),
+    ("Екатеринбург", 56.8389, 60.6057, 12.0, 1.5),
+    ("Казань", 55.7961, 49.1064, 12.0, 1.3),
+    ("Нижний Новгород", 56.2965, 43.9361, 12.0, 1.2),
+    ("Челябинск", 55.1644, 61.4368, 11.0, 1.2),
+    ("Самара", 53.1959, 50.1002, 11.0, 1.1),
+    ("Омск", 54.9885, 73.3242, 10.0, 1.1),
+    ("Ростов-на-Дону", 47.2357, 39.7015, 10.0, 1.1),
+    ("Уфа", 54.7388, 55.9721, 10.0, 1.1),
+    ("Красноярск", 56.0153, 92.8932, 10.0, 1.1),
+    ("Воронеж", 51.6720, 39.1843, 9.0, 1.0),
+    ("Пермь", 58.0105, 56.2502, 9.0, 1.0),
+    ("Волгоград", 48.7080, 44.5133, 12.0, 1.0),
+    ("Краснодар", 45.0355, 38.9753, 9.0, 1.0),
+    ("Тюмень", 57.1522, 65.5272, 8.0, 0.8),
+    ("Иркутск", 52.2870, 104.3050, 8.0, 0.6),
+    ("Владивосток", 43.1155, 131.8855, 8.0, 0.6),
+    ("Калининград", 54.7104, 20.4522, 7.0, 0.5),
+]
+DISTRICTS_PER_CITY = 12
+# разброс зданий вокруг центра района, км
+DISTRICT_SPREAD_KM = 1.5
+
+STREETS = [
+    "Ленина", "Мира", "Советская", "Гагарина", "Садовая", "Лесная",
+    "Школьная", "Молодёжная", "Центральная", "Набережная", "Пушкина",
+    "Кирова", "Заводская", "Октябрьская", "Победы", "Строителей",
+]
+STREET_KINDS = ["ул.", "пр-т", "пер.", "б-р"]
+
+LEGAL_FORMS = ["ООО", "АО", "ЗАО", "ИП", "ПАО"]
+NAME_WORDS = [
+    "Альфа", "Вектор", "Гранит", "Импульс", "Континент", "Лидер",
+    "Меридиан", "Ника", "Орион", "Прогресс", "Ресурс", "Сфера",
+    "Технология", "Успех", "Феникс", "Эталон", "Север", "Восток",
+    "Строй", "Торг", "Сервис", "Маркет", "Трейд", "Снаб", "Холдинг",
+]
+ACTIVITY_WORDS = [
+    "Продукты", "Услуги", "Оборудование", "Сырьё", "Ремонт", "Доставка",
+    "Опт", "Розница", "Производство", "Обслуживание", "Аренда", "Монтаж",
+]
+
+# число детей узла на каждом уровне дерева (берётся от половины до значения)
+DEFAULT_FANOUT = (8, 6, 5, 4, 3, 2)
+# сколько видов деятельности у организации и с какими весами
+ACTIVITY_COUNT_WEIGHTS = {1: 50, 2: 25, 3: 13, 4: 8, 5: 4}
+# показатель Ципфа популярности видов деятельности и Парето — зданий
+ACTIVITY_ZIPF_S = 1.1
+BUILDING_PARETO_ALPHA = 1.2
+# ограничение веса здания: бизнес-центр, а не весь город в одном доме
+BUILDING_WEIGHT_CAP = 100.0
+
+KM_PER_DEGREE = 111.32
+
+
+async def next_id(session, model) -> int:
+    return (await session.scalar(select(func.coalesce(func.max(model.id), 0)))) + 1
+
+
+def make_buildings(rnd: random.Random, count: int, first_id: int) -> List[dict]:
+    """
+    Здания кучками вокруг районов городов: город по весу, район
+    по нормальному закону от центра, здание — рядом с районом.
+    """
+    districts = []
+    for name, lat, lon, radius_km, _ in CITIES:
+        for _ in range(DISTRICTS_PER_CITY):
+            districts.append((
+                name,
+                lat + rnd.gauss(0, radius_km / 2) / KM_PER_DEGREE,
+                lon + rnd.gauss(0, radius_km / 2) / (KM_PER_DEGREE * math.cos(math.radians(lat))),
+            ))
+    city_weights = [weight for *_, weight in CITIES for _ in range(DISTRICTS_PER_CITY)]
+    picked = rnd.choices(districts, weights=city_weights, k=count)
+
+    rows = []
+    for building_id, (city, lat, lon) in enumerate(picked, start=first_id):
+        cos_lat = math.cos(math.radians(lat))
+        rows.append({
+            "id": building_id,
+            "address": f"г. {city}, {rnd.choice(STREET_KINDS)} {rnd.choice(STREETS)}, "
+                       f"{rnd.randint(1, 250)}",
+            "latitude": round(lat + rnd.gauss(0, DISTRICT_SPREAD_KM) / KM_PER_DEGREE, 6),
+            "longitude": round(lon + rnd.gauss(0, DISTRICT_SPREAD_KM) / (KM_PER_DEGREE * cos_lat), 6),
+        })
+    return rows
+
+
+def make_activities(rnd: random.Random, fanout: Sequence[int], first_id: int) -> List[dict]:
+    """
+    Дерево видов деятельности в ширину: родители идут раньше потомков.
+    """
+    ids = itertools.count(first_id)
+    rows: List[dict] = []
+    level: List[Optional[int]] = [None]
+    for width in fanout:
+        next_level = []
+        for parent_id in level:
+            for _ in range(rnd.randint(max(1, width // 2), width)):
+                activity_id = next(ids)
+                rows.append({
+                    "id": activity_id,
+                    "name": f"{rnd.choice(ACTIVITY_WORDS)} {activity_id}",
+                    "parent_id": parent_id,
+                })
+                next_level.append(activity_id)
+        level = next_level
+    return rows
+
+
+def cumulative(weights: Sequence[float]) -> List[float]:
+    return list(itertools.accumulate(weights))
+
+
+def make_organizations(
+        rnd: random.Random,
+        count: int,
+        first_id: int,
+        building_ids: Sequence[int],
+        activity_ids: Sequence[int],
+        chunk_size: int,
+):
+    """
+    Организации и их связи с видами деятельности пачками по chunk_size.
+    Здания и виды деятельности выбираются с перекосом: у немногих
+    очень много организаций.
+    """
+    building_cum = cumulative([
+        min(rnd.paretovariate(BUILDING_PARETO_ALPHA), BUILDING_WEIGHT_CAP)
+        for _ in building_ids
+    ])
+    ranked = list(activity_ids)
+    rnd.shuffle(ranked)
+    activity_cum = cumulative([1 / (rank ** ACTIVITY_ZIPF_S) for rank in range(1, len(ranked) + 1)])
+    sizes = list(ACTIVITY_COUNT_WEIGHTS)
+    size_cum = cumulative(ACTIVITY_COUNT_WEIGHTS.values())
+
+    for start in range(0, count, chunk_size):
+        size = min(chunk_size, count - start)
+        buildings = rnd.choices(building_ids, cum_weights=building_cum, k=size)
+        link_counts = rnd.choices(sizes, cum_weights=size_cum, k=size)
+        orgs: List[dict] = []
+        links: List[dict] = []
+        for offset, (building_id, link_count) in enumerate(zip(buildings, link_counts)):
+            org_id = first_id + start + offset
+            orgs.append({
+                "id": org_id,
+                "name": f'{rnd.choice(LEGAL_FORMS)} "{rnd.choice(NAME_WORDS)}'
+                        f'{rnd.choice(NAME_WORDS).lower()} {org_id}"',
+                "phone_numbers": [
+                    f"8-9{rnd.randint(10, 99)}-{rnd.randint(100, 999)}-"
+                    f"{rnd.randint(10, 99)}-{rnd.randint(10, 99)}"
+                    for _ in range(rnd.randint(1, 3))
+                ],
+                "building_id": building_id,
+            })
+            chosen = set(rnd.choices(ranked, cum_weights=activity_cum, k=link_count))
+            links.extend(
+                {"organization_id": org_id, "activity_id": activity_id}
+                for activity_id in sorted(chosen)
+            )
+        yield orgs, links
+
+
+async def generate(
+        organizations: int,
+        buildings: int,
+        fanout: Sequence[int],
+        seed: int,
+        commit_every: int,
+) -> Dict[str, int]:
+    rnd = random.Random(seed)
+    counts = {}
+    async with AsyncSessionLocal() as session:
+        building_rows = make_buildings(rnd, buildings, await next_id(session, Building))
+        await insert_with_ids(session, Building.__table__, building_rows)
+        await session.commit()
+        counts["buildings"] = len(building_rows)
+
+        activity_rows = make_activities(rnd, fanout, await next_id(session, Activity))
+        await insert_with_ids(session, Activity.__table__, activity_rows)
+        await ActivityRepository(session).rebuild_closure()
+        counts["activities"] = len(activity_rows)
+
+        # корни дерева слишком общие, организации к ним не привязываем
+        linkable = [row["id"] for row in activity_rows if row["parent_id"] is not None]
+        counts["organizations"] = counts["organization_activities"] = 0
+        chunks = make_organizations(
+            rnd, organizations, await next_id(session, Organization),
+            [row["id"] for row in building_rows], linkable, commit_every,
+        )
+        for orgs, links in chunks:
+            await insert_with_ids(session, Organization.__table__, orgs)
+            await insert_with_ids(session, organization_activities, links)
+            await session.commit()
+            counts["organizations"] += len(orgs)
+            counts["organization_activities"] += len(links)
+            print(f"  organizations: {counts['organizations']}/{organizations}", flush=True)
+    return counts
+
+
+async def main(args: argparse.Namespace):
+    await init_db()
+    start = time.perf_counter()
+    counts = await generate(
+        organizations=args.organizations,
+        buildings=args.buildings or max(1, args.organizations // 10),
+        fanout=args.fanout,
+        seed=args.seed,
+        commit_every=args.commit_every,
+    )
+    await engine.dispose()
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    total = sum(counts.values())
+    print(f"{total} rows, {elapsed:.1f} s, {total / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=100_000)
+    parser.add_argument("--buildings", type=int, default=None,
+                        help="по умолчанию одна десятая от числа организаций")
+    parser.add_argument("--fanout", type=int, nargs="+", default=list(DEFAULT_FANOUT),
+                        help="наибольшее число детей на каждом уровне дерева")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--commit-every", type=int, default=50_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,213 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.activity import ActivityRepository
+from app.crud.building import BuildingRepository
+from app.crud.bulk import existing_ids
+from app.crud.organization import OrganizationRepository
+from app.models.building import Building
+from app.schemas.bulk import (ActivityImport, BuildingImport,
+                              BulkImportError, BulkImportResult,
+                              OrganizationImport)
+
+
+class BulkImportService:
+    """
+    Массовая загрузка зданий, видов деятельности и организаций.
+    Вся пачка проверяется сразу: внешние ключи сверяются с БД
+    запросами по множеству id, а не построчно. Ошибочные строки
+    пропускаются и попадают в отчёт, остальные записываются
+    многострочными INSERT ... ON CONFLICT в одной транзакции: сбой
+    на любом этапе не оставляет в БД части пачки.
+    """
+
+    FOREIGN_CYCLE = "Ancestor chain contains a cycle"
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+        self._buildings = BuildingRepository(session)
+        self._activities = ActivityRepository(session)
+        self._organizations = OrganizationRepository(session)
+        self._errors: List[BulkImportError] = []
+
+    async def run(
+            self,
+            buildings: Iterable[Dict[str, Any]] = (),
+            activities: Iterable[Dict[str, Any]] = (),
+            organizations: Iterable[Dict[str, Any]] = (),
+    ) -> BulkImportResult:
+        start = time.perf_counter()
+        self._errors = []
+
+        building_rows = self._parse("buildings", BuildingImport, buildings)
+        activity_rows = self._parse("activities", ActivityImport, activities)
+        org_rows = self._parse("organizations", OrganizationImport, organizations)
+
+        activity_rows, known_activities = await self._check_activities(activity_rows)
+        org_rows = await self._check_organizations(
+            org_rows,
+            {row.id for _, row in building_rows if row.id is not None},
+            known_activities,
+        )
+
+        org_dicts = [row.dict() for _, row in org_rows]
+        try:
+            if building_rows:
+                await self._buildings.bulk_upsert([row.dict() for _, row in building_rows])
+            if activity_rows:
+                await self._activities.bulk_upsert([row.dict() for _, row in activity_rows])
+            org_ids = await self._organizations.bulk_upsert(org_dicts) if org_rows else []
+            await self._session.commit()
+        except Exception:
+            await self._session.rollback()
+            raise
+        # кэши и индекс имён — только после фиксации всей пачки
+        if activity_rows:
+            await self._activities.after_bulk_commit()
+        if org_rows:
+            await self._organizations.after_bulk_commit(org_ids, org_dicts)
+
+        imported = {
+            "buildings": len(building_rows),
+            "activities": len(activity_rows),
+            "organizations": len(org_rows),
+        }
+        elapsed = time.perf_counter() - start
+        total = sum(imported.values())
+        return BulkImportResult(
+            imported=imported,
+            errors=sorted(self._errors, key=lambda e: (e.entity, e.index)),
+            elapsed_s=round(elapsed, 3),
+            rows_per_s=round(total / elapsed, 1) if elapsed else 0.0,
+        )
+
+    def _parse(
+            self,
+            entity: str,
+            schema: Type[BaseModel],
+            raw_rows: Iterable[Dict[str, Any]],
+    ) -> List[Tuple[int, Any]]:
+        """
+        Проверить строки по схеме; повтор id внутри пачки — ошибка.
+        Возвращает (номер строки, модель) для корректных строк.
+        """
+        rows: List[Tuple[int, Any]] = []
+        seen: Set[int] = set()
+        for index, raw in enumerate(raw_rows):
+            try:
+                row = schema.parse_obj(raw)
+            except ValidationError as exc:
+                self._error(entity, index, "; ".join(
+                    f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                    for err in exc.errors()
+                ))
+                continue
+            if row.id is not None:
+                if row.id in seen:
+                    self._error(entity, index, f"Duplicate id {row.id} in batch")
+                    continue
+                seen.add(row.id)
+            rows.append((index, row))
+        return rows
+
+    async def _check_activities(
+            self,
+            rows: List[Tuple[int, ActivityImport]],
+    ) -> Tuple[List[Tuple[int, ActivityImport]], Set[int]]:
+        """
+        Родитель каждой строки должен быть в БД или в пачке, а цепочка
+        предков (с учётом перезаписываемых строк) — без циклов.
+        Возвращает корректные строки, упорядоченные от корней к листьям,
+        и множество id, на которые могут ссылаться организации.
+        """
+        db_parents = await self._activities.parent_map()
+        parents: Dict[int, Optional[int]] = dict(db_parents)
+        for _, row in rows:
+            if row.id is not None:
+                parents[row.id] = row.parent_id
+
+        # отклонённая строка может быть предком других: после каждого
+        # отклонения возвращаем прежнего родителя и проверяем заново
+        pending = list(rows)
+        while True:
+            accepted: List[Tuple[int, int, ActivityImport]] = []
+            rejected = []
+            for index, row in pending:
+                depth, error = self._ancestry(row.id, row.parent_id, parents)
+                if error:
+                    rejected.append((index, row, error))
+                else:
+                    accepted.append((depth, index, row))
+            culprits = [item for item in rejected if item[2] != self.FOREIGN_CYCLE]
+            if not culprits:
+                culprits = rejected
+            for index, row, error in culprits:
+                self._error("activities", index, error)
+                if row.id is not None:
+                    if row.id in db_parents:
+                        parents[row.id] = db_parents[row.id]
+                    else:
+                        parents.pop(row.id, None)
+            if len(culprits) == len(rejected):
+                break
+            dropped = {index for index, _, _ in culprits}
+            pending = [(index, row) for index, row in pending if index not in dropped]
+
+        accepted.sort(key=lambda item: (item[2].id is None, item[0]))
+        known = set(db_parents) | {row.id for _, _, row in accepted if row.id is not None}
+        return [(index, row) for _, index, row in accepted], known
+
+    @classmethod
+    def _ancestry(
+            cls,
+            own_id: Optional[int],
+            parent_id: Optional[int],
+            parents: Dict[int, Optional[int]],
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Пройти цепочку предков: вернуть глубину узла или текст ошибки.
+        """
+        seen: Set[int] = set()
+        node = parent_id
+        while node is not None:
+            if node == own_id:
+                return 0, "Activity hierarchy would contain a cycle"
+            if node in seen:
+                # цикл выше по цепочке, сама строка в нём не участвует
+                return 0, cls.FOREIGN_CYCLE
+            if node not in parents:
+                return 0, f"Parent activity {node} not found"
+            seen.add(node)
+            node = parents[node]
+        return len(seen), None
+
+    async def _check_organizations(
+            self,
+            rows: List[Tuple[int, OrganizationImport]],
+            batch_buildings: Set[int],
+            known_activities: Set[int],
+    ) -> List[Tuple[int, OrganizationImport]]:
+        referenced = {row.building_id for _, row in rows} - batch_buildings
+        known_buildings = batch_buildings | await existing_ids(
+            self._session, Building.id, referenced
+        )
+
+        valid: List[Tuple[int, OrganizationImport]] = []
+        for index, row in rows:
+            problems = []
+            if row.building_id not in known_buildings:
+                problems.append(f"Building {row.building_id} not found")
+            missing = sorted(set(row.activity_ids) - known_activities)
+            if missing:
+                problems.append(f"Activities {missing} not found")
+            if problems:
+                self._error("organizations", index, "; ".join(problems))
+                continue
+            valid.append((index, row))
+        return valid
+
+    def _error(self, entity: str, index: int, detail: str) -> None:
+        self._errors.append(BulkImportError(entity=entity, index=index, detail=detail))
@@ -0,0 +1,342 @@
+import logging
+import pickle
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.cache")
+
+# теги результатов репозиториев
+ACTIVITIES_TAG = "activities"
+ORGANIZATIONS_TAG = "organizations"
+# все выборки по поддеревьям видов деятельности (меняются вместе с деревом)
+ACTIVITY_SUBTREES_TAG = "activity-subtrees"
+
+
+def building_organizations_tag(building_id: int) -> str:
+    return f"building:{building_id}:organizations"
+
+
+def activity_organizations_tag(activity_id: int) -> str:
+    return f"activity:{activity_id}:organizations"
+
+
+# отличает «нет в кэше» от закэшированного None
+MISSING = object()
+
+
+class MemoryBackend:
+    """
+    LRU-кэш с TTL в памяти процесса. Для каждого тега хранится
+    множество ключей, чтобы сбрасывать записи по тегу без перебора,
+    и поколение — число его сбросов.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = defaultdict(set)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str, tags: Tuple[str, ...]) -> Tuple[Any, Tuple[int, ...]]:
+        generations = tuple(self._generations[tag] for tag in tags)
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING, generations
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            return MISSING, generations
+        self._entries.move_to_end(key)
+        return value, generations
+
+    async def set(
+            self,
+            key: str,
+            value: Any,
+            tags: Tuple[str, ...],
+            generations: Tuple[int, ...],
+    ) -> bool:
+        if generations != tuple(self._generations[tag] for tag in tags):
+            return False
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self._ttl, value, tags)
+        for tag in tags:
+            self._keys_by_tag[tag].add(key)
+        while len(self._entries) > self._max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+        return True
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        dropped = 0
+        for tag in tags:
+            self._generations[tag] += 1
+            for key in self._keys_by_tag.pop(tag, ()):
+                if key in self._entries:
+                    self._drop(key)
+                    dropped += 1
+        return dropped
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_tag.clear()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class RedisBackend:
+    """
+    Кэш в Redis (или совместимом сервере), общий для всех воркеров.
+    Значения хранятся через pickle с TTL; тег — множество ключей,
+    его записи удаляются при сбросе тега. Поколения тегов (счётчики
+    сбросов) тоже лежат в Redis: запись сохраняется под WATCH, только
+    если ни один её тег не сбросили после начала чтения — в любом
+    воркере. Вытеснение по памяти делает сам сервер (maxmemory-policy)
+    и здесь не учитывается. Нужен пакет redis: pip install redis.
+    """
+
+    name = "redis"
+    # поколения живут дольше любой загрузки: истёкшее поколение
+    # читается как 0 и могло бы совпасть с прочитанным до сброса
+    GENERATION_TTL_SECONDS = 24 * 3600
+
+    def __init__(self, url: str, ttl: float, prefix: str):
+        try:
+            from redis import asyncio as redis
+            from redis.exceptions import WatchError
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis требует пакет redis") from exc
+        self._client = redis.from_url(url)
+        self._watch_error = WatchError
+        self._ttl = max(1, int(ttl))
+        self._prefix = prefix
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return 0
+
+    async def get(self, key: str, tags: Tuple[str, ...]) -> Tuple[Any, Tuple[int, ...]]:
+        raw, *generations = await self._client.mget(
+            self._prefix + key, *(self._generation_key(tag) for tag in tags)
+        )
+        value = MISSING if raw is None else pickle.loads(raw)
+        return value, tuple(int(generation or 0) for generation in generations)
+
+    async def set(
+            self,
+            key: str,
+            value: Any,
+            tags: Tuple[str, ...],
+            generations: Tuple[int, ...],
+    ) -> bool:
+        full_key = self._prefix + key
+        generation_keys = [self._generation_key(tag) for tag in tags]
+        async with self._client.pipeline(transaction=True) as pipe:
+            try:
+                if generation_keys:
+                    await pipe.watch(*generation_keys)
+                    current = await pipe.mget(*generation_keys)
+                    if tuple(int(generation or 0) for generation in current) != generations:
+                        return False
+                pipe.multi()
+                pipe.set(full_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=self._ttl)
+                for tag in tags:
+                    tag_key = self._tag_key(tag)
+                    pipe.sadd(tag_key, full_key)
+                    pipe.expire(tag_key, self._ttl)
+                await pipe.execute()
+            except self._watch_error:
+                # тег сбросили между проверкой и записью
+                return False
+        return True
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        dropped = 0
+        for tag in tags:
+            # поколение — до удаления ключей: идущие загрузки уже
+            # не сохранят своё значение
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.incr(self._generation_key(tag))
+                pipe.expire(self._generation_key(tag), self.GENERATION_TTL_SECONDS)
+                await pipe.execute()
+            tag_key = self._tag_key(tag)
+            keys = await self._client.smembers(tag_key)
+            if keys:
+                dropped += await self._client.delete(*keys)
+            await self._client.delete(tag_key)
+        return dropped
+
+    async def clear(self) -> None:
+        keys = [key async for key in self._client.scan_iter(match=self._prefix + "*")]
+        if keys:
+            await self._client.delete(*keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}tag:{tag}"
+
+    def _generation_key(self, tag: str) -> str:
+        return f"{self._prefix}gen:{tag}"
+
+
+class ReadThroughCache:
+    """
+    Кэш результатов чтения репозиториев. Запись помечается тегами
+    сущностей, от которых зависит; репозитории после записи в БД
+    сбрасывают затронутые теги.
+
+    Чтение, начавшееся до сброса тега, своё (возможно устаревшее)
+    значение не сохраняет: вместе с промахом бэкенд отдаёт поколения
+    тегов, и если к концу загрузки они сменились — результат
+    не кэшируется. Поколения хранит бэкенд, так что с Redis это
+    учитывает сбросы во всех воркерах.
+    Ошибки бэкенда не роняют запрос: чтение идёт мимо кэша.
+
+    Теги сбрасывают только репозитории, и лишь в своём процессе
+    (с бэкендом memory). Поэтому репозитории добавляют к ключу версии
+    таблиц из data_versions (TableVersions.stamp): после записи в обход
+    репозиториев или в другом воркере (synthetic_data, импорт CLI, psql)
+    следующее чтение идёт мимо прежней записи, а закэшированное тело
+    всегда соответствует ETag, под которым отдаётся.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.cache_backend != "off"
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._make_backend()
+        return self._backend
+
+    async def get_or_load(
+            self,
+            key: str,
+            tags: Iterable[str],
+            loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Значение по ключу из кэша; при промахе — loader() с сохранением.
+        """
+        if not self.enabled:
+            return await loader()
+        tags = tuple(tags)
+        try:
+            value, generations = await self.backend.get(key, tags)
+        except Exception as exc:
+            self._failed("get", exc)
+            return await loader()
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await loader()
+        try:
+            await self.backend.set(key, value, tags, generations)
+        except Exception as exc:
+            self._failed("set", exc)
+        return value
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        Сбросить все записи с любым из тегов.
+        """
+        if not self.enabled or not tags:
+            return
+        try:
+            self.invalidations += await self.backend.invalidate(tags)
+        except Exception as exc:
+            self._failed("invalidate", exc)
+
+    async def clear(self) -> None:
+        if self.enabled:
+            await self.backend.clear()
+
+    def stats(self) -> dict:
+        backend = self.backend if self.enabled else None
+        return {
+            "backend": backend.name if backend is not None else "off",
+            "size": len(backend) if backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": backend.evictions if backend is not None else 0,
+            "expirations": backend.expirations if backend is not None else 0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+    @staticmethod
+    def _make_backend():
+        if settings.cache_backend == "redis":
+            return RedisBackend(settings.cache_url, settings.cache_ttl_seconds,
+                                settings.cache_key_prefix)
+        if settings.cache_backend == "memory":
+            return MemoryBackend(settings.cache_max_entries, settings.cache_ttl_seconds)
+        raise ValueError(f"Unknown CACHE_BACKEND: {settings.cache_backend}")
+
+    def _failed(self, operation: str, exc: Exception) -> None:
+        self.errors += 1
+        logger.warning("cache %s failed: %s", operation, exc)
+
+
+class CacheCollector:
+    """
+    Счётчики кэша в метриках Prometheus (/api/v1/internal/metrics).
+    """
+
+    def __init__(self, cache: ReadThroughCache):
+        self._cache = cache
+
+    def collect(self):
+        stats = self._cache.stats()
+        requests = CounterMetricFamily("cache_requests", "Обращения к кэшу чтения",
+                                       labels=["result"])
+        requests.add_metric(["hit"], stats["hits"])
+        requests.add_metric(["miss"], stats["misses"])
+        yield requests
+        removed = CounterMetricFamily("cache_removals", "Удалённые из кэша записи",
+                                      labels=["reason"])
+        removed.add_metric(["evicted"], stats["evictions"])
+        removed.add_metric(["expired"], stats["expirations"])
+        removed.add_metric(["invalidated"], stats["invalidations"])
+        yield removed
+        yield CounterMetricFamily("cache_errors", "Ошибки бэкенда кэша", value=stats["errors"])
+        yield GaugeMetricFamily("cache_entries", "Записей в кэше", value=stats["size"])
+
+
+response_cache = ReadThroughCache()
+REGISTRY.register(CacheCollector(response_cache))
@@ -1,7 +1,29 @@
 import math
-from typing import List, Tuple
+from typing import Iterable, Tuple
 
-from app.models.organization import Organization
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class CoordinateStore:
+    """
+    Координаты набора объектов в виде массивов NumPy (id, lat, lon).
+    Позволяет считать расстояния и маски для всего набора за один вызов.
+    """
+
+    def __init__(
+            self,
+            ids: Iterable[int],
+            latitudes: Iterable[float],
+            longitudes: Iterable[float]
+    ):
+        self.ids = np.asarray(list(ids), dtype=np.int64)
+        self.latitudes = np.asarray(list(latitudes), dtype=np.float64)
+        self.longitudes = np.asarray(list(longitudes), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
 
 
 class GeoSearchService:
@@ -35,39 +57,155 @@ class GeoSearchService:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return cls.EARTH_RADIUS_KM * c
 
-    def filter_by_radius(
-            self,
-            orgs: List[Organization],
+    @classmethod
+    def bounding_box(
+            cls,
             center: Tuple[float, float],
             radius_km: float
-    ) -> List[Organization]:
+    ) -> Tuple[Tuple[float, float], Tuple[float, float]]:
         """
-        Отфильтровать организации, чьи координаты в пределах заданного радиуса.
-        :param orgs: список организаций с атрибутом building.latitude и building.longitude
-        :param center: кортеж (lat, lon) центра
-        :param radius_km: радиус поиска в км
+        Описанный вокруг круга поиска прямоугольник (sw, ne) в градусах.
+        Используется как грубый фильтр по индексу перед точной проверкой.
+        Если круг захватывает полюс или антимеридиан, по долготе
+        прямоугольник расширяется на весь диапазон.
         """
         lat0, lon0 = center
-        result: List[Organization] = []
-        for org in orgs:
-            lat, lon = org.building.latitude, org.building.longitude
-            if self.haversine_distance(lat0, lon0, lat, lon) <= radius_km:
-                result.append(org)
-        return result
-
-    def filter_by_bbox(
-            self,
-            orgs: List[Organization],
+        angular = radius_km / cls.EARTH_RADIUS_KM
+        dlat = math.degrees(angular)
+        sw_lat, ne_lat = max(lat0 - dlat, -90.0), min(lat0 + dlat, 90.0)
+
+        cos_lat = math.cos(math.radians(lat0))
+        if sw_lat <= -90.0 or ne_lat >= 90.0 or math.sin(angular) >= cos_lat:
+            return (sw_lat, -180.0), (ne_lat, 180.0)
+
+        dlon = math.degrees(math.asin(math.sin(angular) / cos_lat))
+        if lon0 - dlon < -180.0 or lon0 + dlon > 180.0:
+            return (sw_lat, -180.0), (ne_lat, 180.0)
+        return (sw_lat, lon0 - dlon), (ne_lat, lon0 + dlon)
+
+    @classmethod
+    def bbox_clause(
+            cls,
+            lat_col,
+            lon_col,
+            sw: Tuple[float, float],
+            ne: Tuple[float, float]
+    ) -> ColumnElement:
+        """
+        SQL-условие попадания координат в прямоугольник (использует индекс).
+        """
+        sw_lat, sw_lon = sw
+        ne_lat, ne_lon = ne
+        return and_(
+            lat_col.between(sw_lat, ne_lat),
+            lon_col.between(sw_lon, ne_lon),
+        )
+
+    @classmethod
+    def radius_clause(
+            cls,
+            lat_col,
+            lon_col,
+            center: Tuple[float, float],
+            radius_km: float
+    ) -> ColumnElement:
+        """
+        SQL-условие попадания координат в круг заданного радиуса:
+        прямоугольный префильтр по индексу + точная проверка по Гаверсинусу.
+
+        Вместо расстояния сравнивается подкоренное выражение формулы
+        (a <= sin²(r / 2R)), поэтому в SQL не нужны обратные
+        тригонометрические функции и нет риска выйти за их область
+        определения из-за погрешности округления.
+        """
+        sw, ne = cls.bounding_box(center, radius_km)
+
+        half_angle = min(radius_km / cls.EARTH_RADIUS_KM, math.pi) / 2
+        threshold = math.sin(half_angle) ** 2
+
+        a = cls._haversine_term(lat_col, lon_col, center)
+        return and_(cls.bbox_clause(lat_col, lon_col, sw, ne), a <= threshold)
+
+    @classmethod
+    def distance_clause(
+            cls,
+            lat_col,
+            lon_col,
+            center: Tuple[float, float]
+    ) -> ColumnElement:
+        """
+        SQL-выражение расстояния (км) от центра по Гаверсинусу.
+        Монотонно по тому же подкоренному выражению, что и radius_clause:
+        строка вне круга не ближе любой строки внутри него.
+        """
+        a = cls._haversine_term(lat_col, lon_col, center)
+        # погрешность округления не должна вывести asin из [-1, 1]
+        return 2 * cls.EARTH_RADIUS_KM * func.asin(func.least(func.sqrt(a), 1.0))
+
+    @staticmethod
+    def _haversine_term(lat_col, lon_col, center: Tuple[float, float]) -> ColumnElement:
+        lat0, lon0 = center
+        dlat = func.radians(lat_col - lat0)
+        dlon = func.radians(lon_col - lon0)
+        return (
+                func.power(func.sin(dlat / 2), 2)
+                + math.cos(math.radians(lat0))
+                * func.cos(func.radians(lat_col))
+                * func.power(func.sin(dlon / 2), 2)
+        )
+
+    @classmethod
+    def batch_haversine_distance(
+            cls,
+            lat0: float,
+            lon0: float,
+            latitudes: np.ndarray,
+            longitudes: np.ndarray
+    ) -> np.ndarray:
+        """
+        Векторный вариант haversine_distance: расстояния (км) от точки
+        (lat0, lon0) до каждой точки массивов за один вызов.
+        """
+        lat0_rad = math.radians(lat0)
+        lat_rad = np.radians(latitudes)
+        dlat = lat_rad - lat0_rad
+        dlon = np.radians(longitudes - lon0)
+        a = (
+                np.sin(dlat / 2) ** 2
+                + math.cos(lat0_rad) * np.cos(lat_rad) * np.sin(dlon / 2) ** 2
+        )
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return cls.EARTH_RADIUS_KM * c
+
+    @classmethod
+    def radius_mask(
+            cls,
+            store: CoordinateStore,
+            center: Tuple[float, float],
+            radius_km: float
+    ) -> np.ndarray:
+        """
+        Булева маска точек хранилища, попадающих в круг.
+        """
+        lat0, lon0 = center
+        distances = cls.batch_haversine_distance(
+            lat0, lon0, store.latitudes, store.longitudes
+        )
+        return distances <= radius_km
+
+    @classmethod
+    def bbox_mask(
+            cls,
+            store: CoordinateStore,
             sw: Tuple[float, float],
             ne: Tuple[float, float]
-    ) -> List[Organization]:
+    ) -> np.ndarray:
         """
-        Отфильтровать организации, находящиеся внутри прямоугольника,
-        заданного координатами юго-западного (sw) и северо-восточного (ne) углов.
+        Булева маска точек хранилища внутри прямоугольника (sw, ne).
         """
         sw_lat, sw_lon = sw
         ne_lat, ne_lon = ne
-        return [
-            org for org in orgs
-            if sw_lat <= org.building.latitude <= ne_lat and sw_lon <= org.building.longitude <= ne_lon
-        ]
+        return (
+                (store.latitudes >= sw_lat) & (store.latitudes <= ne_lat)
+                & (store.longitudes >= sw_lon) & (store.longitudes <= ne_lon)
+        )
@@ -0,0 +1,138 @@
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Триграммы строки по правилам pg_trgm: регистр игнорируется,
+    каждое слово дополняется двумя пробелами слева и одним справа.
+    """
+    result: Set[str] = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(result)
+
+
+def similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """
+    Доля общих триграмм, как similarity() в pg_trgm.
+    """
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class NgramIndex:
+    """
+    Триграммный индекс названий в памяти процесса.
+    Запасной вариант поиска по названию для СУБД без pg_trgm (SQLite):
+    инвертированный индекс триграмма -> ID и отсортированный список
+    названий для поиска по префиксу.
+    """
+
+    # минимальное сходство для нечёткого совпадения (как pg_trgm.similarity_threshold)
+    SIMILARITY_THRESHOLD: float = 0.3
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+        self._grams: Dict[int, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted: List[Tuple[str, int]] = []
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def build(self, rows: Iterable[Tuple[int, str]]) -> None:
+        """
+        Полностью перестроить индекс по парам (id, название).
+        """
+        self._names = {}
+        self._grams = {}
+        self._postings = defaultdict(set)
+        for item_id, name in rows:
+            self._names[item_id] = name
+            self._grams[item_id] = trigrams(name)
+            for gram in self._grams[item_id]:
+                self._postings[gram].add(item_id)
+        self._sorted = sorted(
+            (name.lower(), item_id) for item_id, name in self._names.items()
+        )
+        self._ready = True
+
+    def reset(self) -> None:
+        """
+        Забыть содержимое: индекс перестроится при следующем обращении.
+        """
+        self._ready = False
+
+    def upsert(self, item_id: int, name: str) -> None:
+        self.remove(item_id)
+        grams = trigrams(name)
+        self._names[item_id] = name
+        self._grams[item_id] = grams
+        for gram in grams:
+            self._postings[gram].add(item_id)
+        bisect.insort(self._sorted, (name.lower(), item_id))
+
+    def remove(self, item_id: int) -> None:
+        name = self._names.pop(item_id, None)
+        if name is None:
+            return
+        for gram in self._grams.pop(item_id):
+            bucket = self._postings[gram]
+            bucket.discard(item_id)
+            if not bucket:
+                del self._postings[gram]
+        pos = bisect.bisect_left(self._sorted, (name.lower(), item_id))
+        if pos < len(self._sorted) and self._sorted[pos] == (name.lower(), item_id):
+            del self._sorted[pos]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Пары (id, сходство) для названий, содержащих запрос как подстроку
+        или похожих на него, по убыванию сходства.
+        """
+        needle = query.lower()
+        grams = trigrams(query)
+        candidates: Set[int] = set()
+        if any(len(word) >= 3 for word in _WORD_RE.findall(needle)):
+            for gram in grams:
+                candidates |= self._postings.get(gram, set())
+        else:
+            # у коротких слов нет внутренних триграмм — подстроку
+            # внутри слова по индексу не найти, проверяем все названия
+            candidates = set(self._names)
+
+        scored: List[Tuple[int, float]] = []
+        for item_id in candidates:
+            score = similarity(grams, self._grams[item_id])
+            if needle in self._names[item_id].lower() or score >= self.SIMILARITY_THRESHOLD:
+                scored.append((item_id, score))
+        scored.sort(key=lambda pair: (-pair[1], pair[0]))
+        return scored[:limit]
+
+    def prefix(self, query: str, limit: int) -> List[int]:
+        """
+        ID названий, начинающихся с query (без учёта регистра), по алфавиту.
+        """
+        needle = query.lower()
+        pos = bisect.bisect_left(self._sorted, (needle, -1))
+        result: List[int] = []
+        while pos < len(self._sorted) and len(result) < limit:
+            name, item_id = self._sorted[pos]
+            if not name.startswith(needle):
+                break
+            result.append(item_id)
+            pos += 1
+        return result
+
+
+organization_name_index = NgramIndex()
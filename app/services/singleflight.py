@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов: пока загрузка по ключу
+    выполняется, новые вызовы с тем же ключом ждут её результат (или
+    исключение), а не запускают свою.
+
+    Загрузка идёт отдельной задачей, не привязанной к запросу, который
+    её начал: отмена этого запроса не роняет остальных ждущих. Задача
+    отменяется, только когда ждать её результат больше некому.
+    Результат не кэшируется — по завершении ключ освобождается.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+        self.abandoned = 0
+
+    async def do(
+            self,
+            key: Hashable,
+            load: Callable[[], Awaitable[Any]],
+            timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Результат load() — своей или уже идущей загрузки с тем же ключом.
+        Не дождавшись за timeout секунд, бросает asyncio.TimeoutError;
+        следующие вызовы тогда начинают новую загрузку.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(load()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self.abandoned += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+        }
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+class SingleFlightCollector:
+    """
+    Счётчики объединения запросов в метриках Prometheus.
+    """
+
+    def __init__(self, flights: SingleFlight):
+        self._flights = flights
+
+    def collect(self):
+        stats = self._flights.stats()
+        calls = CounterMetricFamily("coalesced_calls", "Вызовы с объединением загрузки",
+                                    labels=["role"])
+        calls.add_metric(["leader"], stats["leaders"])
+        calls.add_metric(["follower"], stats["followers"])
+        yield calls
+        yield CounterMetricFamily("coalesced_timeouts", "Не дождались общей загрузки",
+                                  value=stats["timeouts"])
+        yield CounterMetricFamily("coalesced_abandoned", "Загрузки, отменённые без ждущих",
+                                  value=stats["abandoned"])
+        yield GaugeMetricFamily("coalesced_in_flight", "Идущие общие загрузки",
+                                value=stats["in_flight"])
+
+
+query_flights = SingleFlight()
+REGISTRY.register(SingleFlightCollector(query_flights))
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import math
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models.building import Building
+from app.services.geosearch import GeoSearchService
+
+logger = logging.getLogger("app.spatial_index")
+
+Cell = Tuple[int, int]
+
+
+class BuildingSpatialIndex:
+    """
+    Пространственный индекс зданий в памяти процесса.
+    Равномерная сетка по широте/долготе: каждое здание лежит ровно
+    в одной ячейке, поиск перебирает только ячейки, пересекающие
+    запрошенную область, и проверяет точки внутри них.
+
+    Индекс помнит версию buildings из data_versions, по которой построен.
+    Записи этого процесса применяются сразу (apply_write) и сдвигают
+    версию индекса вместе с версией БД; отставший от БД индекс (запись
+    другим процессом или воркером) не используется, пока не перестроится.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.05):
+        self._cell_size = cell_size_deg
+        self._cells: Dict[Cell, Set[int]] = defaultdict(set)
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._ready = False
+        self._version: Optional[int] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """
+        Индекс заполнен (но может отставать от БД, см. is_fresh).
+        """
+        return self._ready
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def is_fresh(self, version: int) -> bool:
+        """
+        Индекс построен по данным не старше версии version.
+        """
+        return self._ready and self._version is not None and self._version >= version
+
+    def refresh(self, rebuild: Callable[[], Awaitable[None]]) -> None:
+        """
+        Запустить rebuild() в фоне, если перестройка ещё не идёт.
+        """
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(rebuild())
+            self._refreshing.add_done_callback(self._log_failure)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def build(self, buildings: Iterable[Building], version: Optional[int] = None) -> None:
+        """
+        Полностью перестроить индекс по списку зданий, прочитанному
+        после версии buildings version.
+        """
+        cells: Dict[Cell, Set[int]] = defaultdict(set)
+        points: Dict[int, Tuple[float, float]] = {}
+        for building in buildings:
+            points[building.id] = (building.latitude, building.longitude)
+            cells[self._cell_of(building.latitude, building.longitude)].add(building.id)
+        # подменяем целиком: поиск во время перестройки видит старый индекс
+        self._cells, self._points = cells, points
+        self._version = version
+        self._ready = True
+
+    def apply_write(
+            self,
+            building_id: int,
+            point: Optional[Tuple[float, float]],
+    ) -> None:
+        """
+        Применить зафиксированную запись этого процесса в одну строку
+        buildings: point — новые координаты, None — здание удалено.
+        Такая запись увеличила версию buildings ровно на 1, и индекс
+        засчитывает её себе: если других записей не было, он остаётся
+        актуальным без перестройки. Записи других процессов так
+        не засчитываются — индекс отстанет от БД и перестроится.
+        """
+        if not self._ready or self._version is None:
+            return
+        if point is None:
+            self.remove(building_id)
+        else:
+            self.upsert(building_id, *point)
+        self._version += 1
+
+    def upsert(self, building_id: int, lat: float, lon: float) -> None:
+        """
+        Добавить здание или обновить его координаты.
+        """
+        self.remove(building_id)
+        self._insert(building_id, lat, lon)
+
+    def remove(self, building_id: int) -> None:
+        point = self._points.pop(building_id, None)
+        if point is None:
+            return
+        cell = self._cell_of(*point)
+        bucket = self._cells[cell]
+        bucket.discard(building_id)
+        if not bucket:
+            del self._cells[cell]
+
+    def ids_in_bbox(
+            self,
+            sw: Tuple[float, float],
+            ne: Tuple[float, float]
+    ) -> List[int]:
+        """
+        ID зданий внутри прямоугольника (sw, ne).
+        """
+        sw_lat, sw_lon = sw
+        ne_lat, ne_lon = ne
+        return [
+            building_id
+            for building_id in self._candidates(sw, ne)
+            if sw_lat <= self._points[building_id][0] <= ne_lat
+            and sw_lon <= self._points[building_id][1] <= ne_lon
+        ]
+
+    def ids_in_radius(
+            self,
+            center: Tuple[float, float],
+            radius_km: float
+    ) -> List[int]:
+        """
+        ID зданий в пределах радиуса от центра.
+        """
+        return [
+            building_id
+            for building_id, _ in self.distances_in_radius(center, radius_km)
+        ]
+
+    def distances_in_radius(
+            self,
+            center: Tuple[float, float],
+            radius_km: float
+    ) -> List[Tuple[int, float]]:
+        """
+        Пары (ID здания, расстояние в км) для зданий в пределах радиуса.
+        """
+        lat0, lon0 = center
+        sw, ne = GeoSearchService.bounding_box(center, radius_km)
+        distance = GeoSearchService.haversine_distance
+        result: List[Tuple[int, float]] = []
+        for building_id in self._candidates(sw, ne):
+            lat, lon = self._points[building_id]
+            km = distance(lat0, lon0, lat, lon)
+            if km <= radius_km:
+                result.append((building_id, km))
+        return result
+
+    def nearest_distance(
+            self,
+            center: Tuple[float, float],
+            count: int,
+            beyond: float = 0.0,
+            start_km: float = 1.0,
+    ) -> Optional[float]:
+        """
+        Расстояние (км) до count-го ближайшего к центру здания среди
+        тех, что не ближе beyond; None, если таких зданий меньше count.
+        Радиус поиска удваивается от start_km, так что перебираются
+        только ячейки вокруг центра.
+        """
+        max_km = math.pi * GeoSearchService.EARTH_RADIUS_KM
+        radius = max(start_km, beyond * 2)
+        while True:
+            found = sorted(
+                km for _, km in self.distances_in_radius(center, radius) if km >= beyond
+            )
+            if len(found) >= count:
+                return found[count - 1]
+            if radius >= max_km:
+                return None
+            radius *= 2
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("spatial index rebuild failed: %s", task.exception())
+
+    def _insert(self, building_id: int, lat: float, lon: float) -> None:
+        self._points[building_id] = (lat, lon)
+        self._cells[self._cell_of(lat, lon)].add(building_id)
+
+    def _cell_of(self, lat: float, lon: float) -> Cell:
+        return (
+            math.floor(lat / self._cell_size),
+            math.floor(lon / self._cell_size),
+        )
+
+    def _candidates(
+            self,
+            sw: Tuple[float, float],
+            ne: Tuple[float, float]
+    ) -> Iterable[int]:
+        """
+        ID зданий из ячеек, пересекающих прямоугольник.
+        Для очень больших областей дешевле пройти по непустым ячейкам,
+        чем перебирать все ячейки диапазона.
+        """
+        row_min, col_min = self._cell_of(*sw)
+        row_max, col_max = self._cell_of(*ne)
+        span = (row_max - row_min + 1) * (col_max - col_min + 1)
+
+        if span > len(self._cells):
+            for (row, col), bucket in self._cells.items():
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield from bucket
+            return
+
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self._cells.get((row, col))
+                if bucket:
+                    yield from bucket
+
+
+# Общий индекс процесса: строится при старте приложения и перестраивается
+# в фоне, когда версия buildings в БД его обгоняет (см. BuildingRepository).
+building_index = BuildingSpatialIndex()
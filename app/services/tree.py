@@ -1,19 +1,112 @@
-from typing import Dict, List
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.activity import Activity
+from app.services.versions import table_versions
 
 
 class ActivityTreeService:
     """
     Сервис для работы с иерархией видов деятельности.
     Позволяет собирать всех потомков узла на заданную глубину.
+
+    Дерево хранится компактно и неизменяемо: узлы пронумерованы
+    позициями, для каждой позиции известны родитель и дети.
+    Дополнительно узлы пронумерованы обходом в глубину (Euler tour):
+    поддерево узла занимает непрерывный отрезок [enter, exit) порядка
+    обхода, поэтому потомки до глубины N — это срез с фильтром по глубине.
     """
 
-    def __init__(self, activities: List[Activity]):
-        # Создаём маппинг id -> объект для быстрого доступа
-        self._activities: Dict[int, Activity] = {
-            act.id: act for act in activities
-        }
+    def __init__(self, activities: Iterable[Activity]):
+        self._build((act.id, act.parent_id) for act in activities)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, Optional[int]]]) -> "ActivityTreeService":
+        """
+        Построить дерево по парам (id, parent_id) без ORM-объектов.
+        """
+        tree = cls.__new__(cls)
+        tree._build(rows)
+        return tree
+
+    def _build(self, rows: Iterable[Tuple[int, Optional[int]]]) -> None:
+        pairs = list(rows)
+        ids = tuple(act_id for act_id, _ in pairs)
+        # Создаём маппинг id -> позиция для быстрого доступа
+        index: Dict[int, int] = {act_id: pos for pos, act_id in enumerate(ids)}
+
+        parents: List[int] = []
+        children: List[List[int]] = [[] for _ in ids]
+        for pos, (_, parent_id) in enumerate(pairs):
+            parent_pos = index.get(parent_id, -1) if parent_id is not None else -1
+            parents.append(parent_pos)
+            if parent_pos >= 0:
+                children[parent_pos].append(pos)
+
+        self._ids: Tuple[int, ...] = ids
+        self._index = index
+        self._parents: Tuple[int, ...] = tuple(parents)
+        self._children: Tuple[Tuple[int, ...], ...] = tuple(map(tuple, children))
+        self._number()
+
+    def _number(self) -> None:
+        """
+        Итеративный обход в глубину от всех корней: позиции входа/выхода
+        и глубина каждого узла. Узлы, недостижимые от корней (цикл
+        в данных), получают пустой отрезок.
+        """
+        size = len(self._ids)
+        enter = [-1] * size
+        exit_ = [-1] * size
+        depth = [0] * size
+        order: List[int] = []
+
+        roots = [pos for pos, parent in enumerate(self._parents) if parent < 0]
+        for root in roots:
+            stack = [(root, False)]
+            while stack:
+                pos, leaving = stack.pop()
+                if leaving:
+                    exit_[pos] = len(order)
+                    continue
+                enter[pos] = len(order)
+                order.append(pos)
+                stack.append((pos, True))
+                for child in reversed(self._children[pos]):
+                    depth[child] = depth[pos] + 1
+                    stack.append((child, False))
+
+        self._enter: Tuple[int, ...] = tuple(enter)
+        self._exit: Tuple[int, ...] = tuple(exit_)
+        self._depth: Tuple[int, ...] = tuple(depth)
+        # ID и глубина в порядке обхода — для среза по отрезку поддерева
+        self._tour_ids = np.fromiter(
+            (self._ids[pos] for pos in order), dtype=np.int64, count=len(order)
+        )
+        self._tour_depth = np.fromiter(
+            (depth[pos] for pos in order), dtype=np.int32, count=len(order)
+        )
+
+    def interval(self, activity_id: int) -> Optional[Tuple[int, int, int]]:
+        """
+        (enter, exit, depth) узла: его поддерево — позиции обхода
+        enter <= i < exit.
+        """
+        pos = self._index.get(activity_id)
+        if pos is None or self._enter[pos] < 0:
+            return None
+        return self._enter[pos], self._exit[pos], self._depth[pos]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, activity_id: int) -> bool:
+        return activity_id in self._index
 
     def gather_descendant_ids(
         self,
@@ -24,15 +117,65 @@ class ActivityTreeService:
         Собрать ID всех узлов дерева, лежащих внутри узла с root_id,
         до глубины max_level (включительно).
         """
+        span = self.interval(root_id)
+        if span is None or max_level < 1:
+            return []
+        enter, exit_, depth = span
+        ids = self._tour_ids[enter:exit_]
+        depths = self._tour_depth[enter:exit_]
+        return ids[depths < depth + max_level].tolist()
+
+
+class ActivityTreeCache:
+    """
+    Общий для процесса снимок дерева видов деятельности.
+    Перестраивается, когда версия activities в БД (data_versions)
+    обогнала версию снимка — после записи любым процессом, включая
+    CLI-импорт и генератор данных. Проверка версии — один запрос
+    по первичному ключу вместо чтения всей таблицы.
+    """
+
+    TABLE = "activities"
+
+    def __init__(self):
+        self._tree: Optional[ActivityTreeService] = None
+        self._version: Optional[int] = None
+        # последняя версия, прочитанная из БД
+        self._seen_version: Optional[int] = None
+        self._built_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: AsyncSession) -> ActivityTreeService:
+        # версию читаем до запроса дерева: запись во время построения
+        # снова сделает снимок устаревшим
+        versions = await table_versions.fetch(session, [self.TABLE])
+        version = versions[self.TABLE].version
+        self._seen_version = max(version, self._seen_version or 0)
+        if self._is_fresh(version):
+            return self._tree
+        async with self._lock:
+            if self._is_fresh(version):
+                return self._tree
+            rows = await session.execute(select(Activity.id, Activity.parent_id))
+            self._tree = ActivityTreeService.from_rows(rows.all())
+            self._version = version
+            self._built_at = datetime.now(timezone.utc)
+            return self._tree
+
+    def info(self) -> dict:
+        """
+        Сведения о текущем снимке для диагностики.
+        """
+        return {
+            "version": self._version,
+            "built_at": self._built_at,
+            "size": len(self._tree) if self._tree is not None else 0,
+            "stale": self._seen_version is None or not self._is_fresh(self._seen_version),
+        }
 
-        result: List[int] = []
+    def _is_fresh(self, version: int) -> bool:
+        # снимок новее данных отстающей реплики тоже годится
+        return self._tree is not None and self._version >= version
 
-        def _dfs(current_id: int, level: int):
-            if level > max_level or current_id not in self._activities:
-                return
-            result.append(current_id)
-            for child in self._activities[current_id].children:
-                _dfs(child.id, level + 1)
 
-        _dfs(root_id, 1)
-        return result
+activity_tree_cache = ActivityTreeCache()
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import VERSIONS_KEY
+from app.models.versions import data_versions
+
+# версия таблицы, строки которой ещё нет в data_versions
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class DataVersion(NamedTuple):
+    version: int
+    changed_at: datetime
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает CURRENT_TIMESTAMP без зоны, но в UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class TableVersions:
+    """
+    Версии таблиц из БД (data_versions): счётчик изменений и время
+    последнего изменения. Счётчики увеличивают триггеры в транзакции
+    записи, поэтому записи любого процесса — воркеров приложения,
+    CLI-импорта, генератора данных — видны всем. Кэши процесса
+    сравнивают с ними свою версию, условный GET строит из них ETag.
+    """
+
+    async def fetch(self, session: AsyncSession, tables: Iterable[str]) -> Dict[str, DataVersion]:
+        """
+        Версии таблиц одним запросом: сумма счётчиков по слотам
+        и самое позднее время изменения.
+        """
+        tables = list(tables)
+        result = await session.execute(
+            select(
+                data_versions.c.table_name,
+                func.sum(data_versions.c.version).label("version"),
+                func.max(data_versions.c.changed_at).label("changed_at"),
+            )
+            .where(data_versions.c.table_name.in_(tables))
+            .group_by(data_versions.c.table_name)
+        )
+        found = {
+            # sum(bigint) в PostgreSQL — numeric
+            row.table_name: DataVersion(int(row.version), _as_utc(row.changed_at))
+            for row in result
+        }
+        return {table: found.get(table, DataVersion(0, EPOCH)) for table in tables}
+
+    async def current(self, session: AsyncSession, tables: Iterable[str]) -> Dict[str, DataVersion]:
+        """
+        Версии таблиц, уже прочитанные условным GET этого запроса (их
+        сессия чтения получает в info), или, если их нет, — fetch.
+        """
+        tables = list(tables)
+        known = session.info.get(VERSIONS_KEY) or {}
+        if all(table in known for table in tables):
+            return {table: known[table] for table in tables}
+        return await self.fetch(session, tables)
+
+    async def stamp(self, session: AsyncSession, tables: Iterable[str]) -> str:
+        """
+        Версии таблиц одной строкой (как ETag) для ключей кэша: после
+        записи в таблицы — любым процессом — ключ меняется, и прежнее
+        значение больше не находится.
+        """
+        return self.etag(await self.current(session, tables))
+
+    @staticmethod
+    def etag(versions: Dict[str, DataVersion]) -> str:
+        """
+        Слабый ETag по версиям из fetch. Время изменения отличает
+        одинаковые счётчики пересозданной БД.
+        """
+        counters = ".".join(str(version.version) for version in versions.values())
+        changed_at = max(version.changed_at for version in versions.values())
+        return f'W/"{counters}-{int(changed_at.timestamp() * 1000):x}"'
+
+
+table_versions = TableVersions()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+
+# движок создаётся при импорте app.db.session, поэтому окружение — до него
+_db_dir = tempfile.mkdtemp(prefix="ozd-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["API_KEY"] = "test"
+os.environ["CACHE_BACKEND"] = "memory"
+
+import httpx
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+from app.crud.building import rebuild_spatial_index
+from app.db.session import AsyncSessionLocal, Base, engine
+from app.main import app
+from app.models.versions import data_versions
+from app.scripts.demo_data import seed
+from app.services.cache import response_cache
+from app.services.ngram import organization_name_index
+
+AUTH = {"Authorization": "Bearer test"}
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+async def session():
+    """
+    Сессия к БД с демо-данными (app.scripts.demo_data), пересозданной
+    для теста. data_versions не пересоздаётся: версии только растут,
+    и кэши процесса (дерево, пространственный индекс) не примут
+    новую БД за уже загруженную.
+    """
+    tables = [table for table in Base.metadata.sorted_tables if table is not data_versions]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=tables)
+        await conn.run_sync(Base.metadata.create_all)
+    await seed()
+    await response_cache.clear()
+    organization_name_index.reset()
+    # как при старте приложения (lifespan)
+    await rebuild_spatial_index()
+    async with AsyncSessionLocal() as session:
+        yield session
+    # фоновые задачи (перестройка индекса) — до закрытия движка
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.gather(*pending, return_exceptions=True)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(session):
+    """
+    HTTP-клиент к приложению с ключом API; БД — как в фикстуре session.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                 headers=AUTH) as client:
+        yield client
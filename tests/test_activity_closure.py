@@ -0,0 +1,105 @@
+from typing import Dict, Optional, Set, Tuple
+
+import pytest
+from sqlalchemy import select
+
+from app.crud.activity import ActivityRepository
+from app.models.activity import Activity, activity_closure
+from app.models.organization import organization_activities
+
+# демо-данные: 1 Еда (3 Мясная, 4 Молочная), 2 Автомобили (5 Грузовые, 6 Запчасти)
+FOOD, CARS, MEAT, DAIRY, TRUCKS = 1, 2, 3, 4, 5
+
+
+async def closure_rows(session) -> Set[Tuple[int, int, int]]:
+    result = await session.execute(
+        select(activity_closure.c.ancestor_id, activity_closure.c.descendant_id,
+               activity_closure.c.depth)
+    )
+    return set(result.all())
+
+
+async def expected_closure(session) -> Set[Tuple[int, int, int]]:
+    """
+    Пути замыкания, посчитанные заново по parent_id.
+    """
+    result = await session.execute(select(Activity.id, Activity.parent_id))
+    parents: Dict[int, Optional[int]] = dict(result.all())
+    rows = set()
+    for node in parents:
+        ancestor, depth = node, 0
+        while ancestor is not None:
+            rows.add((ancestor, node, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    return rows
+
+
+async def test_create_links_to_all_ancestors(session):
+    repo = ActivityRepository(session)
+    cheese = await repo.create({"name": "Сыры", "parent_id": DAIRY})
+
+    rows = await closure_rows(session)
+    assert {(FOOD, cheese.id, 2), (DAIRY, cheese.id, 1), (cheese.id, cheese.id, 0)} <= rows
+    assert rows == await expected_closure(session)
+
+
+async def test_move_relinks_whole_subtree(session):
+    repo = ActivityRepository(session)
+    cheese = await repo.create({"name": "Сыры", "parent_id": DAIRY})
+
+    await repo.update(DAIRY, {"parent_id": TRUCKS})
+
+    rows = await closure_rows(session)
+    assert rows == await expected_closure(session)
+    assert (CARS, cheese.id, 3) in rows
+    assert not {row for row in rows if row[0] == FOOD and row[1] in (DAIRY, cheese.id)}
+
+
+async def test_move_to_root_keeps_inner_paths(session):
+    repo = ActivityRepository(session)
+    cheese = await repo.create({"name": "Сыры", "parent_id": DAIRY})
+
+    await repo.update(DAIRY, {"parent_id": None})
+
+    rows = await closure_rows(session)
+    assert rows == await expected_closure(session)
+    assert (DAIRY, cheese.id, 1) in rows
+
+
+async def test_move_under_own_descendant_is_rejected(session):
+    repo = ActivityRepository(session)
+    cheese = await repo.create({"name": "Сыры", "parent_id": DAIRY})
+
+    with pytest.raises(ValueError):
+        await repo.update(FOOD, {"parent_id": cheese.id})
+    await session.rollback()
+
+    assert await closure_rows(session) == await expected_closure(session)
+
+
+async def test_delete_removes_subtree_paths_and_links(session):
+    repo = ActivityRepository(session)
+    cheese = await repo.create({"name": "Сыры", "parent_id": DAIRY})
+
+    assert await repo.delete(FOOD)
+
+    rows = await closure_rows(session)
+    assert rows == await expected_closure(session)
+    deleted = {FOOD, MEAT, DAIRY, cheese.id}
+    assert not {row for row in rows if row[0] in deleted or row[1] in deleted}
+    result = await session.execute(
+        select(organization_activities.c.activity_id)
+        .where(organization_activities.c.activity_id.in_(deleted))
+    )
+    assert result.all() == []
+
+
+async def test_rebuild_matches_incremental_closure(session):
+    repo = ActivityRepository(session)
+    await repo.create({"name": "Сыры", "parent_id": DAIRY})
+    await repo.update(DAIRY, {"parent_id": TRUCKS})
+    incremental = await closure_rows(session)
+
+    await repo.rebuild_closure()
+
+    assert await closure_rows(session) == incremental
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+
+from app.crud.organization import OrganizationRepository
+from app.db.session import engine
+
+# демо-данные: организация 1 — виды 3 и 4; виды 1–6
+HORNS = 1
+
+
+@contextmanager
+def link_statements() -> Iterator[List[str]]:
+    """
+    Операторы, которые за время блока писали в organization_activities.
+    """
+    seen: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        words = statement.split()
+        if words[:3] in (["DELETE", "FROM", "organization_activities"],
+                         ["INSERT", "INTO", "organization_activities"]):
+            seen.append(words[0])
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_all_missing_activities_reported(client):
+    created = await client.post("/api/v1/organizations/", json={
+        "name": "ИП", "phone_numbers": [], "building_id": 1, "activity_ids": [3, 42, 7, 42],
+    })
+    assert created.status_code == 404
+    assert created.json()["detail"] == "Activities [7, 42] not found"
+
+    updated = await client.put(f"/api/v1/organizations/{HORNS}", json={"activity_ids": [99, 5, 8]})
+    assert updated.status_code == 404
+    assert updated.json()["detail"] == "Activities [8, 99] not found"
+    unchanged = await client.get(f"/api/v1/organizations/{HORNS}")
+    assert sorted(unchanged.json()["activity_ids"]) == [3, 4]
+
+
+async def test_links_change_by_difference(session):
+    repo = OrganizationRepository(session)
+
+    with link_statements() as statements:
+        row = await repo.update(HORNS, {"activity_ids": [4, 5, 6]})
+    # одна связь убрана, две добавлены одним INSERT
+    assert statements == ["DELETE", "INSERT"]
+    assert row.activity_ids == [4, 5, 6]
+
+    with link_statements() as statements:
+        await repo.update(HORNS, {"activity_ids": [6, 5, 4]})
+    assert statements == []
+
+    assert sorted((await repo.get_row(HORNS)).activity_ids) == [4, 5, 6]
@@ -0,0 +1,46 @@
+import re
+
+import pytest
+
+from app.schemas.batch import MAX_BATCH_IDS
+
+
+@pytest.mark.parametrize("kind, field, value", [
+    ("organizations", "name", "ЗАО АвтоПлюс"),
+    ("buildings", "address", "г. Санкт-Петербург, Невский проспект, 10"),
+    ("activities", "name", "Автомобили"),
+])
+async def test_items_in_requested_order(client, kind, field, value):
+    got = await client.get(f"/api/v1/{kind}/batch", params={"ids": "2,99,1,2"})
+    posted = await client.post(f"/api/v1/{kind}/batch", json={"ids": [2, 99, 1]})
+
+    for response in (got, posted):
+        assert response.status_code == 200
+        body = response.json()
+        assert [item["id"] for item in body["items"]] == [2, 1]
+        assert body["items"][0][field] == value
+        assert body["missing"] == [99]
+
+
+async def test_one_query_for_the_batch(client):
+    response = await client.get("/api/v1/organizations/batch", params={"ids": "1,2,3,4,5"})
+    # версии для ETag и сама выборка
+    queries = re.search(r'desc="(\d+) queries"', response.headers["server-timing"])
+    assert int(queries.group(1)) == 2
+
+
+@pytest.mark.parametrize("ids, detail", [
+    ("1,x", "ids must be a comma-separated list of integers"),
+    (",", "ids must not be empty"),
+    (",".join(map(str, range(MAX_BATCH_IDS + 1))), f"At most {MAX_BATCH_IDS} ids per request"),
+])
+async def test_bad_ids(client, ids, detail):
+    response = await client.get("/api/v1/organizations/batch", params={"ids": ids})
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+async def test_post_limits(client):
+    assert (await client.post("/api/v1/buildings/batch", json={"ids": []})).status_code == 422
+    too_many = list(range(MAX_BATCH_IDS + 1))
+    assert (await client.post("/api/v1/buildings/batch", json={"ids": too_many})).status_code == 422
@@ -0,0 +1,69 @@
+import re
+
+import pytest
+
+from app.crud.building import BuildingRepository
+
+MOSCOW = (55.7558, 37.6173)
+
+
+@pytest.fixture(params=[True, False], ids=["index", "sql"])
+def index(request, monkeypatch):
+    """
+    Геопоиск по индексу процесса и запросом к buildings.
+    """
+    if not request.param:
+        async def missing(self):
+            return None
+
+        monkeypatch.setattr(BuildingRepository, "spatial_index", missing)
+    return request.param
+
+
+@pytest.fixture
+async def row_of_houses(session):
+    """
+    Десять зданий к востоку от центра Москвы, через ~0.6 км; их id.
+    """
+    repo = BuildingRepository(session)
+    ids = []
+    for i in range(10):
+        row = await repo.create({
+            "address": f"ул. Ильинка, {i + 1}",
+            "latitude": MOSCOW[0],
+            "longitude": MOSCOW[1] + 0.01 * (i + 1),
+        })
+        ids.append(row.id)
+    return ids
+
+
+async def test_buildings_in_radius(client, index, row_of_houses):
+    response = await client.get("/api/v1/buildings/",
+                                params={"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 3})
+    assert response.status_code == 200
+    # 0.01° долготы на этой широте — ~0.63 км: в 3 км — центр и четыре дома
+    assert [b["id"] for b in response.json()["items"]] == [1, *row_of_houses[:4]]
+
+
+async def test_buildings_in_bbox_paged(client, index, row_of_houses):
+    params = {"sw_lat": 55.7, "sw_lon": 37.62, "ne_lat": 55.8, "ne_lon": 37.7, "limit": 3}
+    found, cursor = [], None
+    while True:
+        response = await client.get("/api/v1/buildings/",
+                                    params={**params, **({"cursor": cursor} if cursor else {})})
+        found += [b["id"] for b in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    # 37.6173 + 0.01 * 8 = 37.6973 — восьмой дом ещё в рамке, девятый нет
+    assert found == row_of_houses[:8]
+
+
+async def test_organizations_by_radius_in_one_query(client, index):
+    response = await client.get("/api/v1/organizations/",
+                                params={"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 700})
+    assert [org["id"] for org in response.json()["items"]] == [1, 2]
+    # версии для ETag и организации; здания — индексом или подзапросом,
+    # без отдельной загрузки Organization.building
+    queries = re.search(r'desc="(\d+) queries"', response.headers["server-timing"])
+    assert int(queries.group(1)) == 2
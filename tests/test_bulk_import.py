@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.crud.organization import OrganizationRepository
+from app.models.building import Building
+from app.models.organization import Organization
+from app.scripts import import_data
+from app.services.bulk_import import BulkImportService
+
+KAZAN = {"id": 10, "address": "г. Казань, ул. Баумана 1", "latitude": 55.79, "longitude": 49.11}
+
+
+async def count(session, model) -> int:
+    return await session.scalar(select(func.count()).select_from(model))
+
+
+async def test_bad_rows_are_reported_and_skipped(client):
+    response = await client.post("/api/v1/import/", json={
+        "buildings": [KAZAN, {"address": "без координат"}, {**KAZAN, "address": "повтор"}],
+        "activities": [
+            {"id": 20, "name": "Выпечка", "parent_id": 1},
+            {"id": 21, "name": "Торты", "parent_id": 20},
+            {"id": 22, "name": "Сирота", "parent_id": 99},
+        ],
+        "organizations": [
+            {"name": "ИП Пекарь", "phone_numbers": [], "building_id": 10, "activity_ids": [21]},
+            {"name": "Нет здания", "phone_numbers": [], "building_id": 77, "activity_ids": [22]},
+        ],
+    })
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == {"buildings": 1, "activities": 2, "organizations": 1}
+    assert [(e["entity"], e["index"]) for e in result["errors"]] == [
+        ("activities", 2), ("buildings", 1), ("buildings", 2), ("organizations", 1),
+    ]
+    details = {(e["entity"], e["index"]): e["detail"] for e in result["errors"]}
+    assert details[("activities", 2)] == "Parent activity 99 not found"
+    assert details[("buildings", 2)] == "Duplicate id 10 in batch"
+    assert details[("organizations", 1)] == (
+        "Building 77 not found; Activities [22] not found"
+    )
+
+    # вложенный вид из пачки сразу виден в поиске по поддереву
+    orgs = await client.get("/api/v1/activities/1/organizations")
+    assert [org["name"] for org in orgs.json()["items"]] == ["ООО Рога и Копыта", "ИП Пекарь"]
+
+
+async def test_rows_with_id_overwrite(session):
+    result = await BulkImportService(session).run(
+        buildings=[{**KAZAN, "id": 1}],
+        organizations=[{"id": 2, "name": "ЗАО АвтоПлюс 2", "phone_numbers": ["1"],
+                        "building_id": 1, "activity_ids": [6]}],
+    )
+
+    assert result.errors == []
+    assert (await session.get(Building, 1)).address == KAZAN["address"]
+    row = await OrganizationRepository(session).get_row(2)
+    assert (row.name, row.building_id, row.activity_ids) == ("ЗАО АвтоПлюс 2", 1, [6])
+
+
+async def test_cycle_is_rejected(session):
+    result = await BulkImportService(session).run(activities=[
+        {"id": 1, "name": "Еда", "parent_id": 3},
+    ])
+    assert [(e.index, e.detail) for e in result.errors] == [
+        (0, "Activity hierarchy would contain a cycle"),
+    ]
+
+
+async def test_failure_leaves_no_part_of_batch(session, monkeypatch):
+    async def broken(self, rows):
+        raise RuntimeError("сбой посреди пачки")
+
+    monkeypatch.setattr(OrganizationRepository, "bulk_upsert", broken)
+    with pytest.raises(RuntimeError):
+        await BulkImportService(session).run(
+            buildings=[KAZAN],
+            organizations=[{"name": "ИП", "phone_numbers": [], "building_id": 10,
+                            "activity_ids": [3]}],
+        )
+
+    assert await count(session, Building) == 2
+    assert await count(session, Organization) == 2
+
+
+async def test_cli(session, tmp_path, capsys):
+    feed = tmp_path / "feed.json"
+    feed.write_text(json.dumps({"buildings": [KAZAN], "organizations": [
+        {"name": "ИП Пекарь", "phone_numbers": [], "building_id": 10, "activity_ids": []},
+        {"name": "ИП Без дома", "phone_numbers": [], "building_id": 11, "activity_ids": []},
+    ]}), encoding="utf-8")
+
+    await import_data.main(str(feed))
+
+    out = capsys.readouterr().out
+    assert "organizations: 1 imported" in out
+    assert "organizations[1]: Building 11 not found" in out
+    assert await count(session, Organization) == 3
@@ -0,0 +1,78 @@
+import re
+
+from sqlalchemy import text
+
+from app.services.versions import table_versions
+
+
+def queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+async def test_etag_round_trip(client):
+    first = await client.get("/api/v1/organizations/1")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "last-modified" in first.headers
+
+    again = await client.get("/api/v1/organizations/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    # только версии таблиц, без выборки
+    assert queries(again) == 1
+
+    # сильная форма и список тегов тоже подходят
+    for header in (etag[2:], f'"nope", {etag}', "*"):
+        response = await client.get("/api/v1/organizations/1", headers={"If-None-Match": header})
+        assert response.status_code == 304
+
+
+async def test_write_changes_etag(client):
+    etag = (await client.get("/api/v1/organizations/")).headers["etag"]
+    activities = (await client.get("/api/v1/activities/")).headers["etag"]
+
+    # организации зависят от зданий, виды деятельности — нет
+    await client.put("/api/v1/buildings/2", json={"address": "Невский проспект, 12"})
+
+    stale = await client.get("/api/v1/organizations/", headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != etag
+    same = await client.get("/api/v1/activities/", headers={"If-None-Match": activities})
+    assert same.status_code == 304
+
+
+async def test_write_outside_the_app_changes_etag(client, session):
+    etag = (await client.get("/api/v1/buildings/1")).headers["etag"]
+
+    await session.execute(text("UPDATE buildings SET address = 'psql' WHERE id = 1"))
+    await session.commit()
+
+    fresh = await client.get("/api/v1/buildings/1", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()["address"] == "psql"
+
+
+async def test_if_modified_since(client):
+    last_modified = (await client.get("/api/v1/buildings/")).headers["last-modified"]
+
+    cached = await client.get("/api/v1/buildings/", headers={"If-Modified-Since": last_modified})
+    assert cached.status_code == 304
+    older = await client.get("/api/v1/buildings/",
+                             headers={"If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"})
+    assert older.status_code == 200
+    garbage = await client.get("/api/v1/buildings/", headers={"If-Modified-Since": "yesterday"})
+    assert garbage.status_code == 200
+
+
+async def test_version_sums_slots(session):
+    before = (await table_versions.fetch(session, ["buildings"]))["buildings"].version
+
+    # запись другого серверного процесса попадает в свой слот
+    await session.execute(text(
+        "UPDATE data_versions SET version = version + 5 WHERE table_name = 'buildings' AND slot = 3"
+    ))
+    await session.commit()
+
+    after = (await table_versions.fetch(session, ["buildings"]))["buildings"].version
+    assert after == before + 5
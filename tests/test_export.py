@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.crud.activity import ActivityRepository
+from app.crud.organization import OrganizationRepository
+
+# демо-данные: организация 2 — виды 5 и 6 (под 2 «Автомобили»)
+TRUCKERS, TRUCKS = 2, 5
+
+
+async def export(client, kind, **params):
+    response = await client.get(f"/api/v1/export/{kind}", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def age_everything(session):
+    # всё, что было до теста, — давно
+    for table in ("organizations", "buildings", "activities"):
+        await session.execute(text(f"UPDATE {table} SET updated_at = '2000-01-01 00:00:00'"))
+    await session.commit()
+
+
+def since() -> dict:
+    return {"updated_since": (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()}
+
+
+async def test_full_export(client, session):
+    repo = OrganizationRepository(session)
+    for i in range(30):
+        await repo.create({"name": f"Точка {i}", "phone_numbers": [], "building_id": 1})
+
+    rows = await export(client, "organizations")
+
+    assert [row["id"] for row in rows] == list(range(1, 33))
+    assert sorted(rows[0]["activity_ids"]) == [3, 4]
+    assert {"name", "phone_numbers", "building_id", "updated_at"} <= set(rows[0])
+    assert [row["id"] for row in await export(client, "buildings")] == [1, 2]
+    assert len(await export(client, "activities")) == 6
+
+
+async def test_updated_since_returns_only_changes(client, session):
+    await age_everything(session)
+    await OrganizationRepository(session).update(TRUCKERS, {"name": "ЗАО АвтоМинус"})
+
+    rows = await export(client, "organizations", **since())
+
+    assert [(row["id"], row["name"]) for row in rows] == [(TRUCKERS, "ЗАО АвтоМинус")]
+    assert await export(client, "buildings", **since()) == []
+
+
+async def test_activity_delete_touches_linked_organizations(client, session):
+    await age_everything(session)
+    assert await ActivityRepository(session).delete(TRUCKS)
+
+    rows = await export(client, "organizations", **since())
+
+    # связь пропала — организация снова в инкрементальной выгрузке
+    assert [(row["id"], row["activity_ids"]) for row in rows] == [(TRUCKERS, [6])]
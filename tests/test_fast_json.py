@@ -0,0 +1,45 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.crud.organization import OrganizationRow
+from app.models.building import Building
+
+ENDPOINTS = [
+    ("/api/v1/organizations/", {}),
+    ("/api/v1/organizations/1", {}),
+    ("/api/v1/organizations/nearest", {"lat": 55.75, "lon": 37.61}),
+    ("/api/v1/organizations/search", {"q": "Копыт"}),
+    ("/api/v1/organizations/batch", {"ids": "2,1,9"}),
+    ("/api/v1/buildings/", {"lat": 55.75, "lon": 37.61, "radius": 1000}),
+    ("/api/v1/activities/", {"limit": 4}),
+]
+
+
+async def test_rows_render_as_objects(session):
+    row = (await session.execute(select(Building.id, Building.address).where(Building.id == 1))).one()
+    org = OrganizationRow(1, "Рога", ["1"], 1, [3])
+    stamp = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+    body = FastJSONResponse({"items": [org], "row": row, "at": stamp}).body
+
+    assert json.loads(body) == {
+        "items": [{"id": 1, "name": "Рога", "phone_numbers": ["1"], "building_id": 1,
+                   "activity_ids": [3]}],
+        "row": {"id": 1, "address": "г. Москва, ул. Ленина 1, офис 3"},
+        "at": "2024-05-01T12:30:00+00:00",
+    }
+
+
+@pytest.mark.parametrize("url, params", ENDPOINTS)
+async def test_same_body_as_response_model(client, monkeypatch, url, params):
+    fast = await client.get(url, params=params)
+    monkeypatch.setattr(settings, "fast_json", False)
+    slow = await client.get(url, params=params)
+
+    assert fast.status_code == slow.status_code == 200
+    assert fast.json() == slow.json()
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from app.crud.building import BuildingRepository
+from app.services.geosearch import GeoSearchService
+
+MOSCOW = (55.7558, 37.6173)
+SPB = (59.9343, 30.3351)
+
+
+@pytest.fixture
+def sql_only(monkeypatch):
+    """
+    Геопоиск только запросом к buildings, без индекса процесса.
+    """
+    async def no_index(self):
+        return None
+
+    monkeypatch.setattr(BuildingRepository, "spatial_index", no_index)
+
+
+@pytest.fixture
+async def scattered(session):
+    """
+    Здания вокруг Москвы на расстоянии до ~30 км; {id: (lat, lon)}.
+    """
+    rng = random.Random(7)
+    repo = BuildingRepository(session)
+    points = {}
+    for i in range(200):
+        lat = MOSCOW[0] + rng.uniform(-0.3, 0.3)
+        lon = MOSCOW[1] + rng.uniform(-0.5, 0.5)
+        row = await repo.create({"address": f"точка {i}", "latitude": lat, "longitude": lon})
+        points[row.id] = (lat, lon)
+    return points
+
+
+async def test_radius_in_sql_matches_haversine(session, sql_only, scattered):
+    repo = BuildingRepository(session)
+    for radius_km in (1, 5, 12.5, 25):
+        expected = {
+            building_id for building_id, (lat, lon) in scattered.items()
+            if GeoSearchService.haversine_distance(*MOSCOW, lat, lon) <= radius_km
+        }
+        found = set(await repo.ids_in_radius(MOSCOW, radius_km)) & set(scattered)
+        assert found == expected
+
+
+async def test_bbox_in_sql(session, sql_only, scattered):
+    repo = BuildingRepository(session)
+    sw, ne = (55.7, 37.5), (55.8, 37.7)
+    expected = {
+        building_id for building_id, (lat, lon) in scattered.items()
+        if sw[0] <= lat <= ne[0] and sw[1] <= lon <= ne[1]
+    }
+    found = set(await repo.ids_in_bbox(sw, ne)) & set(scattered)
+    assert found == expected
+
+
+async def test_radius_wider_than_half_the_globe(session, sql_only):
+    repo = BuildingRepository(session)
+    assert sorted(await repo.ids_in_radius((-55.0, -140.0), 21000)) == [1, 2]
+
+
+@pytest.mark.parametrize("index", [False, True])
+async def test_organizations_by_radius_and_bbox(client, monkeypatch, index):
+    if not index:
+        async def no_index(self):
+            return None
+
+        monkeypatch.setattr(BuildingRepository, "spatial_index", no_index)
+
+    response = await client.get("/api/v1/organizations/",
+                                params={"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 5})
+    assert response.status_code == 200
+    assert [org["id"] for org in response.json()["items"]] == [1]
+
+    response = await client.get("/api/v1/organizations/", params={
+        "sw_lat": 55, "sw_lon": 30, "ne_lat": 60, "ne_lon": 38,
+    })
+    assert [org["id"] for org in response.json()["items"]] == [1, 2]
+
+    # радиус до Петербурга (~633 км) захватывает обе организации
+    response = await client.get("/api/v1/organizations/",
+                                params={"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 640})
+    assert [org["id"] for org in response.json()["items"]] == [1, 2]
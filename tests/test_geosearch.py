@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.geosearch import CoordinateStore, GeoSearchService
+
+MOSCOW = (55.7558, 37.6173)
+SPB = (59.9343, 30.3351)
+
+
+@pytest.fixture
+def store() -> CoordinateStore:
+    rng = random.Random(11)
+    size = 5000
+    return CoordinateStore(
+        range(size),
+        (rng.uniform(-89.9, 89.9) for _ in range(size)),
+        (rng.uniform(-180, 180) for _ in range(size)),
+    )
+
+
+def test_scalar_distance():
+    assert GeoSearchService.haversine_distance(*MOSCOW, *SPB) == pytest.approx(633.0, abs=0.5)
+    assert GeoSearchService.haversine_distance(*MOSCOW, *MOSCOW) == 0
+    # антиподы — половина окружности
+    assert GeoSearchService.haversine_distance(10, 20, -10, -160) == pytest.approx(
+        np.pi * GeoSearchService.EARTH_RADIUS_KM
+    )
+
+
+def test_batch_distance_matches_scalar(store):
+    batch = GeoSearchService.batch_haversine_distance(
+        *MOSCOW, store.latitudes, store.longitudes
+    )
+    scalar = [
+        GeoSearchService.haversine_distance(*MOSCOW, lat, lon)
+        for lat, lon in zip(store.latitudes.tolist(), store.longitudes.tolist())
+    ]
+    assert len(store) == len(batch) == 5000
+    np.testing.assert_allclose(batch, scalar, rtol=1e-9, atol=1e-6)
+
+
+def test_radius_mask_matches_scalar_loop(store):
+    radius_km = 3000
+    mask = GeoSearchService.radius_mask(store, MOSCOW, radius_km)
+    expected = [
+        GeoSearchService.haversine_distance(*MOSCOW, lat, lon) <= radius_km
+        for lat, lon in zip(store.latitudes.tolist(), store.longitudes.tolist())
+    ]
+    assert mask.tolist() == expected
+    assert 0 < mask.sum() < len(store)
+
+
+def test_bbox_mask_is_inclusive():
+    store = CoordinateStore([1, 2, 3], [10.0, 20.0, 30.0], [10.0, 20.0, 30.0])
+    mask = GeoSearchService.bbox_mask(store, (10.0, 10.0), (20.0, 20.0))
+    assert store.ids[mask].tolist() == [1, 2]
+
+
+def test_empty_store():
+    store = CoordinateStore([], [], [])
+    assert len(store) == 0
+    assert GeoSearchService.radius_mask(store, MOSCOW, 10).tolist() == []
+
+
+def test_bounding_box_covers_circle():
+    sw, ne = GeoSearchService.bounding_box(MOSCOW, 100)
+    for bearing_lat, bearing_lon in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        # точка чуть внутри круга по каждому направлению
+        lat = MOSCOW[0] + bearing_lat * 0.89
+        lon = MOSCOW[1] + bearing_lon * 1.59
+        assert GeoSearchService.haversine_distance(*MOSCOW, lat, lon) < 100
+        assert sw[0] <= lat <= ne[0] and sw[1] <= lon <= ne[1]
+    # у полюса — вся долгота
+    sw, ne = GeoSearchService.bounding_box((89.5, 0), 100)
+    assert (sw[1], ne[0], ne[1]) == (-180.0, 90.0, 180.0)
@@ -0,0 +1,67 @@
+import re
+
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.core.metrics import UNMATCHED_ROUTE
+
+TIMING_RE = re.compile(
+    r'app;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=[\d.]+'
+)
+
+
+def observed(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0.0
+
+
+async def test_server_timing_header(client):
+    response = await client.get("/api/v1/organizations/", params={"limit": 5})
+    match = TIMING_RE.fullmatch(response.headers["server-timing"])
+    assert match is not None
+    assert int(match.group(1)) == 2
+
+
+async def test_histograms_by_route_template(client):
+    labels = {"method": "GET", "route": "/api/v1/buildings/{building_id}"}
+    before = observed("http_request_duration_seconds", status="200", **labels)
+    queries_before = REGISTRY.get_sample_value("http_request_db_queries_sum", labels) or 0.0
+
+    await client.get("/api/v1/buildings/1")
+    await client.get("/api/v1/buildings/2")
+
+    assert observed("http_request_duration_seconds", status="200", **labels) == before + 2
+    # версии и здание на каждый запрос
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", labels) == queries_before + 4
+
+
+async def test_streamed_body_is_counted_whole(client):
+    labels = {"method": "GET", "route": "/api/v1/export/organizations"}
+    before = REGISTRY.get_sample_value("http_request_db_queries_sum", labels) or 0.0
+
+    await client.get("/api/v1/export/organizations")
+
+    # версии и выгрузка внутри потокового тела
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", labels) >= before + 2
+
+
+async def test_unknown_paths_share_one_label(client):
+    before = observed("http_request_duration_seconds",
+                      method="GET", route=UNMATCHED_ROUTE, status="404")
+    await client.get("/api/v1/no-such-thing/1")
+    await client.get("/api/v1/no-such-thing/2")
+    assert observed("http_request_duration_seconds",
+                    method="GET", route=UNMATCHED_ROUTE, status="404") == before + 2
+
+
+async def test_metrics_endpoint(client):
+    await client.get("/api/v1/activities/")
+    response = await client.get("/api/v1/internal/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_db_queries_count{method="GET",route="/api/v1/activities/"}' in response.text
+
+
+async def test_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    response = await client.get("/api/v1/activities/")
+    assert "server-timing" not in response.headers
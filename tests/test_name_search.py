@@ -0,0 +1,66 @@
+import pytest
+
+from app.crud.organization import OrganizationRepository
+
+# демо-данные: 1 — «ООО Рога и Копыта», 2 — «ЗАО АвтоПлюс»
+HORNS, TRUCKERS = 1, 2
+
+
+async def search(client, q, **params):
+    response = await client.get("/api/v1/organizations/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def suggest(client, q):
+    response = await client.get("/api/v1/organizations/autocomplete", params={"q": q})
+    assert response.status_code == 200
+    return [(item["id"], item["name"]) for item in response.json()]
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("копыт", [HORNS]),
+    ("Рога и Капыта", [HORNS]),
+    ("АвтоПлю", [TRUCKERS]),
+    # короткое слово без своих триграмм — только подстрокой
+    ("ао", [TRUCKERS]),
+])
+async def test_search_finds_substring_and_typos(client, q, expected):
+    assert [org["id"] for org in await search(client, q)] == expected
+
+
+async def test_search_ranks_by_similarity(client, session):
+    repo = OrganizationRepository(session)
+    closer = await repo.create({"name": "Рога и Копыта", "phone_numbers": [], "building_id": 1})
+
+    found = await search(client, "рога и копыта")
+
+    assert [org["id"] for org in found] == [closer.id, HORNS]
+    assert found[0]["score"] > found[1]["score"] > 0
+    assert found[1]["activity_ids"] == [3, 4]
+
+
+async def test_search_misses_and_limit(client):
+    assert await search(client, "пекарня") == []
+    assert len(await search(client, "о", limit=1)) == 1
+
+
+async def test_autocomplete_by_prefix(client):
+    assert await suggest(client, "зао") == [(TRUCKERS, "ЗАО АвтоПлюс")]
+    assert await suggest(client, "ООО Р") == [(HORNS, "ООО Рога и Копыта")]
+    assert await suggest(client, "рога") == []
+    assert await suggest(client, "%") == []
+
+
+async def test_index_follows_writes(client, session):
+    repo = OrganizationRepository(session)
+    # индекс строится при первом поиске, дальше — правками репозитория
+    assert await suggest(client, "ООО") == [(HORNS, "ООО Рога и Копыта")]
+    added = await repo.create({"name": "ООО Аптека", "phone_numbers": [], "building_id": 1})
+    await repo.update(HORNS, {"name": "ИП Рога"})
+
+    assert await suggest(client, "ООО") == [(added.id, "ООО Аптека")]
+    assert await suggest(client, "ип") == [(HORNS, "ИП Рога")]
+
+    await repo.delete(added.id)
+    assert await suggest(client, "ООО") == []
@@ -0,0 +1,126 @@
+import random
+import re
+
+import pytest
+
+from app.crud.building import BuildingRepository
+from app.crud.organization import OrganizationRepository
+from app.services.geosearch import GeoSearchService
+
+MOSCOW = (55.7558, 37.6173)
+# демо-данные: вид 3 — под «Еда», вид 5 — под «Автомобили»
+MEAT, TRUCKS = 3, 5
+
+
+@pytest.fixture
+async def around(session):
+    """
+    Организации вокруг Москвы, по одной-две в здании; часть зданий пустые.
+    :return: {id организации: (расстояние до центра, id вида деятельности)}
+    """
+    rng = random.Random(5)
+    buildings, organizations = BuildingRepository(session), OrganizationRepository(session)
+    found = {}
+    for i in range(15):
+        lat = MOSCOW[0] + rng.uniform(-0.2, 0.2)
+        lon = MOSCOW[1] + rng.uniform(-0.3, 0.3)
+        building = await buildings.create({"address": f"дом {i}", "latitude": lat, "longitude": lon})
+        km = GeoSearchService.haversine_distance(*MOSCOW, lat, lon)
+        for j in range(i % 3):
+            activity = MEAT if (i + j) % 2 else TRUCKS
+            org = await organizations.create(
+                {"name": f"орг {i}.{j}", "phone_numbers": [], "building_id": building.id},
+                [activity],
+            )
+            found[org.id] = (km, activity)
+    return found
+
+
+def no_index(monkeypatch):
+    async def missing(self):
+        return None
+
+    monkeypatch.setattr(BuildingRepository, "spatial_index", missing)
+
+
+async def walk(client, limit, **params):
+    items, cursor = [], None
+    while True:
+        page = await client.get("/api/v1/organizations/nearest", params={
+            "lat": MOSCOW[0], "lon": MOSCOW[1], "limit": limit, **params,
+            **({"cursor": cursor} if cursor else {}),
+        })
+        assert page.status_code == 200
+        items += page.json()["items"]
+        cursor = page.json()["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def expected_order(around, activity=None):
+    # демо-организации 1 (в центре Москвы) и 2 (в Петербурге)
+    rows = {**around, 1: (0.0, MEAT), 2: (633.0, TRUCKS)}
+    return [
+        org_id for org_id, (km, kind) in sorted(rows.items(), key=lambda item: (item[1][0], item[0]))
+        if activity is None or kind == activity
+    ]
+
+
+@pytest.mark.parametrize("index", [True, False])
+async def test_pages_follow_distance_without_gaps(client, around, monkeypatch, index):
+    if not index:
+        no_index(monkeypatch)
+
+    items = await walk(client, limit=4)
+
+    assert [item["id"] for item in items] == expected_order(around)
+    for item in items:
+        if item["id"] in around:
+            assert item["distance_km"] == pytest.approx(around[item["id"]][0])
+
+
+async def test_cursor_survives_index_going_stale(client, around, monkeypatch):
+    first = await client.get("/api/v1/organizations/nearest",
+                             params={"lat": MOSCOW[0], "lon": MOSCOW[1], "limit": 5})
+    # следующая страница — уже по SQL без индекса
+    no_index(monkeypatch)
+    ids = [item["id"] for item in first.json()["items"]]
+    cursor = first.json()["next_cursor"]
+    second = await client.get("/api/v1/organizations/nearest", params={
+        "lat": MOSCOW[0], "lon": MOSCOW[1], "limit": 100, "cursor": cursor,
+    })
+    ids += [item["id"] for item in second.json()["items"]]
+    assert ids == expected_order(around)
+
+
+async def test_activity_filter(client, around):
+    items = await walk(client, limit=3, activity_id=2)
+    assert [item["id"] for item in items] == expected_order(around, TRUCKS)
+
+
+def queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+async def pages(client, limit):
+    params = {"lat": MOSCOW[0], "lon": MOSCOW[1], "limit": limit}
+    first = await client.get("/api/v1/organizations/nearest", params=params)
+    second = await client.get("/api/v1/organizations/nearest",
+                              params={**params, "cursor": first.json()["next_cursor"]})
+    return first, second
+
+
+async def test_one_query_per_page(client):
+    # версии для ETag и сам поиск в круге по индексу
+    assert [queries(page) for page in await pages(client, limit=1)] == [2, 2]
+
+
+async def test_empty_buildings_cost_one_more_query(client, around):
+    # ближайшие здания без организаций: повтор поиска без круга, не больше одного
+    assert all(queries(page) <= 3 for page in await pages(client, limit=1))
+
+
+async def test_invalid_cursor(client):
+    response = await client.get("/api/v1/organizations/nearest",
+                                params={"lat": 0, "lon": 0, "cursor": "не курсор"})
+    assert response.status_code == 400
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.crud.activity import ActivityRepository
+from app.crud.organization import OrganizationRepository
+from app.services.cache import (MemoryBackend, ReadThroughCache, RedisBackend,
+                                response_cache)
+
+# демо-данные: организация 1 — здание 1, виды 3 и 4 (под 1 «Еда»);
+# организация 2 — здание 2, виды 5 и 6 (под 2 «Автомобили»)
+HORNS, TRUCKERS = 1, 2
+MOSCOW, SPB = 1, 2
+FOOD, CARS, DAIRY, TRUCKS = 1, 2, 4, 5
+
+
+def ids(rows):
+    return [row.id for row in rows]
+
+
+async def test_by_building_evicted_when_organization_moves(session):
+    repo = OrganizationRepository(session)
+    assert ids(await repo.by_building(MOSCOW)) == [HORNS]
+    assert ids(await repo.by_building(SPB)) == [TRUCKERS]
+    hits = response_cache.hits
+    await repo.by_building(MOSCOW)
+    assert response_cache.hits == hits + 1
+
+    await repo.update(HORNS, {"building_id": SPB})
+
+    assert ids(await repo.by_building(MOSCOW)) == []
+    assert ids(await repo.by_building(SPB)) == [HORNS, TRUCKERS]
+
+
+async def test_by_activity_evicted_when_activities_change(session):
+    repo = OrganizationRepository(session)
+    assert ids(await repo.by_activity(FOOD)) == [HORNS]
+    assert ids(await repo.by_activity(CARS)) == [TRUCKERS]
+    assert ids(await repo.by_activity(TRUCKS)) == [TRUCKERS]
+
+    await repo.update(HORNS, {"activity_ids": [TRUCKS]})
+
+    # сброшены и прежние, и новые виды, и их предки
+    assert ids(await repo.by_activity(FOOD)) == []
+    assert ids(await repo.by_activity(CARS)) == [HORNS, TRUCKERS]
+    assert ids(await repo.by_activity(TRUCKS)) == [HORNS, TRUCKERS]
+
+
+async def test_by_activity_evicted_when_subtree_moves(session):
+    repo = OrganizationRepository(session)
+    assert ids(await repo.by_activity(CARS)) == [TRUCKERS]
+
+    await ActivityRepository(session).update(DAIRY, {"parent_id": TRUCKS})
+
+    assert ids(await repo.by_activity(CARS)) == [HORNS, TRUCKERS]
+
+
+async def test_by_building_evicted_on_delete(session):
+    repo = OrganizationRepository(session)
+    assert ids(await repo.by_building(MOSCOW)) == [HORNS]
+
+    assert await repo.delete(HORNS)
+
+    assert ids(await repo.by_building(MOSCOW)) == []
+
+
+async def test_load_started_before_invalidation_is_not_stored():
+    cache = ReadThroughCache()
+    cache._backend = MemoryBackend(max_entries=10, ttl=30)
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def stale():
+        started.set()
+        await release.wait()
+        return "stale"
+
+    async def fresh():
+        return "fresh"
+
+    load = asyncio.create_task(cache.get_or_load("key", ["building:1"], stale))
+    await started.wait()
+    await cache.invalidate("building:1")
+    release.set()
+
+    assert await load == "stale"
+    assert await cache.get_or_load("key", ["building:1"], fresh) == "fresh"
+
+
+async def test_redis_invalidation_on_other_worker_blocks_stale_store(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from redis import asyncio as redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "from_url", lambda url: fakeredis.FakeAsyncRedis(server=server))
+    loading, writing = ReadThroughCache(), ReadThroughCache()
+    loading._backend = RedisBackend("redis://", ttl=30, prefix="test:")
+    writing._backend = RedisBackend("redis://", ttl=30, prefix="test:")
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def stale():
+        started.set()
+        await release.wait()
+        return "stale"
+
+    async def fresh():
+        return "fresh"
+
+    load = asyncio.create_task(loading.get_or_load("key", ["building:1"], stale))
+    await started.wait()
+    await writing.invalidate("building:1")
+    release.set()
+
+    assert await load == "stale"
+    assert await writing.get_or_load("key", ["building:1"], fresh) == "fresh"
+
+
+async def test_write_outside_repositories_is_seen_by_next_read(client, session):
+    first = await client.get(f"/api/v1/buildings/{MOSCOW}/organizations")
+    assert first.json()["items"][0]["name"] == "ООО Рога и Копыта"
+    activities = await client.get("/api/v1/activities/")
+    await client.get(f"/api/v1/activities/{FOOD}/organizations")
+
+    # другой воркер, CLI или psql: теги кэша этого процесса никто не сбросил
+    await session.execute(text(f"UPDATE organizations SET name = 'Копыта' WHERE id = {HORNS}"))
+    await session.execute(text("INSERT INTO activities (name) VALUES ('Выпечка')"))
+    await session.commit()
+
+    fresh = await client.get(f"/api/v1/buildings/{MOSCOW}/organizations",
+                             headers={"If-None-Match": first.headers["etag"]})
+    assert fresh.status_code == 200
+    assert fresh.json()["items"][0]["name"] == "Копыта"
+    again = await client.get(f"/api/v1/buildings/{MOSCOW}/organizations",
+                             headers={"If-None-Match": fresh.headers["etag"]})
+    assert again.status_code == 304
+
+    listed = await client.get("/api/v1/activities/")
+    assert len(listed.json()["items"]) == len(activities.json()["items"]) + 1
+    subtree = await client.get(f"/api/v1/activities/{FOOD}/organizations")
+    assert [org["name"] for org in subtree.json()["items"]] == ["Копыта"]
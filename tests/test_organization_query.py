@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from app.crud.building import BuildingRepository
+from app.crud.organization import OrganizationRepository
+
+MOSCOW = (55.7558, 37.6173)
+# демо-данные: здания 1 (Москва) и 2 (Петербург); вид 3 — под «Еда», 5 — под «Автомобили»
+MEAT, TRUCKS = 3, 5
+
+
+@pytest.fixture(params=[True, False], ids=["index", "sql"])
+def index(request, monkeypatch):
+    if not request.param:
+        async def missing(self):
+            return None
+
+        monkeypatch.setattr(BuildingRepository, "spatial_index", missing)
+    return request.param
+
+
+@pytest.fixture
+async def shops(session):
+    """
+    Магазины в Москве и Петербурге с разными видами деятельности; {название: id}.
+    """
+    repo = OrganizationRepository(session)
+    found = {}
+    for name, building_id, kind in [
+        ("Мясная лавка", 1, MEAT),
+        ("Мясо 100%", 1, MEAT),
+        ("Грузовой сервис", 1, TRUCKS),
+        ("Мясной двор", 2, MEAT),
+    ]:
+        row = await repo.create({"name": name, "phone_numbers": [], "building_id": building_id},
+                                [kind])
+        found[name] = row.id
+    return found
+
+
+async def ids(client, **params):
+    response = await client.get("/api/v1/organizations/", params=params)
+    assert response.status_code == 200
+    return [org["id"] for org in response.json()["items"]]
+
+
+async def test_all_filters_apply_together(client, index, shops):
+    near_moscow = {"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 10}
+    # регистр кириллицы SQLite в LIKE не сворачивает — как в названии
+    assert await ids(client, **near_moscow, name="Мяс") == [
+        shops["Мясная лавка"], shops["Мясо 100%"],
+    ]
+    assert await ids(client, **near_moscow, activity_id=2) == [shops["Грузовой сервис"]]
+    assert await ids(client, building_id=2, activity_id=1) == [shops["Мясной двор"]]
+    assert await ids(client, sw_lat=59, sw_lon=29, ne_lat=61, ne_lon=31,
+                     activity_id=1, name="двор") == [shops["Мясной двор"]]
+    assert await ids(client, building_id=1, activity_id=1, level=1) == []
+
+
+async def test_name_wildcards_are_literal(client, shops):
+    assert await ids(client, name="100%") == [shops["Мясо 100%"]]
+    assert await ids(client, name="_") == []
+
+
+async def test_empty_area_skips_organizations_query(client):
+    response = await client.get("/api/v1/organizations/",
+                                params={"lat": 0, "lon": 0, "radius": 1, "activity_id": 1})
+    assert response.json()["items"] == []
+    # только версии для ETag: в круге нет зданий по индексу
+    queries = re.search(r'desc="(\d+) queries"', response.headers["server-timing"])
+    assert int(queries.group(1)) == 1
@@ -0,0 +1,89 @@
+import pytest
+
+from app.crud.organization import OrganizationRepository
+
+# демо-данные: здание 1 — Москва; вид 3 — под «Еда», вид 5 — под «Автомобили»
+MOSCOW, MEAT, TRUCKS = 1, 3, 5
+
+
+@pytest.fixture
+async def many(session):
+    """
+    25 организаций в здании 1, через одну — мясо и грузовики; их id по виду.
+    """
+    repo = OrganizationRepository(session)
+    by_kind = {MEAT: [], TRUCKS: []}
+    for i in range(25):
+        kind = MEAT if i % 2 else TRUCKS
+        row = await repo.create(
+            {"name": f"Склад {i:02}", "phone_numbers": [], "building_id": MOSCOW}, [kind]
+        )
+        by_kind[kind].append(row.id)
+    return by_kind
+
+
+async def walk(client, url, limit, **params):
+    """
+    Пройти список страницами, вернуть id и размеры страниц.
+    """
+    ids, sizes, cursor = [], [], None
+    while True:
+        response = await client.get(url, params={
+            "limit": limit, **params, **({"cursor": cursor} if cursor else {}),
+        })
+        assert response.status_code == 200
+        items = response.json()["items"]
+        ids += [item["id"] for item in items]
+        sizes.append(len(items))
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return ids, sizes
+
+
+async def test_organizations_pages(client, many):
+    ids, sizes = await walk(client, "/api/v1/organizations/", limit=10)
+    assert ids == sorted([1, 2, *many[MEAT], *many[TRUCKS]])
+    assert sizes == [10, 10, 7]
+
+
+@pytest.mark.parametrize("url, params, expected", [
+    ("/api/v1/organizations/", {"building_id": MOSCOW},
+     lambda many: [1, *many[MEAT], *many[TRUCKS]]),
+    ("/api/v1/organizations/", {"activity_id": 1}, lambda many: [1, *many[MEAT]]),
+    ("/api/v1/organizations/", {"activity_id": 2, "name": "Склад"}, lambda many: many[TRUCKS]),
+    ("/api/v1/activities/2/organizations", {}, lambda many: [2, *many[TRUCKS]]),
+    ("/api/v1/buildings/1/organizations", {}, lambda many: [1, *many[MEAT], *many[TRUCKS]]),
+])
+async def test_filtered_pages(client, many, url, params, expected):
+    ids, _ = await walk(client, url, limit=4, **params)
+    assert ids == sorted(expected(many))
+
+
+async def test_buildings_and_activities_pages(client):
+    assert await walk(client, "/api/v1/buildings/", limit=1) == ([1, 2], [1, 1])
+    assert await walk(client, "/api/v1/activities/", limit=4) == ([1, 2, 3, 4, 5, 6], [4, 2])
+
+
+async def test_pages_do_not_shift_after_delete(client, many):
+    first = await client.get("/api/v1/organizations/", params={"limit": 5})
+    # удаление с уже выданной страницы не сдвигает следующую
+    await client.delete(f"/api/v1/organizations/{first.json()['items'][0]['id']}")
+    second = await client.get("/api/v1/organizations/",
+                              params={"limit": 5, "cursor": first.json()["next_cursor"]})
+
+    last = first.json()["items"][-1]["id"]
+    assert [org["id"] for org in second.json()["items"]] == list(range(last + 1, last + 6))
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/organizations/",
+    "/api/v1/buildings/",
+    "/api/v1/activities/",
+    "/api/v1/activities/1/organizations",
+])
+async def test_invalid_cursor(client, url):
+    response = await client.get(url, params={"cursor": "bm90IGEgY3Vyc29y"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+    assert (await client.get(url, params={"limit": 0})).status_code == 422
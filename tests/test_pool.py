@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.session import InstrumentedQueuePool, engine, pool_stats
+
+
+async def test_pool_endpoint(client):
+    response = await client.get("/api/v1/internal/pool")
+    assert response.status_code == 200
+    # у SQLite свой пул, счётчиков QueuePool у него нет
+    assert response.json()["pool_class"] == type(engine.pool).__name__
+    assert response.json()["waits"] is None
+
+
+async def test_waits_and_timeouts_are_counted(tmp_path):
+    pooled = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.1,
+    )
+    try:
+        async with pooled.connect() as held:
+            await held.execute(text("SELECT 1"))
+            assert pool_stats(pooled)["checked_out"] == 1
+
+            with pytest.raises(exc.TimeoutError):
+                async with pooled.connect():
+                    pass
+
+            async def release_soon():
+                await asyncio.sleep(0.02)
+                await held.close()
+
+            waiter = asyncio.create_task(release_soon())
+            async with pooled.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            await waiter
+
+        stats = pool_stats(pooled)
+        assert stats["pool_class"] == "InstrumentedQueuePool"
+        assert (stats["size"], stats["max_overflow"]) == (1, 0)
+        assert (stats["waits"], stats["timeouts"]) == (2, 1)
+        assert stats["wait_seconds"] >= 0.1
+    finally:
+        await pooled.dispose()
@@ -0,0 +1,45 @@
+import re
+
+from app.crud.organization import OrganizationRepository, OrganizationRow
+
+
+def queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+async def test_rows_carry_aggregated_activity_ids(session):
+    repo = OrganizationRepository(session)
+    bare = await repo.create({"name": "Без видов", "phone_numbers": ["1"], "building_id": 2})
+
+    rows = {row.id: row for row in await repo.by_ids([1, 2, bare.id])}
+
+    assert isinstance(rows[1], OrganizationRow)
+    assert sorted(rows[1].activity_ids) == [3, 4]
+    assert sorted(rows[2].activity_ids) == [5, 6]
+    assert rows[bare.id] == OrganizationRow(bare.id, "Без видов", ["1"], 2, [])
+
+
+async def test_organization_out_shape(client):
+    response = await client.get("/api/v1/organizations/1")
+    body = response.json()
+    assert {**body, "activity_ids": sorted(body["activity_ids"])} == {
+        "id": 1,
+        "name": "ООО Рога и Копыта",
+        "phone_numbers": ["2-222-222", "8-923-666-13-13"],
+        "building_id": 1,
+        "activity_ids": [3, 4],
+    }
+
+
+async def test_list_is_one_query_whatever_the_size(client, session):
+    repo = OrganizationRepository(session)
+    for i in range(30):
+        await repo.create({"name": f"Точка {i}", "phone_numbers": [], "building_id": 1},
+                          [3, 5])
+
+    one = await client.get("/api/v1/organizations/1")
+    many = await client.get("/api/v1/organizations/", params={"limit": 100})
+
+    assert len(many.json()["items"]) == 32
+    # версии для ETag и сама выборка, без подгрузки связей по строкам
+    assert queries(one) == queries(many) == 2
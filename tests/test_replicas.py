@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api.v1 import internal
+from app.db import session as db
+from app.db.session import Base, InstrumentedQueuePool, ReplicaRouter
+
+
+def use_router(monkeypatch, router: ReplicaRouter) -> None:
+    monkeypatch.setattr(db, "replica_router", router)
+    monkeypatch.setattr(internal, "replica_router", router)
+
+
+@pytest.fixture
+async def replica(tmp_path, monkeypatch, session):
+    """
+    «Реплика» — отдельная БД с той же схемой, где у здания 1 другой адрес:
+    по ответу видно, с какого сервера читали.
+    """
+    replica_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/replica.db",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO buildings (id, address, latitude, longitude) "
+            "VALUES (1, 'с реплики', 55.7558, 37.6173)"
+        ))
+    use_router(monkeypatch, ReplicaRouter(db.engine, [replica_engine]))
+    yield replica_engine
+    await replica_engine.dispose()
+
+
+async def address(client, **headers) -> str:
+    response = await client.get("/api/v1/buildings/1", headers=headers)
+    assert response.status_code == 200
+    return response.json()["address"]
+
+
+async def test_reads_go_to_replica(client, replica):
+    assert await address(client) == "с реплики"
+
+
+async def test_read_primary_header(client, replica):
+    assert await address(client, **{"X-Read-Primary": "1"}) == "г. Москва, ул. Ленина 1, офис 3"
+
+
+async def test_write_does_not_pin_other_requests(client, replica):
+    written = await client.put("/api/v1/buildings/1", json={"address": "новый"})
+    assert written.json()["address"] == "новый"
+
+    # окна после записи на весь процесс нет: следующий запрос — снова реплика
+    assert await address(client) == "с реплики"
+    assert await address(client, **{"X-Read-Primary": "1"}) == "новый"
+
+
+async def test_unreachable_replica_is_marked_down(client, replica, tmp_path, monkeypatch):
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    use_router(monkeypatch, ReplicaRouter(db.engine, [broken]))
+
+    assert await address(client) == "г. Москва, ул. Ленина 1, офис 3"
+    status = (await client.get("/api/v1/internal/replicas")).json()
+    assert [replica["healthy"] for replica in status] == [False]
+    await broken.dispose()
+
+
+async def test_exhausted_pool_does_not_mark_replica_down(client, replica):
+    async with replica.connect() as held:
+        await held.execute(text("SELECT 1"))
+        # пул реплики занят — этот запрос читает с primary
+        assert await address(client) == "г. Москва, ул. Ленина 1, офис 3"
+
+    status = (await client.get("/api/v1/internal/replicas")).json()
+    assert [replica["healthy"] for replica in status] == [True]
+    assert status[0]["pool"]["timeouts"] == 1
+    assert await address(client) == "с реплики"
@@ -0,0 +1,67 @@
+import re
+
+import pytest
+
+
+def queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+@pytest.mark.parametrize("url, body, expected, count", [
+    # UPDATE ... RETURNING, без чтения до и после
+    ("/api/v1/buildings/1", {"address": "Тверская, 1"},
+     {"id": 1, "address": "Тверская, 1", "latitude": 55.7558, "longitude": 37.6173}, 1),
+    ("/api/v1/activities/4", {"name": "Сыры"}, {"id": 4, "name": "Сыры", "parent_id": 1}, 1),
+    # плюс предки видов деятельности для сброса кэша
+    ("/api/v1/organizations/1", {"name": "ООО Рога"},
+     {"id": 1, "name": "ООО Рога", "phone_numbers": ["2-222-222", "8-923-666-13-13"],
+      "building_id": 1, "activity_ids": [3, 4]}, 2),
+])
+async def test_update_returns_the_row(client, url, body, expected, count):
+    response = await client.put(url, json=body)
+    assert response.status_code == 200
+    assert response.json() == expected
+    assert queries(response) == count
+
+    assert (await client.get(url)).json() == expected
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/buildings/99", "/api/v1/activities/99", "/api/v1/organizations/99",
+])
+async def test_update_of_missing_row(client, url):
+    response = await client.put(url, json={"name": "x", "address": "x"})
+    assert response.status_code == 404
+    assert queries(response) == 1
+
+
+async def test_building_delete_takes_its_organizations(client):
+    response = await client.delete("/api/v1/buildings/1")
+    assert response.status_code == 204
+    # связи, организации, здание
+    assert queries(response) == 3
+
+    assert (await client.get("/api/v1/organizations/1")).status_code == 404
+    assert (await client.get("/api/v1/buildings/1")).status_code == 404
+    activity = await client.get("/api/v1/activities/1/organizations")
+    assert activity.json()["items"] == []
+
+
+async def test_organization_delete(client):
+    response = await client.delete("/api/v1/organizations/2")
+    assert response.status_code == 204
+    # связи и строка с RETURNING, предки видов для сброса кэша
+    assert queries(response) == 3
+    assert (await client.delete("/api/v1/organizations/2")).status_code == 404
+
+
+async def test_activity_delete_removes_subtree(client):
+    response = await client.delete("/api/v1/activities/2")
+    assert response.status_code == 204
+    # связи, поддерево с RETURNING, пути замыкания, updated_at организаций
+    assert queries(response) == 4
+
+    listed = await client.get("/api/v1/activities/")
+    assert [activity["id"] for activity in listed.json()["items"]] == [1, 3, 4]
+    organization = await client.get("/api/v1/organizations/2")
+    assert organization.json()["activity_ids"] == []
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+async def test_cancelled_leader_does_not_fail_followers():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "rows"
+
+    leader = asyncio.create_task(flights.do("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("key", load))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    release.set()
+
+    assert await follower == "rows"
+    assert calls == 1
+    assert flights.stats()["abandoned"] == 0
+
+
+async def test_load_cancelled_when_nobody_waits():
+    flights = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def load():
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.create_task(flights.do("key", load))
+    await started.wait()
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flights.stats()["abandoned"] == 1
+
+
+async def test_timeout_releases_key():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.Event().wait()
+
+    async def fast():
+        return "fresh"
+
+    with pytest.raises(asyncio.TimeoutError):
+        await flights.do("key", slow, timeout=0.01)
+    assert flights.stats()["in_flight"] == 0
+
+    # следующий вызов не ждёт зависшую загрузку, а начинает свою
+    assert await flights.do("key", fast, timeout=1) == "fresh"
+    assert flights.stats()["leaders"] == 2
+    assert flights.stats()["timeouts"] == 1
+
+
+async def test_error_reaches_every_waiter_and_frees_key():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("db down")
+
+    waiters = [asyncio.create_task(flights.do("key", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats() == {
+        "in_flight": 0, "leaders": 1, "followers": 2, "timeouts": 0, "abandoned": 0,
+    }
@@ -0,0 +1,103 @@
+import asyncio
+import re
+
+from sqlalchemy import text
+
+from app.crud.building import INDEX_TABLE, BuildingRepository
+from app.services.spatial_index import BuildingSpatialIndex, building_index
+from app.services.versions import table_versions
+
+MOSCOW = (55.7558, 37.6173)
+# ~3 км к северу от центра Москвы
+NORTH = (55.7828, 37.6173)
+
+
+async def db_version(session) -> int:
+    versions = await table_versions.fetch(session, [INDEX_TABLE])
+    return versions[INDEX_TABLE].version
+
+
+async def background_tasks():
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.gather(*pending)
+
+
+def test_grid_lookups():
+    index = BuildingSpatialIndex(cell_size_deg=0.01)
+    index.build([], version=0)
+    index.upsert(1, *MOSCOW)
+    index.upsert(2, *NORTH)
+
+    assert index.ids_in_radius(MOSCOW, 1) == [1]
+    assert sorted(index.ids_in_radius(MOSCOW, 5)) == [1, 2]
+    assert index.ids_in_bbox((55.77, 37.6), (55.79, 37.7)) == [2]
+
+    index.upsert(1, *NORTH)
+    assert sorted(index.ids_in_radius(NORTH, 0.1)) == [1, 2]
+    index.remove(2)
+    assert index.ids_in_radius(NORTH, 0.1) == [1]
+    assert len(index) == 1
+
+
+async def test_own_create_is_applied_without_rebuild(session):
+    repo = BuildingRepository(session)
+    row = await repo.create({"address": "север", "latitude": NORTH[0], "longitude": NORTH[1]})
+
+    assert building_index.version == await db_version(session)
+    assert await BuildingRepository(session).spatial_index() is building_index
+    assert row.id in building_index.ids_in_radius(NORTH, 0.1)
+
+
+async def test_own_move_is_applied_without_rebuild(session):
+    repo = BuildingRepository(session)
+    await repo.update(1, {"latitude": NORTH[0], "longitude": NORTH[1]})
+
+    assert building_index.version == await db_version(session)
+    assert 1 not in building_index.ids_in_radius(MOSCOW, 1)
+    assert 1 in building_index.ids_in_radius(NORTH, 0.1)
+
+    # смена одного адреса тоже двигает версию, индекс не отстаёт
+    await repo.update(1, {"address": "новый адрес"})
+    assert building_index.version == await db_version(session)
+
+
+async def test_own_delete_is_applied_without_rebuild(session):
+    repo = BuildingRepository(session)
+    assert await repo.delete(1)
+
+    assert building_index.version == await db_version(session)
+    assert building_index.ids_in_radius(MOSCOW, 1) == []
+
+
+async def test_foreign_write_falls_back_to_sql_and_rebuilds(session):
+    # запись в обход репозитория — как другой воркер или CLI
+    await session.execute(text(
+        "INSERT INTO buildings (address, latitude, longitude) VALUES ('чужое', :lat, :lon)"
+    ), {"lat": NORTH[0], "lon": NORTH[1]})
+    await session.commit()
+
+    repo = BuildingRepository(session)
+    assert await repo.spatial_index() is None
+    assert len(await repo.ids_in_radius(NORTH, 0.1)) == 1
+
+    await background_tasks()
+    assert building_index.version == await db_version(session)
+    assert len(building_index.ids_in_radius(NORTH, 0.1)) == 1
+
+
+async def test_own_write_after_foreign_one_keeps_index_stale(session):
+    await session.execute(text("UPDATE buildings SET address = 'чужое' WHERE id = 2"))
+    await session.commit()
+    await BuildingRepository(session).update(1, {"address": "своё"})
+
+    # своя запись засчитана, чужая — нет
+    assert building_index.version < await db_version(session)
+
+
+async def test_geo_request_reuses_conditional_get_versions(client):
+    response = await client.get("/api/v1/organizations/",
+                                params={"lat": MOSCOW[0], "lon": MOSCOW[1], "radius": 5})
+    assert response.status_code == 200
+    # версии для ETag и организации, без отдельной проверки индекса
+    queries = re.search(r'desc="(\d+) queries"', response.headers["server-timing"])
+    assert int(queries.group(1)) == 2